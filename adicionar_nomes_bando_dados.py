@@ -1,4 +1,3 @@
-import sqlite3
 import os
 
 # -----------------------------------------------------------
@@ -2571,36 +2570,14 @@ except NameError:
 
 
 # -----------------------------------------------------------
-# FUNÇÕES DE BANCO DE DADOS (Inclusão de 'db.py' para torná-lo executável)
+# BANCO DE DADOS
+# Usa o mesmo esquema SQLite do app (armazenamento.ArmazenamentoSQLite),
+# então o arquivo gerado pode ser servido com ARMAZENAMENTO=sqlite.
 # -----------------------------------------------------------
 
-DB_NAME = 'nomes_projeto.db'
-
-def get_connection():
-    """Retorna uma conexão com o banco de dados SQLite."""
-    # Cria o banco de dados se ele não existir
-    return sqlite3.connect(DB_NAME)
+from armazenamento import ArmazenamentoSQLite
 
-def init_db():
-    """Inicializa a tabela 'nomes' no banco de dados."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Execução da criação da tabela
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS nomes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome TEXT NOT NULL UNIQUE,
-            significado TEXT,
-            origem TEXT,
-            motivo_escolha TEXT,
-            pesquisas INTEGER DEFAULT 0
-        );
-    """)
-    
-    conn.commit()
-    conn.close()
-    print(f"Banco de dados '{DB_NAME}' inicializado.")
+DB_NAME = 'nomes_projeto.db'
 
 
 # -----------------------------------------------------------
@@ -2608,11 +2585,9 @@ def init_db():
 # -----------------------------------------------------------
 
 # Inicializa a tabela (caso ainda não exista)
-init_db()
-
-# Conecta ao banco
-conn = get_connection()
-cursor = conn.cursor()
+banco = ArmazenamentoSQLite(DB_NAME)
+banco.inicializar()
+print(f"Banco de dados '{DB_NAME}' inicializado.")
 
 print("Iniciando a inserção de nomes no banco de dados...")
 nomes_inseridos = 0
@@ -2640,29 +2615,17 @@ for item in nomes:
     origem_final = origem.strip()
     motivo_final = motivo.strip()
 
-    # 3. Verifica se o nome já existe para não duplicar (UNIQUE constraint)
-    cursor.execute("SELECT id FROM nomes WHERE nome = ?", (nome_final,))
-    if cursor.fetchone() is None:
-        try:
-            cursor.execute("""
-                INSERT INTO nomes (nome, significado, origem, motivo_escolha, pesquisas)
-                VALUES (?, ?, ?, ?, 0)
-            """, (nome_final, significado_completo, origem_final, motivo_final))
-            
-            nomes_inseridos += 1
-        except sqlite3.IntegrityError:
-            # Captura caso haja alguma falha de UNIQUE Constraint que o fetchone não pegou
-            print(f"AVISO: Nome '{nome_final}' já existia ou falha de integridade.")
-            nomes_ignorados += 1
-
+    # 3. Insere; nomes repetidos são ignorados (UNIQUE constraint)
+    if banco.inserir(nome_final, significado_completo, origem_final, motivo_final):
+        nomes_inseridos += 1
+    else:
+        print(f"AVISO: Nome '{nome_final}' já existia.")
+        nomes_ignorados += 1
 
-# Confirma as alterações no banco de dados
-conn.commit()
-conn.close()
 
 print("-" * 30)
 print("Banco populado com sucesso!")
 print(f"Total de {len(nomes)} itens processados.")
 print(f"Total de {nomes_inseridos} novos nomes inseridos.")
 print(f"Total de {nomes_ignorados} itens ignorados/duplicados.")
-print("-" * 30)
\ No newline at end of file
+print("-" * 30)
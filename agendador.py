@@ -0,0 +1,81 @@
+# ==========================================
+# agendador.py - TAREFAS DE FUNDO, SÓ NO WORKER LÍDER
+# ==========================================
+# Cada worker sobe um Agendador (uma thread daemon), mas só o LÍDER roda
+# as tarefas: a cada AGENDADOR_INTERVALO segundos todos tentam a liderança
+# (Armazenamento.tentar_lideranca) e só um consegue. No PostgreSQL é um
+# advisory lock de sessão (vale entre máquinas); no SQLite, uma trava no
+# arquivo nomes.db.lider. Se o líder morre, a trava é solta e outro worker
+# a pega na rodada seguinte.
+#
+# As tarefas devem ser baratas quando não há nada a fazer (ex.: conferir a
+# versão dos dados antes de recalcular) - elas rodam a cada intervalo.
+# Como numa requisição, cada tarefa lê tudo de uma origem só (réplica ou
+# primário, fixada): a versão lida no começo é a dos dados que ela agrega.
+# AGENDADOR=0 desliga (nenhuma thread é criada) - e aí nada grava o
+# snapshot das estatísticas: a conta volta para a requisição, a não ser que
+# ele seja gravado por fora (python estatisticas.py; veja estatisticas.py).
+#
+# `preparar` (opcional) roda na thread, antes da primeira rodada (e de novo
+# a cada intervalo, até dar certo): é ali que o app.py aplica as migrações
+# que o passo de release não aplicou, fora do import e das requisições.
+# ==========================================
+
+import os
+import threading
+
+AGENDADOR_ATIVO = os.environ.get('AGENDADOR', '1') != '0'
+AGENDADOR_INTERVALO = float(os.environ.get('AGENDADOR_INTERVALO', 10))
+# Limite de tempo (s) de cada consulta das tarefas
+AGENDADOR_LIMITE_CONSULTA = float(os.environ.get('AGENDADOR_LIMITE_CONSULTA', 60))
+
+
+class Agendador:
+    """Roda as tarefas agendadas periodicamente, se este processo for o líder. Um por worker."""
+
+    def __init__(self, banco, intervalo=AGENDADOR_INTERVALO, preparar=None):
+        self._banco = banco
+        self.intervalo = intervalo
+        self._preparar = preparar
+        self._tarefas = []  # (nome, função sem argumentos)
+        self._parar = threading.Event()
+        self._thread = None
+
+    def agendar(self, nome, funcao):
+        self._tarefas.append((nome, funcao))
+
+    def iniciar(self):
+        """Sobe a thread (uma vez). A primeira rodada é imediata."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._rodar, name='agendador', daemon=True)
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+
+    def rodar_agora(self):
+        """Uma rodada: as tarefas rodam se este processo for (ou virar) o líder."""
+        if not self._banco.tentar_lideranca():
+            return False
+        for nome, funcao in self._tarefas:
+            self._banco.fixar_leituras(True)
+            try:
+                funcao()
+            except Exception as e:
+                print(f"[AVISO] Tarefa de fundo '{nome}' falhou: {e}")
+            finally:
+                self._banco.fixar_leituras(False)
+        return True
+
+    def _rodar(self):
+        self._banco.definir_limite(AGENDADOR_LIMITE_CONSULTA)
+        while True:
+            try:
+                if self._preparar is not None:
+                    self._preparar()
+                    self._preparar = None
+                self.rodar_agora()
+            except Exception as e:
+                print(f"[AVISO] Agendador: {e}")
+            if self._parar.wait(self.intervalo):
+                return
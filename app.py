@@ -4,20 +4,46 @@
 # Descrição: Aplicação Flask para gerenciar nomes com:
 #   - Cadastro
 #   - Busca (com 3+ letras, início do nome)
-#   - Listagem com paginação
+#   - Listagem com paginação (e em JSON para rolagem infinita: /api/nomes)
 #   - Contador de pesquisas
 #   - Estatísticas e gráficos
 #   - Top 10 mais pesquisados
 # ==========================================
 
 import os
-import io
-import base64
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-import matplotlib.pyplot as plt
-
-# Importa funções de conexão com o banco (db.py)
-import db as db_conexao
+import time
+import select
+import socket
+import stat
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, g
+from flask import get_flashed_messages, stream_with_context, make_response
+from jinja2 import FileSystemBytecodeCache
+
+# Camada de armazenamento (PostgreSQL, SQLite ou memória - veja armazenamento.py)
+import armazenamento
+# Contagens da listagem em cache / estimadas (veja contagens.py)
+import contagens as servico_contagens
+# Cursores da paginação por chave (veja paginacao.py)
+import paginacao
+# Páginas da API de listagem em cache, com a próxima aquecida (veja paginas.py)
+import paginas as servico_paginas
+# Versão dos dados para ETag/Last-Modified (veja versao_dados.py)
+import versao_dados as servico_versao
+# Compressão das respostas (veja compressao.py)
+import compressao
+# Nomes de static/ com hash do conteúdo (veja estaticos.py)
+import estaticos
+# Cache de fragmentos de template (veja fragmentos.py)
+import fragmentos
+# Gráficos das estatísticas desenhados uma vez por versão dos dados (veja graficos.py)
+import graficos as servico_graficos
+# Estatísticas pré-calculadas num snapshot (veja estatisticas.py)
+import estatisticas as servico_estatisticas
+# Tarefas de fundo só no worker líder (veja agendador.py)
+import agendador as servico_agendador
 
 # ==========================================
 # CONFIGURAÇÃO DO FLASK
@@ -27,95 +53,385 @@ app = Flask(__name__)
 # Chave secreta para sessões e flash messages (NUNCA deixe fixa em produção!)
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'chave_muito_secreta_2025_troque_isso')
 
+# Templates compilados ficam em disco (bytecode do Jinja), compartilhados
+# por todos os workers e reaproveitados entre reinícios. Cada arquivo é
+# validado pelo checksum do template, então um deploy novo recompila sozinho.
+# O bytecode é CARREGADO pelo Jinja: a pasta tem que ser só nossa. Sem
+# JINJA_CACHE_DIR, a pasta padrão do Jinja (uma por usuário, 0700, com o
+# dono conferido); com ela, a pasta é criada 0700 e recusada se for de
+# outro usuário ou se outros puderem escrever nela.
+JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR', '')
+
+
+def _pasta_so_nossa(pasta):
+    """Cria `pasta` (0700) se não existe; OSError se for de outro usuário ou gravável por outros."""
+    os.makedirs(pasta, mode=0o700, exist_ok=True)
+    info = os.lstat(pasta)
+    if not stat.S_ISDIR(info.st_mode):
+        raise OSError(f"{pasta} não é uma pasta")
+    if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+        raise OSError(f"{pasta} pertence a outro usuário")
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise OSError(f"{pasta} pode ser alterada por outros usuários")
+
+
+try:
+    if JINJA_CACHE_DIR:
+        _pasta_so_nossa(JINJA_CACHE_DIR)
+        cache_de_templates = FileSystemBytecodeCache(JINJA_CACHE_DIR, '%s.cache')
+    else:
+        cache_de_templates = FileSystemBytecodeCache()  # Confere dono e permissões sozinho
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': cache_de_templates}
+except (OSError, RuntimeError) as e:
+    print(f"[AVISO] Sem cache de templates em disco: {e}")
+
+# Bloco {% cache chave %}...{% endcache %} nos templates (veja fragmentos.py)
+app.jinja_options = {
+    **app.jinja_options,
+    'extensions': [*app.jinja_options.get('extensions', ()), fragmentos.CacheDeFragmentos],
+}
+
+
+def aquecer_templates():
+    """
+    Compila (ou carrega do cache em disco) todos os templates agora, no boot
+    do worker: a primeira requisição não paga a compilação.
+    """
+    inicio = time.perf_counter()
+    nomes = app.jinja_env.list_templates(extensions=['html'])
+    for nome in nomes:
+        app.jinja_env.get_template(nome)
+    print(f"{len(nomes)} template(s) prontos em {(time.perf_counter() - inicio) * 1000:.0f} ms.")
+
+
+# Respostas comprimidas (gzip/brotli) e static/ pré-comprimido (veja compressao.py)
+if compressao.COMPRESSAO_ATIVA:
+    app.wsgi_app = compressao.Compressao(app.wsgi_app, app.static_folder, app.static_url_path)
+
+# static/ com hash no nome e cache imutável (veja estaticos.py)
+ESTATICOS = estaticos.carregar(app.static_folder) if estaticos.ESTATICOS_COM_HASH else {}
+_ESTATICOS_COM_HASH = set(ESTATICOS.values())
+
+
+@app.url_defaults
+def estatico_com_hash(endpoint, valores):
+    """url_for('static', filename='css/style.css') -> /static/css/style.<hash>.css"""
+    if endpoint == 'static' and valores.get('filename') in ESTATICOS:
+        valores['filename'] = ESTATICOS[valores['filename']]
+
+
+@app.after_request
+def cache_imutavel(resposta):
+    """Arquivo com hash no nome: o navegador guarda por um ano sem revalidar."""
+    if request.endpoint == 'static' and resposta.status_code in (200, 206, 304):
+        arquivo = (request.view_args or {}).get('filename', '')
+        # compressao.py pode ter trocado o pedido pela variante .gz/.br
+        if arquivo.endswith(('.gz', '.br')):
+            arquivo = arquivo[:-3]
+        if arquivo in _ESTATICOS_COM_HASH:
+            resposta.headers['Cache-Control'] = estaticos.CACHE_IMUTAVEL
+    return resposta
+
 # ==========================================
 # INICIALIZAÇÃO DO BANCO DE DADOS
 # ==========================================
+# O esquema é criado/atualizado pelo passo de release (python migracoes.py).
+# Se ainda faltar alguma migração (ex.: plataforma sem passo de release), a
+# thread do agendador de cada worker a aplica logo depois do boot
+# (aplicar_migracoes; migrar() é seguro com vários processos). Uma
+# requisição NUNCA migra: só confere a versão (esquema_em_dia) e, com
+# migração pendente, responde 503 - um CREATE INDEX CONCURRENTLY numa
+# tabela grande não pode prender a requisição nem o worker.
+#
+# Nada disso roda no import: criar o armazenamento não abre conexão (os
+# pools do db.py nascem na primeira consulta).
 try:
-    db_conexao.init_db()  # Cria tabela e índices se não existirem
-    print("Banco de dados inicializado com sucesso.")
+    banco = armazenamento.criar()  # Escolhido pela variável ARMAZENAMENTO
 except Exception as e:
-    print(f"[FATAL] Falha ao conectar com o banco: {e}")
-    exit(1)  # Encerra o app se o banco não funcionar
+    print(f"[FATAL] Armazenamento inválido: {e}")
+    exit(1)  # Configuração errada: não adianta tentar de novo
+contagens = servico_contagens.Contagens(banco)
+versao_dados = servico_versao.VersaoDados(banco)
+paginas = servico_paginas.Paginas(banco)
+graficos = servico_graficos.Graficos()
+snapshot_estatisticas = servico_estatisticas.Estatisticas(banco)
+
+_esquema_em_dia = False
+
+
+def esquema_em_dia():
+    """
+    True se não falta nenhuma migração. Conferido no banco até dar certo
+    uma vez; depois disso, de graça. Erro de conexão: a exceção sobe.
+    """
+    global _esquema_em_dia
+    if not _esquema_em_dia and not banco.migracoes_pendentes():
+        print(f"Banco de dados ({banco.nome}) inicializado com sucesso.")
+        _esquema_em_dia = True
+    return _esquema_em_dia
+
+
+def aplicar_migracoes():
+    """Fora das requisições (thread do agendador): aplica as migrações que faltarem."""
+    pendentes = banco.migracoes_pendentes()
+    if pendentes:
+        print(f"[AVISO] Esquema desatualizado ({len(pendentes)} migração(ões) pendente(s)); aplicando...")
+        banco.migrar()
+    esquema_em_dia()
+
+
+agendador = servico_agendador.Agendador(banco, preparar=aplicar_migracoes)
+agendador.agendar('estatisticas', lambda: servico_estatisticas.atualizar(banco))
 
 
 # ==========================================
 # FUNÇÕES AUXILIARES DE BANCO
 # ==========================================
 
-def fetch_all(query, params=None):
+# Depois de um cadastro, as leituras DESTE visitante vão para o primário por
+# alguns segundos, para ele ver o que acabou de gravar mesmo com réplica atrasada.
+LEITURA_NO_PRIMARIO_APOS_ESCRITA = float(os.environ.get('LEITURA_NO_PRIMARIO_APOS_ESCRITA', 10))
+
+
+def marcar_escrita():
+    """Registra na sessão que o visitante acabou de gravar algo."""
+    session['escreveu_em'] = time.time()
+
+
+def leitura_no_primario():
+    """True se o visitante gravou há pouco e precisa ler do primário."""
+    return time.time() - session.get('escreveu_em', 0) < LEITURA_NO_PRIMARIO_APOS_ESCRITA
+
+
+# Tempo máximo (segundos) de CADA consulta, por rota. Passou disso a consulta
+# é cancelada no banco, a conexão volta ao pool e a página mostra o último
+# resultado bom (ou um resultado parcial) com um aviso.
+LIMITE_CONSULTA_PADRAO = float(os.environ.get('LIMITE_CONSULTA_PADRAO', 5))
+LIMITES_DE_TEMPO = {
+    'index': 2,
+    'listar': 3,
+    'api_nomes': 2,
+    'buscar': 3,
+    'top10': 2,
+    'estatisticas': 5,
+    'grafico': 5,
+    'exportar_csv': 30,
+}
+
+# Últimos resultados bons de cada consulta, usados quando ela estoura o tempo
+ULTIMOS_RESULTADOS_MAX = 256
+_ultimos_resultados = OrderedDict()  # (método, argumentos) -> (quando, resultado)
+_ultimos_lock = threading.Lock()
+
+
+def cliente_desconectou(sock):
     """
-    Executa uma consulta SELECT e retorna todos os resultados como lista de dicionários.
-    Ex: [{'id': 1, 'nome': 'João', ...}, ...]
+    True se o navegador já fechou a conexão (desistiu da página).
+    `sock` é o socket do cliente que o gunicorn expõe no environ.
     """
-    conn = None
     try:
-        conn = db_conexao.get_connection()
-        cursor = conn.cursor()
-        print(f"[DEBUG] Executando: {query} | Parâmetros: {params}")
-        cursor.execute(query, params or ())
-        
-        # Pega nomes das colunas
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        
-        # Converte para lista de dicionários
-        results = [dict(zip(columns, row)) for row in rows]
-        
-        print(f"[DEBUG] {len(results)} registro(s) retornado(s).")
-        return results
+        prontos, _, _ = select.select([sock], [], [], 0)
+        # Socket "legível" sem nenhum byte = o outro lado fechou
+        return bool(prontos) and sock.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
+
+
+@app.before_request
+def preparar_banco():
+    """
+    - Visitante que acabou de cadastrar lê do primário (não de uma réplica).
+    - As outras leituras saem todas da mesma réplica: a versão dos dados
+      (ETag, chaves de cache) e as linhas da página vêm do mesmo servidor.
+    - Cada consulta da rota ganha limite de tempo e é cancelada se o cliente sair.
+    """
+    primario = leitura_no_primario()
+    banco.ler_do_primario(primario)
+    banco.fixar_leituras(True)
+    if primario:
+        # Quem acabou de gravar (talvez em outro worker) vê contagens e versão já com o cadastro
+        contagens.invalidar()
+        versao_dados.invalidar()
+    sock = request.environ.get('gunicorn.socket')
+    banco.definir_limite(
+        LIMITES_DE_TEMPO.get(request.endpoint, LIMITE_CONSULTA_PADRAO),
+        # O socket é capturado aqui: a verificação roda fora do contexto da requisição
+        cancelado=(lambda: cliente_desconectou(sock)) if sock is not None else None,
+    )
+
+
+@app.teardown_request
+def soltar_banco(erro=None):
+    """
+    Desfaz o preparar_banco no fim da requisição (o estado é por thread/
+    greenlet): nada de limite, cancelamento (o socket já fechou), primário
+    ou réplica fixada sobrando para o próximo código na mesma thread.
+    """
+    banco.definir_limite(None)
+    banco.ler_do_primario(False)
+    banco.fixar_leituras(False)
+
+
+@app.before_request
+def banco_iniciado():
+    """
+    Antes de tudo que consulta o banco (static/ não): o esquema em dia.
+    Registrada depois de preparar_banco: a conferência já roda com o limite
+    de tempo desta requisição.
+    """
+    if _esquema_em_dia or request.endpoint in (None, 'static'):
+        return None
+    try:
+        if esquema_em_dia():
+            return None
+        print("[AVISO] Migrações pendentes; aguardando o passo de release (python migracoes.py) "
+              "ou o agendador.")
+        mensagem = "Banco de dados sendo atualizado; tente de novo em instantes"
     except Exception as e:
-        flash(f"Erro ao buscar dados: {e}", 'error')
-        print(f"[ERRO] fetch_all: {e}")
-        return []
-    finally:
-        if conn:
-            cursor.close()
-            db_conexao.connection_pool.putconn(conn)
+        print(f"[ERRO] Falha ao conectar com o banco: {e}")
+        mensagem = "Banco de dados indisponível; tente de novo em instantes"
+    return mensagem, 503, {'Retry-After': '5'}
 
 
-def fetch_one(query, params=None):
+def versao_dos_fragmentos():
     """
-    Executa consulta que retorna apenas UM registro.
-    Útil para COUNT, SELECT por ID, etc.
+    Versão dos dados para as chaves do {% cache %}. None (não usar o cache)
+    se alguma consulta da página falhou ou devolveu um resultado antigo.
+    É a versão lida ANTES das consultas da página (g.versao_da_pagina, de
+    responder_sem_mudanca ou do snapshot): lida só na hora de renderizar,
+    uma escrita no meio (cada busca sobe o contador de pesquisas) guardaria
+    o HTML velho com a versão nova.
     """
-    conn = None
+    if g.get('pagina_degradada'):
+        return None
+    if 'versao_da_pagina' in g:
+        return g.versao_da_pagina
     try:
-        conn = db_conexao.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params or ())
-        columns = [desc[0] for desc in cursor.description]
-        row = cursor.fetchone()
-        return dict(zip(columns, row)) if row else None
+        return versao_dados.atual()[0]
     except Exception as e:
-        flash(f"Erro ao buscar dado único: {e}", 'error')
-        print(f"[ERRO] fetch_one: {e}")
+        print(f"[AVISO] Fragmentos sem cache: versão dos dados indisponível ({e})")
         return None
-    finally:
-        if conn:
-            cursor.close()
-            db_conexao.connection_pool.putconn(conn)
 
 
-def execute_query(query, params=None):
+app.jinja_env.fragmentos = fragmentos.Fragmentos(versao_dos_fragmentos)
+# {{ texto | origem_chave }}: a mesma normalização do filtro de origem
+app.add_template_filter(armazenamento.origem_chave, 'origem_chave')
+
+
+# Páginas só de leitura que respondem 304 quando os dados não mudaram
+# (/estatisticas também, mas pela versão do snapshot: veja a rota)
+ROTAS_CONDICIONAIS = {'index', 'listar', 'api_nomes', 'top10'}
+
+
+@app.before_request
+def responder_sem_mudanca():
     """
-    Executa INSERT, UPDATE, DELETE.
-    Retorna True se sucesso, False se falha.
+    GET de página de leitura: o ETag vem da versão dos dados. Se o navegador
+    (ou um proxy) já tem essa versão, responde 304 antes de qualquer consulta
+    da página. A versão em si normalmente vem do cache do worker.
     """
-    conn = None
+    if request.method != 'GET' or request.endpoint not in ROTAS_CONDICIONAIS:
+        return None
     try:
-        conn = db_conexao.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params or ())
-        conn.commit()
-        return True
+        versao, atualizado_em = versao_dados.atual()
+    except Exception as e:
+        print(f"[AVISO] Versão dos dados indisponível: {e}")
+        return None
+    g.versao_da_pagina = versao  # Antes das consultas: chave dos fragmentos (versao_dos_fragmentos)
+    if session.get('_flashes'):
+        return None  # Mensagem pendente: desta vez a página é diferente
+    return _responder_se_nao_mudou(versao, atualizado_em)
+
+
+def _responder_se_nao_mudou(versao, atualizado_em):
+    """Define g.etag/g.atualizado_em; 304 se o navegador já tem essa versão."""
+    g.etag = servico_versao.etag(versao)
+    g.atualizado_em = atualizado_em.replace(microsecond=0)
+
+    if request.if_none_match:
+        # If-None-Match manda; If-Modified-Since só vale sem ele (RFC 9110)
+        nao_mudou = request.if_none_match.contains_weak(g.etag)
+    else:
+        nao_mudou = (request.if_modified_since is not None
+                     and g.atualizado_em <= request.if_modified_since)
+    if nao_mudou:
+        return _com_cabecalhos_de_cache(app.response_class(status=304))
+    return None
+
+
+def _com_cabecalhos_de_cache(resposta):
+    resposta.set_etag(g.etag, weak=True)
+    resposta.last_modified = g.atualizado_em
+    resposta.headers['Cache-Control'] = 'no-cache'  # Guarde, mas sempre confira antes de usar
+    return resposta
+
+
+@app.after_request
+def cabecalhos_de_cache(resposta):
+    """
+    Páginas montadas com a versão atual levam ETag/Last-Modified. Não se a
+    sessão mudou (ex.: um aviso foi exibido): essa resposta não se repete.
+    """
+    if 'etag' in g and resposta.status_code == 200 and not session.modified:
+        _com_cabecalhos_de_cache(resposta)
+    return resposta
+
+
+def consultar(metodo, *args, padrao=None, **kwargs):
+    """
+    Executa uma leitura no armazenamento (ex: consultar(banco.contar, 'Ana')).
+    Em caso de erro avisa o usuário (flash) e devolve `padrao`.
+    Se a consulta estourar o limite de tempo, devolve o último resultado bom
+    dela (com aviso) ou `padrao`.
+    """
+    chave = (metodo.__name__, args, tuple(sorted(kwargs.items())))
+    try:
+        resultado = metodo(*args, **kwargs)
+    except armazenamento.TempoEsgotado as e:
+        print(f"[AVISO] {metodo.__name__} estourou o tempo: {e}")
+        with _ultimos_lock:
+            guardado = _ultimos_resultados.get(chave)
+        g.pagina_degradada = True  # Nada desta página entra no cache de fragmentos
+        if guardado is not None:
+            quando, resultado = guardado
+            flash(f"O banco demorou demais; mostrando dados de {quando:%H:%M:%S}.", 'warning')
+            return _copiar(resultado)
+        flash("O banco demorou demais para responder. Tente um filtro mais específico.", 'warning')
+        return padrao
+    except Exception as e:
+        g.pagina_degradada = True
+        flash(f"Erro ao buscar dados: {e}", 'error')
+        print(f"[ERRO] {metodo.__name__}: {e}")
+        return padrao
+
+    with _ultimos_lock:
+        _ultimos_resultados[chave] = (datetime.now(), _copiar(resultado))
+        _ultimos_resultados.move_to_end(chave)
+        while len(_ultimos_resultados) > ULTIMOS_RESULTADOS_MAX:
+            _ultimos_resultados.popitem(last=False)
+    return resultado
+
+
+def _copiar(resultado):
+    """Cópia rasa de listas de linhas (as rotas às vezes alteram as linhas)."""
+    if isinstance(resultado, list):
+        return [dict(l) if isinstance(l, dict) else l for l in resultado]
+    if isinstance(resultado, tuple):
+        return tuple(_copiar(parte) for parte in resultado)
+    return resultado
+
+
+def gravar(metodo, *args, **kwargs):
+    """
+    Executa uma escrita no armazenamento (INSERT, UPDATE...).
+    Retorna o resultado do método, ou False se falhar.
+    """
+    try:
+        return metodo(*args, **kwargs)
     except Exception as e:
         flash(f"Erro ao salvar no banco: {e}", 'error')
-        print(f"[ERRO] execute_query: {e}")
+        print(f"[ERRO] {metodo.__name__}: {e}")
         return False
-    finally:
-        if conn:
-            cursor.close()
-            db_conexao.connection_pool.putconn(conn)
 
 
 # ==========================================
@@ -127,17 +443,8 @@ def index():
     """
     Página inicial: mostra total de nomes e top 10 mais pesquisados.
     """
-    # Total de nomes no banco
-    total_result = fetch_one("SELECT COUNT(id) as total FROM nomes")
-    total = total_result['total'] if total_result else 0
-
-    # Top 10 mais pesquisados
-    top_nomes = fetch_all("""
-        SELECT nome, pesquisas 
-        FROM nomes 
-        ORDER BY pesquisas DESC 
-        LIMIT 10
-    """)
+    # Total de nomes no banco + top 10 mais pesquisados (uma ida ao banco)
+    total, top_nomes = consultar(banco.resumo_inicio, 10, padrao=(0, []))
 
     return render_template('index.html', total=total, top_nomes=top_nomes)
 
@@ -162,23 +469,15 @@ def buscar():
         else:
             try:
                 # Busca nomes que começam com o termo
-                query = """
-                    SELECT id, nome, significado, origem, motivo_escolha, pesquisas
-                    FROM nomes
-                    WHERE nome ILIKE %s
-                    ORDER BY nome ASC
-                """
-                resultados = fetch_all(query, (f"{termo_pesquisado}%",))
+                resultados = consultar(banco.buscar_prefixo, termo_pesquisado, padrao=[])
 
                 if resultados:
-                    # Atualiza contador de pesquisas
-                    for row in resultados:
-                        novo_total = row['pesquisas'] + 1
-                        if execute_query(
-                            "UPDATE nomes SET pesquisas = %s WHERE id = %s",
-                            (novo_total, row['id'])
-                        ):
-                            row['pesquisas'] = novo_total
+                    # Atualiza contador de pesquisas (incremento no próprio banco,
+                    # um único UPDATE: o valor lido pode vir de uma réplica atrasada)
+                    if gravar(banco.incrementar_pesquisas, [row['id'] for row in resultados]) is not False:
+                        versao_dados.invalidar()
+                        for row in resultados:
+                            row['pesquisas'] += 1
                     flash(f"Encontrado(s) {len(resultados)} nome(s)!", 'success')
                 else:
                     flash(f"Nenhum nome encontrado começando com '{termo_pesquisado}'.", 'info')
@@ -194,11 +493,78 @@ def buscar():
     )
 
 
+# A partir de quantas linhas por página a listagem vai em streaming: o HTML
+# sai aos pedaços enquanto o template é renderizado, sem montar a página
+# inteira antes. As linhas (no máximo 100) vêm numa leitura só, e a conexão
+# volta ao pool antes do envio: cliente lento não prende conexão do banco.
+LISTAGEM_EM_FLUXO_A_PARTIR = int(os.environ.get('LISTAGEM_EM_FLUXO_A_PARTIR', 50))
+# Quantos pedaços do template o Jinja junta antes de mandar um para a rede
+PEDACOS_POR_ENVIO = 40
+# Ordenações oferecidas na listagem (todas em armazenamento.ORDENACOES,
+# cada uma com seu índice no banco), na ordem em que aparecem no filtro
+ORDENS_DA_LISTAGEM = {
+    'nome': 'Nome (A-Z)',
+    'populares': 'Mais pesquisados',
+    'origem': 'Origem',
+    'tamanho': 'Nomes mais curtos',
+}
+
+
+def _total_de_paginas(page, per_page, total_registros, aproximado, quantidade):
+    """Total de páginas da barra, dado o total (exato, estimado ou None) e as linhas desta página."""
+    if total_registros is None:
+        # Resultado parcial: mostra até a página atual e, se ela veio cheia, a próxima
+        return page + 1 if quantidade == per_page else page
+    total_pages = (total_registros + per_page - 1) // per_page
+    if aproximado and quantidade < per_page:
+        # A estimativa pode errar para mais ou para menos: página incompleta é a última
+        return page
+    if aproximado and page >= total_pages:
+        return page + 1
+    return total_pages
+
+
+def _barra_de_paginas(page, per_page, total_registros, aproximado, quantidade, primeira, ultima,
+                      por_chave=True):
+    """
+    paginacao.paginador() com os cursores tirados da primeira e da última
+    linha da página (por_chave=False: só números de página, com OFFSET).
+    """
+    total_pages = _total_de_paginas(page, per_page, total_registros, aproximado, quantidade)
+    cursor_anterior = (
+        paginacao.codificar_cursor('antes', primeira) if por_chave and primeira and page > 1 else None
+    )
+    cursor_proximo = (
+        paginacao.codificar_cursor('apos', ultima)
+        if por_chave and ultima and quantidade == per_page and page < total_pages else None
+    )
+    return paginacao.paginador(page, total_pages, cursor_anterior, cursor_proximo)
+
+
+def _indice_alfabetico(per_page, chave):
+    """
+    Barra A-Z da listagem (só sem filtros: os totais são da tabela inteira).
+    A letra atual vem do cursor: saltar para "M" e avançar por cursor
+    mantém os pares de "M" ("Ma", "Me", ...) à vista.
+    """
+    prefixos = consultar(contagens.iniciais, padrao=[])
+    posicao = chave.get('apos') or chave.get('antes')
+    atual = armazenamento.nome_prefixo(posicao[0], 1) if posicao and posicao[0] else None
+    return paginacao.indice_alfabetico(prefixos, per_page, atual)
+
+
 @app.route('/listar')
 def listar():
     """
     Lista todos os nomes com paginação (10 por página).
-    Suporta filtro por nome e origem.
+    Suporta filtro por nome (trecho do texto) e origem (exata, escolhida
+    numa lista com o total de cada uma).
+    Anterior/próxima usam cursores (?cursor=...): a página seguinte começa
+    direto depois da última linha vista, sem OFFSET, então qualquer página
+    custa o mesmo que a primeira. ?page=N sozinho (salto direto) usa OFFSET.
+    ?ordem= escolhe outra ordenação de ORDENS_DA_LISTAGEM; fora da
+    alfabética a paginação é só por número de página (OFFSET).
+    Páginas grandes (per_page >= LISTAGEM_EM_FLUXO_A_PARTIR) vão em streaming.
     """
     try:
         page = int(request.args.get('page', 1))
@@ -210,60 +576,202 @@ def listar():
     # Garante valores válidos
     page = max(1, page)
     per_page = max(1, min(100, per_page))  # Limite de segurança
-    offset = (page - 1) * per_page
 
-    filtro_nome = request.args.get('nome', '').strip()
-    filtro_origem = request.args.get('origem', '').strip()
-
-    # --- CONTAGEM TOTAL ---
-    count_query = "SELECT COUNT(id) as total FROM nomes WHERE 1=1"
-    params = []
-    if filtro_nome:
-        count_query += " AND nome ILIKE %s"
-        params.append(f"%{filtro_nome}%")
-    if filtro_origem:
-        count_query += " AND origem ILIKE %s"
-        params.append(f"%{filtro_origem}%")
-
-    total_result = fetch_one(count_query, tuple(params))
-    total_registros = total_result['total'] if total_result else 0
-    total_pages = (total_registros + per_page - 1) // per_page
+    # Só ordenações da lista branca (cada uma tem índice próprio no banco)
+    ordem = request.args.get('ordem', '')
+    if ordem not in ORDENS_DA_LISTAGEM:
+        ordem = armazenamento.ORDENACAO_PADRAO
+    por_chave = ordem == armazenamento.ORDENACAO_PADRAO
 
-    # Ajusta página inválida
-    if page > total_pages and total_pages > 0:
-        page = total_pages
-        offset = (page - 1) * per_page
-
-    # --- BUSCA COM PAGINAÇÃO ---
-    query = """
-        SELECT id, nome, significado, origem, motivo_escolha, pesquisas
-        FROM nomes
-        WHERE 1=1
-    """
-    params = []
-    if filtro_nome:
-        query += " AND nome ILIKE %s"
-        params.append(f"%{filtro_nome}%")
-    if filtro_origem:
-        query += " AND origem ILIKE %s"
-        params.append(f"%{filtro_origem}%")
+    # Cursor válido: posição (nome, id) de onde continuar; senão, OFFSET
+    chave = paginacao.argumentos_de_chave(request.args.get('cursor', '')) if por_chave else {}
+    offset = 0 if chave else (page - 1) * per_page
 
-    query += " ORDER BY nome ASC LIMIT %s OFFSET %s"
-    params.extend([per_page, offset])
-
-    nomes = fetch_all(query, tuple(params))
+    filtro_nome = request.args.get('nome', '').strip()
+    filtro_origem = request.args.get('origem', '').strip()
+    # Opções do filtro de origem, com os totais mantidos pelo banco
+    origens = consultar(contagens.origens, padrao=[])
+    # Saltos por letra: cursores prontos, nenhuma contagem na hora
+    indice = None if filtro_nome or filtro_origem or not por_chave else _indice_alfabetico(per_page, chave)
+
+    # "Anterior" por chave pode cair antes do começo e precisar da página 1
+    # inteira de novo: essa fica fora do streaming.
+    if per_page >= LISTAGEM_EM_FLUXO_A_PARTIR and 'antes' not in chave:
+        return _listar_em_fluxo(page, per_page, offset, chave, filtro_nome, filtro_origem, ordem,
+                                origens=origens, indice=indice)
+
+    # --- CONTAGEM TOTAL + PÁGINA ---
+    # A contagem vem do cache quando possível (só a página vai ao banco);
+    # em filtros muito amplos é uma estimativa ("cerca de N resultados").
+    total_registros, aproximado, nomes = consultar(
+        contagens.pagina, filtro_nome, filtro_origem, per_page, offset,
+        padrao=(None, False, None), ordem=ordem, **chave
+    )
+    if 'antes' in chave and nomes is not None and len(nomes) < per_page:
+        # Voltou até o começo (cadastros novos deslocaram as páginas): é a página 1
+        page = 1
+        nomes = consultar(banco.listar, filtro_nome, filtro_origem, per_page, 0,
+                          padrao=[], ordem=ordem)
+
+    if total_registros is not None:
+        total_pages = _total_de_paginas(page, per_page, total_registros, aproximado, len(nomes))
+
+        # Ajusta página inválida (busca de novo só a última página existente)
+        if page > total_pages and total_pages > 0 and not chave:
+            page = total_pages
+            offset = (page - 1) * per_page
+            nomes = consultar(banco.listar, filtro_nome, filtro_origem, per_page, offset,
+                          padrao=[], ordem=ordem)
+    else:
+        # Em filtros amplos a contagem é a parte cara; se ela estourou o tempo,
+        # a página sai mesmo assim, só sem o total exato.
+        nomes = consultar(banco.listar, filtro_nome, filtro_origem, per_page, offset,
+                          padrao=[], ordem=ordem, **chave)
 
     return render_template(
         'listar.html',
         nomes=nomes,
         page=page,
-        total_pages=total_pages,
+        # A barra é montada pelo template, depois da tabela (igual ao streaming)
+        montar_paginador=lambda: _barra_de_paginas(
+            page, per_page, total_registros, aproximado, len(nomes),
+            nomes[0] if nomes else None, nomes[-1] if nomes else None, por_chave,
+        ),
+        total_registros=total_registros,
+        aproximado=aproximado,
         filtro_nome=filtro_nome,
         filtro_origem=filtro_origem,
+        origens=origens,
+        indice=indice,
+        ordem=ordem,
+        ordens=ORDENS_DA_LISTAGEM,
         per_page=per_page
     )
 
 
+def _listar_em_fluxo(page, per_page, offset, chave, filtro_nome, filtro_origem, ordem, **extras):
+    """
+    Listagem em streaming: conta primeiro (cache/estimativa, como sempre),
+    manda o topo da página e depois a tabela. As linhas são lidas de uma vez
+    quando o template chega nelas (banco.listar_em_fluxo), e a conexão é
+    devolvida antes de elas irem para a rede.
+    """
+    total_registros, aproximado = consultar(
+        contagens.contar, filtro_nome, filtro_origem, padrao=(None, False)
+    )
+    if total_registros is not None and not aproximado and not chave:
+        # Ajusta página inválida antes de abrir o cursor
+        total_pages = (total_registros + per_page - 1) // per_page
+        if page > total_pages > 0:
+            page = total_pages
+            offset = (page - 1) * per_page
+
+    nomes = paginacao.LinhasEmFluxo(
+        banco.listar_em_fluxo(filtro_nome, filtro_origem, per_page, offset, ordem=ordem, **chave)
+    )
+    contexto = dict(
+        nomes=nomes,
+        page=page,
+        # Chamado pelo template depois da tabela, quando as linhas já passaram
+        montar_paginador=lambda: _barra_de_paginas(
+            page, per_page, total_registros, aproximado, nomes.quantidade,
+            nomes.primeira, nomes.ultima, ordem == armazenamento.ORDENACAO_PADRAO,
+        ),
+        total_registros=total_registros,
+        aproximado=aproximado,
+        filtro_nome=filtro_nome,
+        filtro_origem=filtro_origem,
+        ordem=ordem,
+        ordens=ORDENS_DA_LISTAGEM,
+        per_page=per_page,
+        **extras,
+    )
+    # Os avisos saem da sessão AGORA: o cookie vai nos cabeçalhos, antes do corpo
+    get_flashed_messages(with_categories=True)
+    # Sem ETag: se a consulta falhar no meio, esta página incompleta não pode
+    # ser reaproveitada pelo navegador num 304
+    g.pop('etag', None)
+
+    app.update_template_context(contexto)
+    fluxo = app.jinja_env.get_template('listar.html').stream(contexto)
+    fluxo.enable_buffering(PEDACOS_POR_ENVIO)
+    return app.response_class(stream_with_context(fluxo), mimetype='text/html')
+
+
+# ==========================================
+# API: LISTAGEM EM JSON (rolagem infinita)
+# ==========================================
+API_POR_PAGINA = 20
+API_POR_PAGINA_MAX = 100
+
+
+def _erro_da_api(mensagem, status):
+    resposta = jsonify({'erro': mensagem})
+    resposta.status_code = status
+    return resposta
+
+
+@app.route('/api/nomes')
+def api_nomes():
+    """
+    Listagem em JSON, em ordem alfabética, para rolagem infinita:
+        GET /api/nomes?limite=20&nome=ana&origem=Latim&campos=nome,origem
+    Cada resposta traz o cursor da próxima página ("proximo") e o mesmo
+    link no cabeçalho Link: <...>; rel="next". Ao servir uma página, a
+    seguinte já é buscada em segundo plano (paginas.py): seguir o cursor
+    costuma sair direto da memória do worker.
+    """
+    try:
+        limite = int(request.args.get('limite', API_POR_PAGINA))
+    except ValueError:
+        return _erro_da_api("limite deve ser um número", 400)
+    limite = max(1, min(API_POR_PAGINA_MAX, limite))
+
+    campos = [c for c in request.args.get('campos', '').split(',') if c] or list(armazenamento.COLUNAS)
+    desconhecidos = [c for c in campos if c not in armazenamento.COLUNAS]
+    if desconhecidos:
+        return _erro_da_api(f"campos desconhecidos: {', '.join(desconhecidos)}"
+                            f" (use {', '.join(armazenamento.COLUNAS)})", 400)
+
+    # Aqui o cursor inválido é erro (a página HTML só volta para o começo)
+    cursor = request.args.get('cursor', '')
+    apos = None
+    if cursor:
+        decodificado = paginacao.decodificar_cursor(cursor)
+        if decodificado is None or decodificado[0] != 'apos':
+            return _erro_da_api("cursor inválido", 400)
+        apos = decodificado[1]
+
+    filtro_nome = request.args.get('nome', '').strip()
+    filtro_origem = request.args.get('origem', '').strip()
+    # A mesma versão do ETag, lida antes da consulta (None: sem cache de páginas)
+    versao = versao_dos_fragmentos()
+    try:
+        linhas, proxima = paginas.pagina(versao, filtro_nome, filtro_origem, limite, apos)
+    except armazenamento.TempoEsgotado:
+        resposta = _erro_da_api("o banco demorou demais; tente de novo", 503)
+        resposta.headers['Retry-After'] = '1'
+        return resposta
+    except Exception as e:
+        print(f"[ERRO] api_nomes: {e}")
+        return _erro_da_api("erro ao buscar dados", 500)
+
+    proximo = paginacao.codificar_cursor('apos', {'nome': proxima[0], 'id': proxima[1]}) if proxima else None
+    resposta = jsonify({
+        'nomes': [{c: l[c] for c in campos} for l in linhas],
+        'proximo': proximo,
+    })
+    if proximo:
+        link = url_for(
+            'api_nomes', cursor=proximo,
+            limite=limite if limite != API_POR_PAGINA else None,
+            campos=request.args.get('campos') or None,
+            nome=filtro_nome or None, origem=filtro_origem or None,
+        )
+        resposta.headers['Link'] = f'<{link}>; rel="next"'
+    return resposta
+
+
 @app.route('/cadastrar', methods=['GET', 'POST'])
 def cadastrar():
     """
@@ -278,14 +786,14 @@ def cadastrar():
         if not (nome and significado and origem):
             flash("Nome, Significado e Origem são obrigatórios.", 'error')
         else:
-            # Verifica duplicata
-            if fetch_one("SELECT id FROM nomes WHERE nome ILIKE %s", (nome,)):
+            # Verifica duplicata (sempre no primário: a réplica pode não ter o cadastro mais recente)
+            if consultar(banco.existe_nome, nome, padrao=False):
                 flash(f"O nome '{nome}' já existe.", 'error')
             else:
-                if execute_query("""
-                    INSERT INTO nomes (nome, significado, origem, motivo_escolha, pesquisas)
-                    VALUES (%s, %s, %s, %s, 0)
-                """, (nome, significado, origem, motivo_escolha)):
+                if gravar(banco.inserir, nome, significado, origem, motivo_escolha):
+                    marcar_escrita()
+                    contagens.invalidar()
+                    versao_dados.invalidar()
                     flash(f"Nome '{nome}' cadastrado com sucesso!", 'success')
                     return redirect(url_for('listar'))
                 else:
@@ -299,12 +807,7 @@ def top10():
     """
     Exibe os 10 nomes mais pesquisados.
     """
-    top_nomes = fetch_all("""
-        SELECT nome, pesquisas 
-        FROM nomes 
-        ORDER BY pesquisas DESC 
-        LIMIT 10
-    """)
+    top_nomes = consultar(banco.mais_pesquisados, 10, padrao=[])
     # Adiciona ranking
     for i, nome in enumerate(top_nomes, 1):
         nome['ranking'] = i
@@ -312,96 +815,69 @@ def top10():
     return render_template('top10.html', top_nomes=top_nomes)
 
 
-import io
-import base64
-import matplotlib.pyplot as plt
+_sem_snapshot_desde = None
+
+
+def _avisar_sem_snapshot():
+    """Avisa (no máximo uma vez por minuto, por worker) que /estatisticas agregou na requisição."""
+    global _sem_snapshot_desde
+    agora = time.monotonic()
+    if _sem_snapshot_desde is None or agora - _sem_snapshot_desde >= 60:
+        _sem_snapshot_desde = agora
+        dica = ("o agendador ainda não gravou" if servico_agendador.AGENDADOR_ATIVO
+                else "AGENDADOR=0: grave-o com 'python estatisticas.py'")
+        print(f"[AVISO] /estatisticas sem snapshot, agregando na requisição ({dica})")
+
 
 @app.route('/estatisticas')
 def estatisticas():
     """
-    Gera gráficos dinâmicos com foco em clareza.
-    - Top 10 origens (barras horizontais)
-    - Top 5 pesquisados (barras verticais)
+    Tabela de origens e os gráficos (top 10 origens, top 5 pesquisados).
+    Nada é agregado aqui: a página lê o snapshot que o worker líder
+    pré-calcula a cada mudança dos dados (estatisticas.py, agendador.py).
+    Só enquanto ainda não existe snapshot (app recém-instalado, ou
+    AGENDADOR=0 sem `python estatisticas.py`) a conta é feita na requisição,
+    com um aviso no log. Os gráficos são imagens à parte (rota grafico),
+    com a versão na URL.
     """
     try:
-        # === DISTRIBUIÇÃO POR ORIGEM (TOP 10 + "Outras") ===
-        origens_raw = fetch_all("""
-            SELECT origem, COUNT(id) as count 
-            FROM nomes 
-            GROUP BY origem 
-            ORDER BY count DESC
-        """)
-
-        # Separa top 10 e o resto
-        top_10_origens = origens_raw[:10]
-        outras_count = sum(item['count'] for item in origens_raw[10:]) if len(origens_raw) > 10 else 0
-
-        origens_labels = [item['origem'] for item in top_10_origens]
-        origens_valores = [item['count'] for item in top_10_origens]
-        if outras_count > 0:
-            origens_labels.append("Outras")
-            origens_valores.append(outras_count)
-
-        # === TOP 5 PESQUISADOS ===
-        data_top5 = fetch_all("""
-            SELECT nome, pesquisas 
-            FROM nomes 
-            ORDER BY pesquisas DESC 
-            LIMIT 5
-        """)
-
-        nomes_top = [d['nome'] for d in data_top5]
-        pesquisas_top = [d['pesquisas'] for d in data_top5]
-
-        # === FUNÇÃO PARA GERAR GRÁFICO ===
-        def gerar_grafico(labels, values, tipo, titulo, xlabel=None, ylabel=None):
-            plt.figure(figsize=(10, 6))
-            colors = plt.cm.Set3(range(len(labels))) if tipo == 'barh' else ['#4e79a7']
-
-            if tipo == 'barh':  # Barras horizontais
-                bars = plt.barh(labels, values, color=colors, edgecolor='navy', alpha=0.8)
-                plt.title(titulo, fontsize=14, fontweight='bold', pad=20)
-                plt.xlabel(xlabel or 'Quantidade de Nomes', fontsize=12)
-                plt.grid(axis='x', alpha=0.3, linestyle='--')
-                plt.gca().invert_yaxis()  # Maior no topo
-                for i, bar in enumerate(bars):
-                    width = bar.get_width()
-                    plt.text(width + 0.5, bar.get_y() + bar.get_height()/2,
-                             f'{int(width)}', va='center', fontsize=10, fontweight='bold')
-            elif tipo == 'bar':  # Barras verticais
-                bars = plt.bar(labels, values, color='#66b3ff', edgecolor='navy', linewidth=1)
-                plt.title(titulo, fontsize=14, fontweight='bold', pad=20)
-                plt.ylabel(ylabel or 'Pesquisas', fontsize=12)
-                plt.xlabel('Nome', fontsize=12)
-                plt.xticks(rotation=45, ha='right')
-                plt.grid(axis='y', alpha=0.3)
-                for bar in bars:
-                    height = bar.get_height()
-                    plt.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                             f'{int(height)}', ha='center', va='bottom', fontsize=10)
-
-            plt.tight_layout()
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', transparent=True, bbox_inches='tight', dpi=120)
-            plt.close()
-            return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode()}"
-
-        # === GERA GRÁFICOS ===
-        grafico_origem_url = gerar_grafico(
-            origens_labels, origens_valores, 'barh',
-            'Top 10 Origens Mais Comuns + Outras', 'Quantidade'
-        ) if origens_labels else None
-
-        grafico_top5_url = gerar_grafico(
-            nomes_top, pesquisas_top, 'bar',
-            'Top 5 Nomes Mais Pesquisados', ylabel='Pesquisas'
-        ) if data_top5 else None
+        try:
+            snapshot = snapshot_estatisticas.atual()
+        except Exception as e:
+            print(f"[AVISO] Snapshot das estatísticas indisponível: {e}")
+            snapshot = None
+
+        if snapshot is not None:
+            # ETag, fragmentos e URLs dos gráficos pela versão do SNAPSHOT:
+            # ele pode estar um intervalo do agendador atrás dos dados.
+            versao = g.versao_da_pagina = snapshot['versao']
+            if not session.get('_flashes'):
+                sem_mudanca = _responder_se_nao_mudou(versao, snapshot['gerado_em'])
+                if sem_mudanca is not None:
+                    return sem_mudanca
+            tabela_origem, data_top5 = snapshot['tabela_origem'], snapshot['top5']
+            nomes = snapshot['graficos']
+        else:
+            _avisar_sem_snapshot()
+            versao = g.versao_da_pagina = versao_dos_fragmentos()  # Antes da consulta
+            origens_raw, data_top5 = consultar(
+                banco.resumo_estatisticas, servico_estatisticas.TOP, padrao=([], []))
+            # Com dados antigos (consulta estourou o tempo) vai sem versão e sem cache longo
+            if g.get('pagina_degradada'):
+                versao = None
+            tabela_origem = servico_estatisticas.tabela_de_origens(origens_raw)
+            nomes = servico_estatisticas.graficos(origens_raw, data_top5)
+
+        graficos_da_pagina = {
+            nome: {formato: url_for('grafico', nome=nome, formato=formato, v=versao)
+                   for formato in servico_graficos.FORMATOS}
+            for nome in nomes
+        }
 
         return render_template(
             'estatisticas.html',
-            grafico_origem_url=grafico_origem_url,
-            grafico_top5_url=grafico_top5_url,
-            tabela_origem=top_10_origens + ([{'origem': 'Outras', 'count': outras_count}] if outras_count > 0 else []),
+            graficos=graficos_da_pagina,
+            tabela_origem=tabela_origem,
             tabela_top5=data_top5
         )
 
@@ -410,25 +886,84 @@ def estatisticas():
         print(f"[ERRO] Estatísticas: {e}")
         return render_template('estatisticas.html')
 
+
+@app.route('/graficos/<nome>.<formato>')
+def grafico(nome, formato):
+    """
+    Um gráfico de /estatisticas como imagem (png ou svg), desenhado uma vez
+    por versão dos dados (graficos.py). Com ?v= igual à versão atual a
+    resposta é imutável (guardada por um ano); sem ela, ou com uma versão
+    velha, sai a imagem atual com no-cache. ETag + If-None-Match: 304 sem
+    consultar nem desenhar. O SVG sai pronto do snapshot das estatísticas
+    (versão do snapshot); o PNG, ou o SVG antes do primeiro snapshot, é
+    desenhado aqui.
+    """
+    if nome not in ('origens', 'top5') or formato not in servico_graficos.FORMATOS:
+        return "Não encontrado", 404
+    snapshot = None
+    if formato == 'svg':
+        try:
+            snapshot = snapshot_estatisticas.atual()
+        except Exception as e:
+            print(f"[AVISO] Snapshot das estatísticas indisponível: {e}")
+    if snapshot is not None:
+        versao = snapshot['versao']
+    else:
+        try:
+            versao = versao_dados.atual()[0]
+        except Exception as e:
+            print(f"[AVISO] Gráfico sem cache: versão dos dados indisponível ({e})")
+            versao = None
+
+    if versao is not None:
+        etag = f"{nome}.{formato}-{servico_versao.etag(versao)}"
+        if request.if_none_match.contains_weak(etag):
+            resposta = app.response_class(status=304)
+            resposta.set_etag(etag, weak=True)
+            return resposta
+
+    def desenhar():
+        origens_raw, top = banco.resumo_estatisticas(servico_estatisticas.TOP)
+        parametros = servico_estatisticas.graficos(origens_raw, top).get(nome)
+        if parametros is None:
+            raise LookupError(nome)
+        return servico_graficos.desenhar_barras(formato=formato, **parametros)
+
+    chave = None if versao is None else (versao, nome, formato, servico_graficos.DPI)
+    try:
+        if snapshot is not None:
+            dados = snapshot['graficos'][nome].encode('utf-8')
+        else:
+            dados = graficos.obter_ou_desenhar(chave, desenhar)
+    except LookupError:
+        return "Gráfico sem dados", 404
+    except armazenamento.TempoEsgotado:
+        return "O banco demorou demais; tente de novo", 503, {'Retry-After': '1'}
+
+    resposta = app.response_class(dados, mimetype=servico_graficos.FORMATOS[formato])
+    if versao is not None:
+        resposta.set_etag(etag, weak=True)
+    if versao is not None and request.args.get('v') == str(versao):
+        resposta.headers['Cache-Control'] = estaticos.CACHE_IMUTAVEL
+    else:
+        resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta
+
 # ==========================================
 # ROTA: EXPORTAR DADOS PARA CSV
 # ==========================================
-from flask import make_response
-import csv
-from io import StringIO
 
 @app.route('/exportar_csv')
 def exportar_csv():
     """
     Exporta todos os nomes do banco para um arquivo CSV.
     """
+    # Só aqui: o boot do worker não carrega o módulo de CSV
+    import csv
+    from io import StringIO
     try:
         # Busca todos os nomes
-        nomes = fetch_all("""
-            SELECT nome, significado, origem, motivo_escolha, pesquisas 
-            FROM nomes 
-            ORDER BY nome ASC
-        """)
+        nomes = consultar(banco.todos, padrao=[])
         
         # Cria CSV em memória
         output = StringIO()
@@ -479,10 +1014,63 @@ def contato():
     return render_template("contato.html")
 
 
+# ==========================================
+# ROTA: ADMIN - DESEMPENHO DAS CONSULTAS
+# ==========================================
+import hmac
+import metricas
+
+# Sem ADMIN_TOKEN definido as páginas de admin nem existem (404)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+
+def admin_autorizado():
+    """
+    Token só no cabeçalho X-Admin-Token: na URL (?token=) ele iria parar nos
+    logs de acesso, no histórico e no Referer.
+    """
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+@app.route('/admin/consultas')
+def admin_consultas():
+    """
+    Tempos por consulta (histograma, linhas, espera no pool) e os planos
+    capturados das consultas lentas deste worker. ?formato=json para máquinas.
+    """
+    if not admin_autorizado():
+        return "Não encontrado", 404
+
+    dados = metricas.resumo()
+    if request.args.get('formato') == 'json':
+        dados['desde'] = dados['desde'].isoformat()
+        for plano in dados['planos']:
+            plano['quando'] = plano['quando'].isoformat()
+        return jsonify(dados)
+    return render_template('admin_consultas.html', **dados)
+
+
+@app.route('/admin/consultas/zerar', methods=['POST'])
+def admin_consultas_zerar():
+    """Apaga as métricas deste worker. Só POST: um GET (link, prefetch) não muda nada."""
+    if not admin_autorizado():
+        return "Não encontrado", 404
+    metricas.zerar()
+    return redirect(url_for('admin_consultas'), code=303)
+
+
 # ==========================================
 # EXECUÇÃO DO SERVIDOR
 # ==========================================
 
+# Cada worker importa este módulo ao subir: os templates já saem compilados
+aquecer_templates()
+
+# ... e sobe o agendador; só o worker líder roda as tarefas (veja agendador.py)
+if servico_agendador.AGENDADOR_ATIVO:
+    agendador.iniciar()
+
 
 # if __name__ == '__main__':
 #     """
@@ -0,0 +1,1039 @@
+# ==========================================
+# armazenamento.py - CAMADA DE ARMAZENAMENTO PLUGÁVEL
+# ==========================================
+# O app.py fala só com a interface Armazenamento. A implementação é
+# escolhida pela variável de ambiente ARMAZENAMENTO:
+#   postgres (padrão) -> Supabase/PostgreSQL via db.py (pool, réplicas)
+#   sqlite            -> arquivo local SQLITE_PATH (padrão: nomes.db), em WAL
+#   memoria           -> tudo em memória; some quando o processo termina
+#
+# SQLite e memória permitem rodar, medir e testar o app sem Supabase.
+# As três passam pela mesma suíte: test_armazenamento.py
+# ==========================================
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava de arquivo (veja tentar_lideranca)
+    fcntl = None
+
+import metricas
+import migracoes
+
+# Colunas de uma linha completa da tabela 'nomes'
+COLUNAS = ('id', 'nome', 'significado', 'origem', 'motivo_escolha', 'pesquisas')
+
+
+# Ordenações aceitas na listagem. Cada uma tem no banco um índice com
+# exatamente essas colunas, nessa ordem (migrações 5 e 10): a página sai
+# lendo o índice em ordem, sem ordenar a tabela. Terminam sempre em nome,
+# id para a ordem ser estável. '{p}' é o prefixo da tabela na consulta.
+ORDENACOES = {
+    'nome': (('{p}nome', 'ASC'), ('{p}id', 'ASC')),
+    'populares': (('{p}pesquisas', 'DESC'), ('{p}nome', 'ASC'), ('{p}id', 'ASC')),
+    'origem': (('{p}origem', 'ASC'), ('{p}nome', 'ASC'), ('{p}id', 'ASC')),
+    'tamanho': (('length({p}nome)', 'ASC'), ('{p}nome', 'ASC'), ('{p}id', 'ASC')),
+}
+ORDENACAO_PADRAO = 'nome'
+
+
+class TempoEsgotado(Exception):
+    """A consulta passou do limite de tempo da rota ou o cliente desistiu dela."""
+
+
+def origem_chave(texto):
+    """
+    Chave de uma origem: sem espaços e em minúsculas, então as quebras da
+    extração do PDF ("Hebr aico", "Hebraic o") caem na mesma origem.
+    Igual à função origem_chave() do banco (migração 7).
+    """
+    return ''.join((texto or '').split()).lower()
+
+
+def origem_rotulo(texto):
+    """Nome de uma origem nova: sem espaços nas pontas nem repetidos."""
+    return ' '.join((texto or '').split())
+
+
+def nome_prefixo(texto, tamanho):
+    """Entrada do índice A-Z: nome_prefixo('maria', 2) == 'Ma'. Igual à do banco (migração 9)."""
+    texto = texto or ''
+    return texto[:1].upper() + texto[1:tamanho].lower()
+
+
+def _em_utc(valor):
+    """Data/hora lida do banco, com fuso UTC (o SQLite devolve 'AAAA-MM-DD HH:MM:SS' em UTC)."""
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=timezone.utc)
+    return valor
+
+
+def _conferir_ordem(ordem, apos, antes):
+    if ordem not in ORDENACOES:
+        raise ValueError(f"ordenação desconhecida: {ordem!r}")
+    if ordem != ORDENACAO_PADRAO and (apos is not None or antes is not None):
+        # Os cursores (nome, id) só valem para a ordem alfabética
+        raise ValueError(f"paginação por chave só na ordenação {ORDENACAO_PADRAO!r}")
+
+
+def _order_by(ordem, prefixo='', inverter=False):
+    """' ORDER BY ...' de uma ordenação de ORDENACOES (inverter: lida de trás para frente)."""
+    trocar = {'ASC': 'DESC', 'DESC': 'ASC'}
+    return " ORDER BY " + ", ".join(
+        f"{coluna.format(p=prefixo)} {trocar[direcao] if inverter else direcao}"
+        for coluna, direcao in ORDENACOES[ordem]
+    )
+
+
+class Armazenamento:
+    """
+    Interface comum a todos os armazenamentos.
+    O filtro de nome segue a semântica do ILIKE do PostgreSQL (sem
+    diferenciar maiúsculas; '%' e '_' são curingas). O de origem é exato,
+    pela chave normalizada (origem_chave): 'hebraico' acha "Hebraico".
+    Linhas são dicionários com as chaves de COLUNAS.
+    """
+
+    nome = 'base'
+
+    def inicializar(self):
+        """Cria/atualiza tabela e índices (aplica as migrações pendentes)."""
+        self.migrar()
+
+    def versao_schema(self):
+        """Versão do esquema aplicada no banco (consulta barata, feita no boot)."""
+        raise NotImplementedError
+
+    def migracoes_pendentes(self):
+        """[(versão, descrição)] das migrações que faltam aplicar."""
+        return [
+            (numero, descricao)
+            for numero, descricao, _ in migracoes.pendentes(self.MIGRACOES, self.versao_schema())
+        ]
+
+    def migrar(self):
+        """Aplica as migrações pendentes (veja migracoes.py). Retorna as versões aplicadas."""
+        raise NotImplementedError
+
+    # Lista de migrações do dialeto (veja migracoes.py)
+    MIGRACOES = []
+
+    def limpar(self):
+        """Apaga todos os nomes e reinicia os IDs."""
+        raise NotImplementedError
+
+    def contar(self, filtro_nome='', filtro_origem=''):
+        """
+        Quantos nomes contêm `filtro_nome` e são da origem `filtro_origem`.
+        Sem filtros é o total mantido a cada escrita: não percorre a tabela.
+        """
+        raise NotImplementedError
+
+    def geracao(self):
+        """
+        Número que muda sempre que nomes entram, saem ou mudam de nome/origem
+        (não muda com pesquisas). Contagens filtradas guardadas com a mesma
+        geração continuam valendo. Consulta barata: uma linha.
+        """
+        raise NotImplementedError
+
+    def versao_dados(self):
+        """
+        (versão, atualizado_em UTC) dos dados: muda com QUALQUER escrita,
+        inclusive o contador de pesquisas. Base do ETag/Last-Modified das páginas.
+        """
+        raise NotImplementedError
+
+    def estimar(self, filtro_nome='', filtro_origem=''):
+        """
+        Estimativa do planejador para contar(filtros), sem executar a contagem.
+        None quando o banco não estima (aí a contagem exata já é barata).
+        """
+        return None
+
+    def listar(self, filtro_nome='', filtro_origem='', limite=10, offset=0, apos=None, antes=None,
+               ordem=ORDENACAO_PADRAO):
+        """
+        Página de nomes filtrados, em ordem alfabética (nome, id) ou em
+        outra de ORDENACOES ('populares', 'origem', 'tamanho').
+        Paginação por chave (só na alfabética): apos=(nome, id) traz as
+        linhas seguintes a essa posição; antes=(nome, id) traz as `limite`
+        linhas imediatamente anteriores (ainda em ordem crescente). Não
+        depende do OFFSET. Ordenação fora da lista: ValueError.
+        """
+        raise NotImplementedError
+
+    def listar_em_fluxo(self, filtro_nome='', filtro_origem='', limite=10, offset=0,
+                        apos=None, antes=None, ordem=ORDENACAO_PADRAO):
+        """
+        Mesmas linhas de listar(), como um iterador PREGUIÇOSO: a consulta só
+        roda no primeiro next(), já dentro da resposta em streaming (um erro
+        ali vira aviso na tabela, veja paginacao.LinhasEmFluxo). A página
+        (no máximo 100 linhas) vem inteira numa leitura, e a conexão volta
+        ao pool antes de o template começar a usar as linhas: um cliente
+        lento não segura conexão nenhuma.
+        """
+        yield from self.listar(filtro_nome, filtro_origem, limite, offset, apos, antes, ordem)
+
+    def buscar_prefixo(self, termo):
+        """Nomes que COMEÇAM com `termo`, em ordem alfabética."""
+        raise NotImplementedError
+
+    def incrementar_pesquisas(self, ids):
+        """Soma 1 ao contador de pesquisas de cada id."""
+        raise NotImplementedError
+
+    def existe_nome(self, nome):
+        """True se já existe um nome igual (sem diferenciar maiúsculas)."""
+        raise NotImplementedError
+
+    def inserir(self, nome, significado, origem, motivo_escolha, pesquisas=0):
+        """Cadastra um nome. Retorna False se o nome já existia."""
+        raise NotImplementedError
+
+    def inserir_varios(self, linhas):
+        """
+        Carga em massa de tuplas (nome, significado, origem, motivo_escolha, pesquisas).
+        Nomes repetidos são ignorados. Retorna quantos foram inseridos.
+        """
+        raise NotImplementedError
+
+    def mais_pesquisados(self, limite=10):
+        """[{'nome', 'pesquisas'}] do mais pesquisado para o menos."""
+        raise NotImplementedError
+
+    def iniciais(self):
+        """
+        [{'prefixo', 'total', 'antes'}] do índice A-Z: uma linha por letra
+        inicial ('M') e por par de letras ('Ma'), na ordem da listagem.
+        'antes' é quantos nomes a listagem mostra antes do cursor (prefixo, 0),
+        na mesma ordenação (collation) dela: "Á" ou "maria" podem não cair
+        logo depois das letras anteriores. Totais e posições são mantidos a
+        cada escrita; ler não conta nada.
+        """
+        raise NotImplementedError
+
+    def contagem_por_origem(self):
+        """[{'origem', 'count'}] da origem mais comum para a menos comum."""
+        raise NotImplementedError
+
+    def todos(self):
+        """Todos os nomes (sem id), em ordem alfabética. Usado na exportação."""
+        raise NotImplementedError
+
+    # --- Consultas de página inteira ---
+    # Cada página pede tudo o que precisa de uma vez. Os bancos SQL respondem
+    # numa única ida e volta; aqui fica a versão simples, chamada a chamada.
+
+    def resumo_inicio(self, limite=10):
+        """(total de nomes, mais_pesquisados(limite)) para a página inicial."""
+        return self.contar(), self.mais_pesquisados(limite)
+
+    def pagina_listagem(self, filtro_nome='', filtro_origem='', limite=10, offset=0,
+                        apos=None, antes=None, ordem=ORDENACAO_PADRAO):
+        """(contar(filtros), listar(filtros, limite, offset, apos, antes, ordem)) para a listagem."""
+        return (self.contar(filtro_nome, filtro_origem),
+                self.listar(filtro_nome, filtro_origem, limite, offset, apos, antes, ordem))
+
+    def resumo_estatisticas(self, limite_top=5):
+        """(contagem_por_origem(), mais_pesquisados(limite_top)) para as estatísticas."""
+        return self.contagem_por_origem(), self.mais_pesquisados(limite_top)
+
+    # --- Resultados pré-calculados em segundo plano (veja agendador.py) ---
+
+    def ler_snapshot(self, nome):
+        """{'versao', 'conteudo', 'gerado_em'} do resultado pré-calculado `nome`, ou None."""
+        raise NotImplementedError
+
+    def gravar_snapshot(self, nome, versao, conteudo):
+        """Guarda (substitui) o resultado `nome`, calculado na `versao` dos dados. conteudo: texto."""
+        raise NotImplementedError
+
+    def tentar_lideranca(self):
+        """
+        True se ESTE processo é o líder, o único que roda as tarefas de fundo.
+        Quem consegue fica com a liderança enquanto viver; se o processo
+        morre, outro a assume na próxima tentativa. Aqui (memória) cada
+        processo tem os próprios dados: todos são líderes.
+        """
+        return True
+
+    def ler_do_primario(self, ativo):
+        """
+        Liga/desliga, para a requisição atual, a leitura no banco principal
+        (read-your-writes). Só faz diferença onde existem réplicas.
+        """
+
+    def fixar_leituras(self, ativo, origem=None):
+        """
+        Liga/desliga, para a requisição atual, uma origem única para todas as
+        leituras (a mesma réplica do começo ao fim). Só faz diferença onde
+        existem réplicas (veja db.fixar_leituras).
+        """
+
+    def conexao_livre(self):
+        """
+        True se uma leitura agora não teria que esperar conexão. Trabalho
+        opcional (aquecer a próxima página) só roda assim.
+        """
+        return True
+
+    def origem_das_leituras(self):
+        """
+        De onde vêm as leituras da requisição atual (None: de um lugar só).
+        Quem guarda algo lido do banco por versão (versao_dados.py) separa
+        por origem: uma réplica pode estar atrás da outra.
+        """
+        return None
+
+    def definir_limite(self, segundos=None, cancelado=None):
+        """
+        Limita as LEITURAS da requisição atual: cada consulta pode levar no
+        máximo `segundos`, e é interrompida se `cancelado()` devolver True.
+        Nos dois casos sobe TempoEsgotado. None desliga o limite.
+        (No armazenamento em memória não há o que interromper.)
+        """
+        self._requisicao().limite = (segundos, cancelado)
+
+    def _limite(self):
+        return getattr(self._requisicao(), 'limite', (None, None))
+
+    def _requisicao(self):
+        """Estado da requisição atual (um por thread/greenlet)."""
+        estado = self.__dict__.get('_estado_requisicao')
+        if estado is None:
+            estado = self.__dict__.setdefault('_estado_requisicao', threading.local())
+        return estado
+
+
+# ==========================================
+# BASE SQL (PostgreSQL e SQLite)
+# ==========================================
+
+class _ArmazenamentoSQL(Armazenamento):
+    """
+    Consultas comuns aos bancos SQL. As subclasses implementam _ler/_escrever
+    e dizem como comparar texto sem diferenciar maiúsculas (_ilike).
+    O SQL é escrito com marcadores %s.
+    """
+
+    def _ler(self, sql, params=(), primario=False):
+        raise NotImplementedError
+
+    def _escrever(self, sql, params=(), varios=False):
+        raise NotImplementedError
+
+    def _ilike(self, coluna):
+        """Trecho SQL '<coluna> ILIKE %s' no dialeto do banco."""
+        raise NotImplementedError
+
+    def _padrao(self, texto):
+        """Ajusta o parâmetro de um _ilike (ex.: minúsculas no SQLite)."""
+        return texto
+
+    def _where(self, filtro_nome, filtro_origem):
+        sql = " WHERE 1=1"
+        params = []
+        if filtro_nome:
+            sql += " AND " + self._ilike('nome')
+            params.append(self._padrao(f"%{filtro_nome}%"))
+        if filtro_origem:
+            # Igualdade no índice (origem_id, nome, id), não busca no texto
+            sql += " AND origem_id = (SELECT id FROM origens WHERE chave = %s)"
+            params.append(origem_chave(filtro_origem))
+        return sql, params
+
+    def _sql_contagem(self, filtro_nome, filtro_origem):
+        """SELECT de uma linha com a coluna 'total' (o contador, se não há filtro)."""
+        if not (filtro_nome or filtro_origem):
+            # Mantido pelos triggers da migração 4
+            return "SELECT total FROM nomes_contagem WHERE id = 1", []
+        if not filtro_nome:
+            # Total da origem, mantido pelos triggers da migração 7
+            return ("SELECT COALESCE((SELECT total FROM origens WHERE chave = %s), 0) AS total",
+                    [origem_chave(filtro_origem)])
+        where, params = self._where(filtro_nome, filtro_origem)
+        return "SELECT COUNT(id) AS total FROM nomes" + where, params
+
+    def contar(self, filtro_nome='', filtro_origem=''):
+        sql, params = self._sql_contagem(filtro_nome, filtro_origem)
+        linhas = self._ler(sql, params)
+        return linhas[0]['total'] if linhas else 0
+
+    def geracao(self):
+        linhas = self._ler("SELECT geracao FROM nomes_contagem WHERE id = 1")
+        return linhas[0]['geracao'] if linhas else 0
+
+    def versao_dados(self):
+        linhas = self._ler("SELECT versao, atualizado_em FROM nomes_contagem WHERE id = 1")
+        if not linhas:
+            return 0, datetime.fromtimestamp(0, timezone.utc)
+        return linhas[0]['versao'], _em_utc(linhas[0]['atualizado_em'])
+
+    def ler_snapshot(self, nome):
+        linhas = self._ler("SELECT versao, conteudo, gerado_em FROM snapshots WHERE nome = %s", [nome])
+        if not linhas:
+            return None
+        return dict(linhas[0], gerado_em=_em_utc(linhas[0]['gerado_em']))
+
+    def gravar_snapshot(self, nome, versao, conteudo):
+        self._escrever("""
+            INSERT INTO snapshots (nome, versao, conteudo, gerado_em)
+            VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (nome) DO UPDATE SET
+                versao = EXCLUDED.versao, conteudo = EXCLUDED.conteudo, gerado_em = EXCLUDED.gerado_em
+        """, [nome, versao, conteudo])
+
+    def _sql_pagina(self, filtro_nome, filtro_origem, apos, antes, ordem=ORDENACAO_PADRAO):
+        """
+        SELECT de uma página (com LIMIT %s OFFSET %s) e seus parâmetros de filtro.
+        Com `antes` a ordem é INVERTIDA (o índice é lido de trás para frente);
+        quem chama reordena.
+        """
+        _conferir_ordem(ordem, apos, antes)
+        where, params = self._where(filtro_nome, filtro_origem)
+        if apos is not None:
+            where += " AND (nome, id) > (%s, %s)"
+            params += list(apos)
+        elif antes is not None:
+            where += " AND (nome, id) < (%s, %s)"
+            params += list(antes)
+        if ordem == 'origem' and filtro_origem:
+            # Uma origem só: é a ordem alfabética, e assim usa o índice (origem_id, nome, id)
+            ordem = ORDENACAO_PADRAO
+        sql = (
+            "SELECT id, nome, significado, origem, motivo_escolha, pesquisas FROM nomes"
+            + where + _order_by(ordem, inverter=antes is not None) + " LIMIT %s OFFSET %s"
+        )
+        return sql, params
+
+    def listar(self, filtro_nome='', filtro_origem='', limite=10, offset=0, apos=None, antes=None,
+               ordem=ORDENACAO_PADRAO):
+        sql, params = self._sql_pagina(filtro_nome, filtro_origem, apos, antes, ordem)
+        if antes is not None:
+            sql = "SELECT * FROM (" + sql + ") p" + _order_by(ordem)
+        return self._ler(sql, params + [limite, offset])
+
+    def buscar_prefixo(self, termo):
+        sql = (
+            "SELECT id, nome, significado, origem, motivo_escolha, pesquisas FROM nomes"
+            " WHERE " + self._ilike('nome') + " ORDER BY nome ASC, id ASC"
+        )
+        return self._ler(sql, [self._padrao(f"{termo}%")])
+
+    def incrementar_pesquisas(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        marcadores = ", ".join(["%s"] * len(ids))
+        self._escrever(f"UPDATE nomes SET pesquisas = pesquisas + 1 WHERE id IN ({marcadores})", ids)
+
+    def existe_nome(self, nome):
+        # No primário: uma réplica pode ainda não ter o cadastro mais recente
+        sql = "SELECT id FROM nomes WHERE " + self._ilike('nome') + " LIMIT 1"
+        return bool(self._ler(sql, [self._padrao(nome)], primario=True))
+
+    _SQL_INSERIR = """
+        INSERT INTO nomes (nome, significado, origem, motivo_escolha, pesquisas)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (nome) DO NOTHING
+    """
+
+    def inserir(self, nome, significado, origem, motivo_escolha, pesquisas=0):
+        return self._escrever(self._SQL_INSERIR, (nome, significado, origem, motivo_escolha, pesquisas)) > 0
+
+    def inserir_varios(self, linhas):
+        antes = self.contar()
+        self._escrever(self._SQL_INSERIR, list(linhas), varios=True)
+        return self.contar() - antes
+
+    def mais_pesquisados(self, limite=10):
+        return self._ler(
+            "SELECT nome, pesquisas FROM nomes ORDER BY pesquisas DESC, nome ASC LIMIT %s",
+            [limite],
+        )
+
+    def iniciais(self):
+        # ORDER BY do próprio banco: a mesma ordenação (collation) da listagem.
+        # As posições ('antes') são mantidas pelos triggers da migração 12.
+        return self._ler(
+            "SELECT prefixo, total, antes FROM nomes_iniciais WHERE total > 0 ORDER BY prefixo"
+        )
+
+    # Totais prontos de 'origens' + os nomes sem origem (pelo índice de origem_id)
+    _SQL_POR_ORIGEM = """
+        SELECT nome AS origem, total AS count FROM origens WHERE total > 0
+        UNION ALL
+        SELECT NULL, n FROM (SELECT COUNT(*) AS n FROM nomes WHERE origem_id IS NULL) s WHERE n > 0
+    """
+
+    def contagem_por_origem(self):
+        return self._ler(
+            "SELECT origem, count FROM (" + self._SQL_POR_ORIGEM + ") o"
+            " ORDER BY count DESC, origem ASC"
+        )
+
+    def todos(self):
+        return self._ler("""
+            SELECT nome, significado, origem, motivo_escolha, pesquisas
+            FROM nomes
+            ORDER BY nome ASC, id ASC
+        """)
+
+    # --- Consultas de página inteira: UMA ida e volta ao banco ---
+    # A contagem fica numa subconsulta de uma linha e a lista é juntada a ela
+    # com LEFT JOIN ... ON 1=1: cada parte usa o seu melhor plano (a lista
+    # continua usando o índice) e, mesmo sem nenhuma linha na lista, o total
+    # vem. Funciona igual no PostgreSQL e no SQLite.
+
+    def resumo_inicio(self, limite=10):
+        linhas = self._ler("""
+            SELECT t.total, top.nome, top.pesquisas
+            FROM (SELECT total FROM nomes_contagem WHERE id = 1) t
+            LEFT JOIN (
+                SELECT nome, pesquisas FROM nomes
+                ORDER BY pesquisas DESC, nome ASC LIMIT %s
+            ) top ON 1=1
+            ORDER BY top.pesquisas DESC, top.nome ASC
+        """, [limite])
+        total = linhas[0]['total'] if linhas else 0
+        top = [{'nome': l['nome'], 'pesquisas': l['pesquisas']} for l in linhas if l['nome'] is not None]
+        return total, top
+
+    def _sql_pagina_listagem(self, filtro_nome, filtro_origem, apos, antes, ordem=ORDENACAO_PADRAO):
+        """SELECT de pagina_listagem() (total + página, com LIMIT %s OFFSET %s) e seus parâmetros de filtro."""
+        sql_total, params_total = self._sql_contagem(filtro_nome, filtro_origem)
+        sql_pagina, params = self._sql_pagina(filtro_nome, filtro_origem, apos, antes, ordem)
+        # Esta ordenação é só das `limite` linhas da página, já lidas pelo índice
+        sql = (
+            "SELECT t.total, p.id, p.nome, p.significado, p.origem, p.motivo_escolha, p.pesquisas"
+            " FROM (" + sql_total + ") t"
+            " LEFT JOIN (" + sql_pagina + ") p ON 1=1"
+            + _order_by(ordem, 'p.')
+        )
+        return sql, params_total + params
+
+    def pagina_listagem(self, filtro_nome='', filtro_origem='', limite=10, offset=0,
+                        apos=None, antes=None, ordem=ORDENACAO_PADRAO):
+        sql, params = self._sql_pagina_listagem(filtro_nome, filtro_origem, apos, antes, ordem)
+        linhas = self._ler(sql, params + [limite, offset])
+        total = linhas[0]['total'] if linhas else 0
+        pagina = [{k: l[k] for k in COLUNAS} for l in linhas if l['id'] is not None]
+        return total, pagina
+
+    def resumo_estatisticas(self, limite_top=5):
+        # Dois resultados de formato parecido, empilhados com UNION ALL
+        linhas = self._ler(
+            "SELECT 'origem' AS tipo, origem AS rotulo, count AS valor"
+            " FROM (" + self._SQL_POR_ORIGEM + ") o"
+            """
+            UNION ALL
+            SELECT 'top' AS tipo, nome AS rotulo, pesquisas AS valor
+            FROM (
+                SELECT nome, pesquisas FROM nomes
+                ORDER BY pesquisas DESC, nome ASC LIMIT %s
+            ) top
+        """, [limite_top])
+        origens = sorted(
+            ({'origem': l['rotulo'], 'count': l['valor']} for l in linhas if l['tipo'] == 'origem'),
+            key=lambda o: (-o['count'], o['origem'] or ''),
+        )
+        top = sorted(
+            ({'nome': l['rotulo'], 'pesquisas': l['valor']} for l in linhas if l['tipo'] == 'top'),
+            key=lambda t: (-t['pesquisas'], t['nome']),
+        )
+        return origens, top
+
+
+# ==========================================
+# POSTGRESQL (Supabase) - usa o pool e as réplicas do db.py
+# ==========================================
+
+class ArmazenamentoPostgres(_ArmazenamentoSQL):
+    nome = 'postgres'
+
+    # Advisory lock da liderança (outro número que o das migrações)
+    CHAVE_LIDERANCA = 72025032
+
+    def __init__(self):
+        import db  # Só aqui: os outros armazenamentos não precisam do psycopg2
+        from psycopg2.errors import QueryCanceled
+        self._db = db
+        self._cancelada = QueryCanceled
+        self._lideranca_lock = threading.Lock()
+        self._conexao_lideranca = None
+        self._lider = False
+
+    def ler_do_primario(self, ativo):
+        self._requisicao().primario = bool(ativo)
+
+    def fixar_leituras(self, ativo, origem=None):
+        self._db.fixar_leituras(ativo, origem)
+
+    def conexao_livre(self):
+        return self._db.conexao_livre(self.origem_das_leituras())
+
+    def origem_das_leituras(self):
+        if getattr(self._requisicao(), 'primario', False):
+            return self._db.PRIMARIO
+        return self._db.origem_das_leituras()
+
+    def _ilike(self, coluna):
+        return f"{coluna} ILIKE %s"
+
+    def _ler(self, sql, params=(), primario=False):
+        primario = primario or getattr(self._requisicao(), 'primario', False)
+        limite, cancelado = self._limite()
+        try:
+            colunas, linhas = self._db.executar_leitura(
+                sql, tuple(params), primario=primario, limite=limite, cancelado=cancelado
+            )
+        except self._cancelada as e:
+            raise TempoEsgotado(str(e).strip()) from e
+        return [dict(zip(colunas, linha)) for linha in linhas]
+
+    def estimar(self, filtro_nome='', filtro_origem=''):
+        if not filtro_nome:
+            return None  # Sem filtro ou só origem: o total exato já está pronto
+        # "Plan Rows" do EXPLAIN: vem das estatísticas do ANALYZE, sem ler a tabela
+        where, params = self._where(filtro_nome, filtro_origem)
+        linhas = self._ler("EXPLAIN (FORMAT JSON) SELECT id FROM nomes" + where, params)
+        if not linhas:
+            return None
+        plano = next(iter(linhas[0].values()))
+        return int(plano[0]['Plan']['Plan Rows'])
+
+    def _escrever(self, sql, params=(), varios=False):
+        inicio = time.perf_counter()
+        conn = self._db.get_connection()
+        espera_pool = time.perf_counter() - inicio
+        falhou = False
+        try:
+            cursor = conn.cursor()
+            try:
+                with metricas.Cronometro(sql, espera_pool) as medida:
+                    if varios:
+                        cursor.executemany(sql, params)
+                    else:
+                        cursor.execute(sql, tuple(params))
+                    conn.commit()
+                    medida.linhas = cursor.rowcount
+                return cursor.rowcount
+            finally:
+                cursor.close()
+        except Exception:
+            if conn.closed:
+                falhou = True
+            else:
+                conn.rollback()
+            raise
+        finally:
+            self._db.release_connection(conn, falhou=falhou)
+
+    MIGRACOES = migracoes.MIGRACOES_POSTGRES
+
+    def versao_schema(self):
+        return migracoes.versao_postgres(self._db)
+
+    def migrar(self):
+        return migracoes.migrar_postgres(self._db)
+
+    def limpar(self):
+        self._db.clear_db()
+
+    def tentar_lideranca(self):
+        # O advisory lock é da SESSÃO: vale enquanto esta conexão (fora do
+        # pool) estiver aberta, e o banco o solta sozinho se o worker morrer.
+        # Pede uma conexão direta: num pooler em modo transação a sessão
+        # não é sempre a mesma. Quem não pega o lock fecha a conexão na hora
+        # (senão cada worker seguidor prenderia uma conexão para sempre) e
+        # abre outra só na próxima tentativa.
+        with self._lideranca_lock:
+            try:
+                conn = self._conexao_lideranca
+                if conn is None or conn.closed:
+                    self._lider = False
+                    conn = self._conexao_lideranca = self._db.conexao_avulsa()
+                    conn.autocommit = True
+                cursor = conn.cursor()
+                try:
+                    if self._lider:
+                        cursor.execute("SELECT 1")  # Confere se a sessão (e o lock) segue viva
+                    else:
+                        cursor.execute("SELECT pg_try_advisory_lock(%s)", (self.CHAVE_LIDERANCA,))
+                        self._lider = cursor.fetchone()[0]
+                finally:
+                    cursor.close()
+                if not self._lider:
+                    conn.close()
+                    self._conexao_lideranca = None
+            except Exception as e:
+                print(f"[AVISO] Liderança indisponível: {e}")
+                if self._conexao_lideranca is not None:
+                    self._conexao_lideranca.close()
+                self._conexao_lideranca, self._lider = None, False
+            return self._lider
+
+
+# ==========================================
+# SQLITE - arquivo local em modo WAL
+# ==========================================
+
+class ArmazenamentoSQLite(_ArmazenamentoSQL):
+    nome = 'sqlite'
+
+    # Ajustes para leitura concorrente rápida com escrita segura:
+    # WAL deixa leitores e o escritor trabalharem ao mesmo tempo e
+    # synchronous=NORMAL é seguro em WAL (só perde a última transação se a
+    # máquina cair, nunca corrompe).
+    PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA cache_size = -20000",      # ~20 MB de cache de páginas
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA mmap_size = 268435456",    # 256 MB lidos via mmap
+        "PRAGMA busy_timeout = 5000",      # espera até 5s por um lock
+    )
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or os.environ.get('SQLITE_PATH', 'nomes.db')
+        self._local = threading.local()
+        # ':memory:' é um banco por conexão; para todas as threads verem os
+        # mesmos dados, usamos um banco em memória compartilhado.
+        self._uri = self.caminho == ':memory:'
+        if self._uri:
+            self.caminho = f"file:nomes_{id(self)}?mode=memory&cache=shared"
+            self._ancora = self._conectar()  # mantém o banco vivo
+        self._arquivo_lider = None
+
+    def _conectar(self):
+        conn = sqlite3.connect(self.caminho, uri=self._uri, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # lower() do SQLite só entende ASCII; este entende acentos, como o ILIKE
+        conn.create_function('minusculo', 1, lambda s: s.lower() if s is not None else None,
+                             deterministic=True)
+        # Usadas pelos triggers de origem (migração 7)
+        conn.create_function('origem_chave', 1, origem_chave, deterministic=True)
+        conn.create_function('origem_rotulo', 1, origem_rotulo, deterministic=True)
+        # Usada pelos triggers do índice A-Z (migração 9)
+        conn.create_function('nome_prefixo', 2, nome_prefixo, deterministic=True)
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _conexao(self):
+        """Uma conexão por thread (SQLite não compartilha bem entre threads)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._conectar()
+        return conn
+
+    def _ilike(self, coluna):
+        return f"minusculo({coluna}) LIKE %s"
+
+    def _padrao(self, texto):
+        return texto.lower()
+
+    # A cada quantas instruções da VM do SQLite o limite de tempo é conferido
+    PASSOS_ENTRE_VERIFICACOES = 20000
+
+    def _ler(self, sql, params=(), primario=False):
+        conn = self._conexao()
+        limite, cancelado = self._limite()
+        if limite or cancelado:
+            prazo = time.monotonic() + limite if limite else None
+
+            def interromper():
+                return bool((prazo is not None and time.monotonic() > prazo)
+                            or (cancelado is not None and cancelado()))
+
+            conn.set_progress_handler(interromper, self.PASSOS_ENTRE_VERIFICACOES)
+        try:
+            with metricas.Cronometro(sql, explicar=lambda: self._explicar(sql, params)) as medida:
+                cursor = conn.execute(sql.replace('%s', '?'), tuple(params))
+                linhas = [dict(linha) for linha in cursor.fetchall()]
+                medida.linhas = len(linhas)
+            return linhas
+        except sqlite3.OperationalError as e:
+            if 'interrupted' in str(e):
+                raise TempoEsgotado("consulta interrompida") from e
+            raise
+        finally:
+            if limite or cancelado:
+                conn.set_progress_handler(None, 0)
+
+    def _explicar(self, sql, params):
+        """Plano do SQLite (EXPLAIN QUERY PLAN), em texto; cada nó recuado sob o seu pai."""
+        cursor = self._conexao().execute("EXPLAIN QUERY PLAN " + sql.replace('%s', '?'), tuple(params))
+        profundidade, linhas = {0: -1}, []
+        for linha in cursor.fetchall():
+            profundidade[linha['id']] = profundidade.get(linha['parent'], -1) + 1
+            linhas.append("  " * profundidade[linha['id']] + linha['detail'])
+        return "\n".join(linhas)
+
+    def _escrever(self, sql, params=(), varios=False):
+        conn = self._conexao()
+        with metricas.Cronometro(sql) as medida:
+            with conn:  # commit no sucesso, rollback no erro
+                if varios:
+                    cursor = conn.executemany(sql.replace('%s', '?'), params)
+                else:
+                    cursor = conn.execute(sql.replace('%s', '?'), tuple(params))
+            medida.linhas = cursor.rowcount
+        return cursor.rowcount
+
+    MIGRACOES = migracoes.MIGRACOES_SQLITE
+
+    def versao_schema(self):
+        return migracoes.versao_sqlite(self._conexao())
+
+    def migrar(self):
+        return migracoes.migrar_sqlite(self._conexao())
+
+    def limpar(self):
+        conn = self._conexao()
+        with conn:
+            conn.execute("DELETE FROM nomes")
+            # Equivalente ao RESTART IDENTITY do PostgreSQL
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = 'nomes'")
+
+    def tentar_lideranca(self):
+        # Trava exclusiva num arquivo ao lado do banco: fica com o processo
+        # que a pegou, e o sistema a solta quando ele termina. Banco em
+        # memória ou sistema sem fcntl: um processo só, então é líder.
+        if self._uri or fcntl is None or self._arquivo_lider is not None:
+            return True
+        arquivo = open(self.caminho + '.lider', 'a')
+        try:
+            fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            arquivo.close()
+            return False
+        self._arquivo_lider = arquivo
+        return True
+
+
+# ==========================================
+# MEMÓRIA - listas e dicionários Python
+# ==========================================
+
+def _like(padrao):
+    """Converte um padrão ILIKE ('%', '_') em regex sem diferenciar maiúsculas."""
+    partes = []
+    for c in padrao:
+        if c == '%':
+            partes.append('.*')
+        elif c == '_':
+            partes.append('.')
+        else:
+            partes.append(re.escape(c))
+    return re.compile(''.join(partes), re.IGNORECASE | re.DOTALL)
+
+
+class ArmazenamentoMemoria(Armazenamento):
+    nome = 'memoria'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._linhas = {}   # id -> linha
+        self._nomes = set() # nomes exatos já usados (UNIQUE)
+        self._origens = {}  # origem_chave -> {'nome': canônico, 'total': n}
+        self._prefixos = {} # 'M' / 'Ma' -> quantos nomes começam assim
+        self._antes = {}    # 'M' / 'Ma' -> quantos nomes vêm antes do cursor (prefixo, 0)
+        self._proximo_id = 1
+        self._geracao = 0
+        self._versao = (0, datetime.now(timezone.utc))
+        self._snapshots = {}  # nome -> {'versao', 'conteudo', 'gerado_em'}
+
+    def versao_schema(self):
+        return migracoes.VERSAO_ATUAL  # Sem esquema: sempre "atualizado"
+
+    def migrar(self):
+        return []
+
+    def limpar(self):
+        with self._lock:
+            self._linhas.clear()
+            self._nomes.clear()
+            for origem in self._origens.values():
+                origem['total'] = 0
+            self._prefixos.clear()
+            self._antes.clear()
+            self._proximo_id = 1
+            self._geracao += 1
+            self._mudou()
+
+    def _filtrar(self, filtro_nome, filtro_origem):
+        regra_nome = _like(f"%{filtro_nome}%") if filtro_nome else None
+        chave = origem_chave(filtro_origem) if filtro_origem else None
+        with self._lock:
+            linhas = list(self._linhas.values())
+        return [
+            l for l in linhas
+            if (regra_nome is None or regra_nome.fullmatch(l['nome']))
+            and (chave is None or origem_chave(l['origem']) == chave)
+        ]
+
+    @staticmethod
+    def _ordem_alfabetica(linhas):
+        return sorted(linhas, key=lambda l: (l['nome'], l['id']))
+
+    # As mesmas ordens de ORDENACOES (origem vazia por último, como no PostgreSQL)
+    _CHAVES_DE_ORDEM = {
+        'nome': lambda l: (l['nome'], l['id']),
+        'populares': lambda l: (-(l['pesquisas'] or 0), l['nome'], l['id']),
+        'origem': lambda l: (l['origem'] is None, l['origem'] or '', l['nome'], l['id']),
+        'tamanho': lambda l: (len(l['nome']), l['nome'], l['id']),
+    }
+
+    def contar(self, filtro_nome='', filtro_origem=''):
+        if not (filtro_nome or filtro_origem):
+            with self._lock:
+                return len(self._linhas)
+        return len(self._filtrar(filtro_nome, filtro_origem))
+
+    def geracao(self):
+        with self._lock:
+            return self._geracao
+
+    def versao_dados(self):
+        with self._lock:
+            return self._versao
+
+    def _mudou(self):
+        """Nova versão dos dados (chamado com o lock já pego)."""
+        self._versao = (self._versao[0] + 1, datetime.now(timezone.utc))
+
+    def listar(self, filtro_nome='', filtro_origem='', limite=10, offset=0, apos=None, antes=None,
+               ordem=ORDENACAO_PADRAO):
+        _conferir_ordem(ordem, apos, antes)
+        linhas = sorted(self._filtrar(filtro_nome, filtro_origem), key=self._CHAVES_DE_ORDEM[ordem])
+        if apos is not None:
+            linhas = [l for l in linhas if (l['nome'], l['id']) > tuple(apos)]
+        elif antes is not None:
+            linhas = [l for l in linhas if (l['nome'], l['id']) < tuple(antes)]
+            fim = max(len(linhas) - offset, 0)
+            return [dict(l) for l in linhas[max(fim - limite, 0):fim]]
+        return [dict(l) for l in linhas[offset:offset + limite]]
+
+    def buscar_prefixo(self, termo):
+        regra = _like(f"{termo}%")
+        with self._lock:
+            linhas = [l for l in self._linhas.values() if regra.fullmatch(l['nome'])]
+        return [dict(l) for l in self._ordem_alfabetica(linhas)]
+
+    def incrementar_pesquisas(self, ids):
+        with self._lock:
+            alterou = False
+            for i in ids:
+                if i in self._linhas:
+                    self._linhas[i]['pesquisas'] += 1
+                    alterou = True
+            if alterou:
+                self._mudou()
+
+    def existe_nome(self, nome):
+        regra = _like(nome)
+        with self._lock:
+            return any(regra.fullmatch(l['nome']) for l in self._linhas.values())
+
+    def inserir(self, nome, significado, origem, motivo_escolha, pesquisas=0):
+        with self._lock:
+            if nome in self._nomes:
+                return False
+            self._nomes.add(nome)
+            chave = origem_chave(origem)
+            if chave:
+                # Mesma regra dos triggers da migração 7
+                registro = self._origens.setdefault(chave, {'nome': origem_rotulo(origem), 'total': 0})
+                registro['total'] += 1
+                origem = registro['nome']
+            # Como os triggers da migração 12: andam as posições que já
+            # existem, e o prefixo novo é contado uma vez
+            for prefixo in self._antes:
+                if nome < prefixo:
+                    self._antes[prefixo] += 1
+            for tamanho in (1, 2):
+                if len(nome) >= tamanho:
+                    prefixo = nome_prefixo(nome, tamanho)
+                    self._prefixos[prefixo] = self._prefixos.get(prefixo, 0) + 1
+                    if prefixo not in self._antes:
+                        self._antes[prefixo] = sum(1 for n in self._nomes if n < prefixo)
+            self._linhas[self._proximo_id] = {
+                'id': self._proximo_id, 'nome': nome, 'significado': significado,
+                'origem': origem, 'motivo_escolha': motivo_escolha, 'pesquisas': pesquisas,
+            }
+            self._proximo_id += 1
+            self._geracao += 1
+            self._mudou()
+            return True
+
+    def inserir_varios(self, linhas):
+        return sum(1 for linha in linhas if self.inserir(*linha))
+
+    def mais_pesquisados(self, limite=10):
+        with self._lock:
+            linhas = sorted(self._linhas.values(), key=lambda l: (-l['pesquisas'], l['nome']))
+        return [{'nome': l['nome'], 'pesquisas': l['pesquisas']} for l in linhas[:limite]]
+
+    def iniciais(self):
+        with self._lock:
+            return [{'prefixo': p, 'total': t, 'antes': self._antes[p]}
+                    for p, t in sorted(self._prefixos.items()) if t > 0]
+
+    def contagem_por_origem(self):
+        with self._lock:
+            contagem = [(o['nome'], o['total']) for o in self._origens.values() if o['total'] > 0]
+            sem_origem = sum(1 for l in self._linhas.values() if not origem_chave(l['origem']))
+        if sem_origem:
+            contagem.append((None, sem_origem))
+        ordem = sorted(contagem, key=lambda item: (-item[1], item[0] or ''))
+        return [{'origem': origem, 'count': total} for origem, total in ordem]
+
+    def todos(self):
+        with self._lock:
+            linhas = list(self._linhas.values())
+        return [
+            {k: l[k] for k in COLUNAS if k != 'id'}
+            for l in self._ordem_alfabetica(linhas)
+        ]
+
+    def ler_snapshot(self, nome):
+        with self._lock:
+            snapshot = self._snapshots.get(nome)
+            return dict(snapshot) if snapshot is not None else None
+
+    def gravar_snapshot(self, nome, versao, conteudo):
+        with self._lock:
+            self._snapshots[nome] = {
+                'versao': versao, 'conteudo': conteudo, 'gerado_em': datetime.now(timezone.utc),
+            }
+
+
+# ==========================================
+# ESCOLHA DO ARMAZENAMENTO
+# ==========================================
+
+ARMAZENAMENTOS = {
+    'postgres': ArmazenamentoPostgres,
+    'sqlite': ArmazenamentoSQLite,
+    'memoria': ArmazenamentoMemoria,
+}
+
+
+def criar(tipo=None):
+    """Cria o armazenamento pedido (ou o da variável ARMAZENAMENTO)."""
+    tipo = (tipo or os.environ.get('ARMAZENAMENTO', 'postgres')).strip().lower()
+    if tipo not in ARMAZENAMENTOS:
+        raise ValueError(
+            f"ARMAZENAMENTO inválido: '{tipo}'. Use um de: {', '.join(ARMAZENAMENTOS)}."
+        )
+    return ARMAZENAMENTOS[tipo]()
@@ -0,0 +1,148 @@
+# ==========================================
+# benchmark_ordenacoes.py - CADA ORDENAÇÃO DA LISTAGEM SAI DO ÍNDICE?
+# ==========================================
+# Para cada ordenação de armazenamento.ORDENACOES, pega o plano da consulta
+# que a rota /listar faz (pagina_listagem: o total + a página, numa ida só)
+# para a primeira página e uma funda (com OFFSET), e mede o tempo dela.
+#
+# A página tem que ser lida do índice já em ordem. O único nó de ordenação
+# ("USE TEMP B-TREE FOR ORDER BY" no SQLite, "Sort" no PostgreSQL) aceito
+# é o de FORA, que reordena a página já pronta (MATERIALIZE p no SQLite; no
+# PostgreSQL a raiz do plano, com no máximo `por_pagina` linhas). Qualquer
+# outro quer dizer que o banco ordenou a tabela inteira para devolver
+# `por_pagina` linhas - aí o script termina com erro.
+#
+# Uso:
+#   python benchmark_ordenacoes.py                    # SQLite temporário, 200 mil nomes
+#   python benchmark_ordenacoes.py --linhas 1000000 --por-pagina 50
+#   python benchmark_ordenacoes.py --postgres         # banco do .env, SÓ LEITURA
+#
+# No SQLite os nomes são gerados aqui (banco descartável). No PostgreSQL
+# usa os dados que já estão lá (DATABASE_URL) e não grava nada; o plano é
+# o real (EXPLAIN ANALYZE), então cada página é executada mais uma vez.
+# ==========================================
+
+import argparse
+import os
+import random
+import re
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+import armazenamento
+
+ORIGENS = ('Hebraico', 'Latim', 'Grego', 'Germânico', 'Tupi', 'Árabe', 'Celta', 'Persa')
+
+# Nó de ordenação no plano de cada banco
+_ORDENOU = {
+    'sqlite': re.compile(r'TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY'),
+    'postgres': re.compile(r'(^|->)\s*(Incremental )?Sort\s+\(', re.MULTILINE),
+}
+
+
+def gerar_nomes(quantidade, semente=2025):
+    """Tuplas para inserir_varios(): nomes únicos, origens e pesquisas variadas."""
+    aleatorio = random.Random(semente)
+    for i in range(quantidade):
+        base = ''.join(aleatorio.choice(string.ascii_lowercase) for _ in range(aleatorio.randint(2, 9)))
+        yield (
+            f"{base.title()}{i}",
+            "significado",
+            aleatorio.choice(ORIGENS),
+            "motivo",
+            int(aleatorio.paretovariate(1.2)) - 1,  # poucos nomes muito pesquisados
+        )
+
+
+def plano(banco, sql, params):
+    if isinstance(banco, armazenamento.ArmazenamentoSQLite):
+        return banco._explicar(sql, params)
+    import db
+    return db.explicar_consulta(sql, params)
+
+
+def ordenou_a_tabela(tipo, texto, limite):
+    """
+    True se o plano tem um nó de ordenação que não seja o de fora, sobre a
+    página já lida (no máximo `limite` linhas).
+    """
+    linhas = texto.splitlines()
+    for i, linha in enumerate(linhas):
+        if not _ORDENOU[tipo].search(linha):
+            continue
+        if tipo == 'sqlite':
+            # Fora (sem recuo) e com a página à parte: ordena só as linhas dela
+            de_fora = linha == linha.lstrip() and any(l in ('MATERIALIZE p', 'CO-ROUTINE p') for l in linhas)
+        else:
+            # A raiz do plano, e com as linhas que de fato ordenou
+            linhas_ordenadas = re.search(r'actual time=\S+ rows=(\d+)', linha)
+            de_fora = i == 0 and linhas_ordenadas is not None and int(linhas_ordenadas.group(1)) <= limite
+        if not de_fora:
+            return True
+    return False
+
+
+def medir(banco, ordem, limite, offset, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        banco.pagina_listagem(limite=limite, offset=offset, ordem=ordem)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plano e tempo de cada ordenação da listagem")
+    parser.add_argument('--linhas', type=int, default=200_000, help="nomes no SQLite temporário")
+    parser.add_argument('--por-pagina', type=int, default=50)
+    parser.add_argument('--pagina-funda', type=int, default=100, help="número da página com OFFSET")
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--postgres', action='store_true', help="usa o PostgreSQL do .env (só leitura)")
+    args = parser.parse_args()
+
+    if args.postgres:
+        tipo = 'postgres'
+        banco = armazenamento.ArmazenamentoPostgres()
+    else:
+        tipo = 'sqlite'
+        pasta = tempfile.mkdtemp(prefix='bench_ordenacoes_')
+        banco = armazenamento.ArmazenamentoSQLite(os.path.join(pasta, 'nomes.db'))
+        banco.inicializar()
+        inicio = time.perf_counter()
+        banco.inserir_varios(list(gerar_nomes(args.linhas)))
+        banco._conexao().execute("ANALYZE")
+        print(f"SQLite em {pasta}: {args.linhas:,} nomes carregados em {time.perf_counter() - inicio:.1f}s")
+
+    pendentes = banco.migracoes_pendentes()
+    if pendentes:
+        print(f"❌ Esquema desatualizado (faltam {[n for n, _ in pendentes]}): rode python migracoes.py")
+        sys.exit(1)
+
+    print(f"{banco.contar():,} nomes | {args.por_pagina} por página | "
+          f"página funda: {args.pagina_funda} | mediana de {args.repeticoes} execuções\n")
+    falhas = []
+    for ordem in armazenamento.ORDENACOES:
+        for pagina in (1, args.pagina_funda):
+            offset = (pagina - 1) * args.por_pagina
+            sql, params = banco._sql_pagina_listagem('', '', None, None, ordem)
+            texto = plano(banco, sql, params + [args.por_pagina, offset])
+            ordenou = ordenou_a_tabela(tipo, texto, args.por_pagina)
+            ms = medir(banco, ordem, args.por_pagina, offset, args.repeticoes)
+            print(f"{'❌' if ordenou else '✅'} {ordem:<10} página {pagina:<5} {ms:8.2f} ms  "
+                  f"{'ORDENOU A TABELA' if ordenou else 'lida do índice'}")
+            for linha in texto.splitlines():
+                print(f"      {linha}")
+            if ordenou:
+                falhas.append((ordem, pagina))
+
+    if falhas:
+        print(f"\n❌ Ordenações sem índice que sirva: {falhas} (veja a migração 10)")
+        sys.exit(1)
+    print("\n✅ Todas as ordenações servem a página direto do índice.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# ==========================================
+# benchmark_servidores.py - COMPARA GUNICORN SYNC x ASYNC (gevent)
+# ==========================================
+# Sobe o app duas vezes (MODO_SERVIDOR=sync e MODO_SERVIDOR=async, veja
+# gunicorn.conf.py) e dispara muitas requisições simultâneas contra a mesma
+# rota, medindo vazão, latência e erros.
+#
+# Uso:
+#   python benchmark_servidores.py                      # rota "/", 500 clientes, 20s
+#   python benchmark_servidores.py --rota /listar --clientes 2000 --duracao 30
+#   python benchmark_servidores.py --modos async        # só um dos modos
+#
+# Usa o mesmo .env do app (DATABASE_URL etc.): a latência medida inclui a
+# ida e volta real até o banco, que é justamente o que o modo async esconde.
+# ==========================================
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+
+def esperar_porta(porta, timeout=30):
+    """Espera o gunicorn começar a aceitar conexões."""
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            with socket.create_connection(('127.0.0.1', porta), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+async def uma_requisicao(porta, rota, timeout):
+    """Faz um GET simples (HTTP/1.1, Connection: close) e devolve o status."""
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection('127.0.0.1', porta), timeout
+    )
+    try:
+        writer.write(
+            f"GET {rota} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        resposta = await asyncio.wait_for(reader.read(), timeout)
+        return int(resposta.split(b' ', 2)[1])
+    finally:
+        writer.close()
+
+
+async def carga(porta, rota, clientes, duracao, timeout):
+    """Mantém `clientes` requisições em voo durante `duracao` segundos."""
+    latencias = []
+    erros = 0
+    fim = time.perf_counter() + duracao
+
+    async def cliente():
+        nonlocal erros
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            try:
+                status = await uma_requisicao(porta, rota, timeout)
+                if status >= 400:
+                    erros += 1
+                else:
+                    latencias.append(time.perf_counter() - inicio)
+            except Exception:
+                erros += 1
+
+    await asyncio.gather(*(cliente() for _ in range(clientes)))
+    return latencias, erros
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def rodar_modo(modo, args, porta):
+    """Sobe o gunicorn no modo pedido, mede e derruba."""
+    env = dict(os.environ, MODO_SERVIDOR=modo, PORT=str(porta))
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+           '--workers', str(args.workers), '--log-level', 'warning']
+    if modo == 'sync':
+        cmd += ['--threads', str(args.threads)]
+    cmd.append(args.app)
+
+    servidor = subprocess.Popen(cmd, env=env)
+    try:
+        if not esperar_porta(porta):
+            print(f"[ERRO] gunicorn ({modo}) não subiu na porta {porta}.")
+            return None
+        asyncio.run(carga(porta, args.rota, min(args.clientes, 50), 2, args.timeout))  # aquecimento
+        inicio = time.perf_counter()
+        latencias, erros = asyncio.run(
+            carga(porta, args.rota, args.clientes, args.duracao, args.timeout)
+        )
+        tempo = time.perf_counter() - inicio
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=30)
+
+    return {
+        'modo': modo,
+        'ok': len(latencias),
+        'erros': erros,
+        'rps': len(latencias) / tempo if tempo else 0.0,
+        'p50': percentil(latencias, 50) * 1000,
+        'p95': percentil(latencias, 95) * 1000,
+        'p99': percentil(latencias, 99) * 1000,
+        'media': (statistics.mean(latencias) * 1000) if latencias else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gunicorn sync x async (gevent).")
+    parser.add_argument('--app', default='app:app')
+    parser.add_argument('--rota', default='/')
+    parser.add_argument('--clientes', type=int, default=500, help="requisições simultâneas")
+    parser.add_argument('--duracao', type=float, default=20, help="segundos de carga por modo")
+    parser.add_argument('--timeout', type=float, default=30, help="timeout por requisição (s)")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4, help="threads por worker no modo sync")
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--modos', default='sync,async')
+    args = parser.parse_args()
+
+    resultados = []
+    for i, modo in enumerate(m.strip() for m in args.modos.split(',')):
+        print(f"🔄 Medindo modo {modo}: {args.clientes} clientes em {args.rota} por {args.duracao}s...")
+        r = rodar_modo(modo, args, args.porta + i)
+        if r:
+            resultados.append(r)
+
+    print()
+    print(f"{'modo':<6} {'ok':>8} {'erros':>7} {'req/s':>9} {'média ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for r in resultados:
+        print(f"{r['modo']:<6} {r['ok']:>8} {r['erros']:>7} {r['rps']:>9.1f} {r['media']:>9.1f} "
+              f"{r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
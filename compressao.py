@@ -0,0 +1,307 @@
+# ==========================================
+# compressao.py - COMPRESSÃO DAS RESPOSTAS (gzip / brotli)
+# ==========================================
+# O gunicorn manda tudo sem compressão. Este middleware WSGI:
+#   - negocia a codificação pelo Accept-Encoding (br > gzip, respeitando q=0);
+#   - comprime páginas geradas (HTML, CSV, JSON...) EM FLUXO: cada pedaço
+#     que a aplicação entrega sai comprimido na hora (serve para respostas
+#     em streaming), sem juntar o corpo inteiro na memória;
+#   - para arquivos de static/ entrega a variante .br/.gz pré-comprimida,
+#     gerada uma vez só (precomprimir_estaticos, chamado no boot do gunicorn).
+#
+# Brotli é opcional: sem o pacote 'brotli' instalado fica só o gzip.
+# COMPRESSAO=0 desliga tudo (ex.: quando um proxy na frente já comprime).
+#
+# Relatório de bytes trafegados por rota (sem / gzip / br):
+#   ARMAZENAMENTO=sqlite python compressao.py --relatorio
+# ==========================================
+
+import gzip
+import mimetypes
+import os
+import sys
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Opcional: sem ele, só gzip
+    brotli = None
+
+COMPRESSAO_ATIVA = os.environ.get('COMPRESSAO', '1') != '0'
+# Respostas menores que isso (bytes) não compensam o cabeçalho extra
+TAMANHO_MINIMO = 512
+# Nível para páginas geradas: rápido (cada requisição paga a compressão)
+NIVEL_GZIP = 6
+QUALIDADE_BROTLI = 4
+
+TIPOS_COMPRESSIVEIS = (
+    'text/', 'application/json', 'application/javascript',
+    'application/xml', 'image/svg+xml',
+)
+# Extensões de static/ que ganham variantes pré-comprimidas
+EXTENSOES_ESTATICAS = ('.css', '.js', '.svg', '.png', '.txt', '.json')
+# Uma variante só é mantida se economizar pelo menos isso (PNG já vem comprimido)
+ECONOMIA_MINIMA = 0.05
+
+
+def codificacoes_aceitas(accept_encoding):
+    """
+    Conjunto de codificações aceitas (q > 0) de um Accept-Encoding. O '*'
+    vale para as que não foram citadas: "br;q=0, *" não aceita brotli.
+    """
+    aceitas, recusadas = set(), set()
+    for parte in (accept_encoding or '').split(','):
+        nome, _, parametros = parte.strip().partition(';')
+        nome = nome.strip().lower()
+        if not nome:
+            continue
+        q = 1.0
+        parametro = parametros.strip()
+        if parametro.startswith('q='):
+            try:
+                q = float(parametro[2:])
+            except ValueError:
+                q = 0.0
+        (aceitas if q > 0 else recusadas).add(nome)
+    if '*' in aceitas:
+        aceitas.update({'gzip', 'br'} - recusadas)
+    return aceitas
+
+
+def escolher_codificacao(accept_encoding):
+    """'br', 'gzip' ou None, na ordem de preferência."""
+    aceitas = codificacoes_aceitas(accept_encoding)
+    if brotli is not None and 'br' in aceitas:
+        return 'br'
+    if 'gzip' in aceitas:
+        return 'gzip'
+    return None
+
+
+class _Compressor:
+    """compress()/flush() iguais para gzip e brotli."""
+
+    def __init__(self, codificacao):
+        if codificacao == 'br':
+            self._br = brotli.Compressor(quality=QUALIDADE_BROTLI)
+            self._gz = None
+        else:
+            self._br = None
+            self._gz = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)  # 31 = cabeçalho gzip
+
+    def pedaco(self, dados):
+        """Comprime e descarrega: o cliente recebe o pedaço sem esperar o resto."""
+        if self._br is not None:
+            return self._br.process(dados) + self._br.flush()
+        return self._gz.compress(dados) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def fim(self):
+        if self._br is not None:
+            return self._br.finish()
+        return self._gz.flush(zlib.Z_FINISH)
+
+
+def _cabecalho(cabecalhos, nome):
+    nome = nome.lower()
+    for chave, valor in cabecalhos:
+        if chave.lower() == nome:
+            return valor
+    return None
+
+
+def _sem(cabecalhos, *nomes):
+    nomes = {n.lower() for n in nomes}
+    return [(k, v) for k, v in cabecalhos if k.lower() not in nomes]
+
+
+def _com_vary(cabecalhos):
+    vary = _cabecalho(cabecalhos, 'Vary')
+    if vary and 'accept-encoding' in vary.lower():
+        return cabecalhos
+    return _sem(cabecalhos, 'Vary') + [('Vary', f"{vary}, Accept-Encoding" if vary else 'Accept-Encoding')]
+
+
+def _etag_fraco(cabecalhos):
+    # A representação comprimida não é idêntica byte a byte: ETag forte vira fraco
+    etag = _cabecalho(cabecalhos, 'ETag')
+    if etag and not etag.startswith('W/'):
+        return _sem(cabecalhos, 'ETag') + [('ETag', 'W/' + etag)]
+    return cabecalhos
+
+
+class Compressao:
+    """
+    Middleware WSGI: app.wsgi_app = Compressao(app.wsgi_app, app.static_folder, app.static_url_path)
+    """
+
+    def __init__(self, aplicacao, pasta_estatica=None, url_estatica='/static'):
+        self.aplicacao = aplicacao
+        self.pasta_estatica = os.path.abspath(pasta_estatica) if pasta_estatica else None
+        self.url_estatica = url_estatica.rstrip('/') + '/'
+
+    def __call__(self, environ, start_response):
+        codificacao = escolher_codificacao(environ.get('HTTP_ACCEPT_ENCODING'))
+        if codificacao is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self._com_vary_apenas(environ, start_response)
+
+        caminho = environ.get('PATH_INFO', '')
+        if self.pasta_estatica and caminho.startswith(self.url_estatica):
+            variante = self._variante_estatica(caminho, codificacao, environ, start_response)
+            if variante is not None:
+                return variante
+
+        estado = {}
+
+        def start_response_comprimindo(status, cabecalhos, exc_info=None):
+            if self._deve_comprimir(status, cabecalhos):
+                estado['compressor'] = _Compressor(codificacao)
+                cabecalhos = _sem(_etag_fraco(cabecalhos), 'Content-Length')
+                cabecalhos = _com_vary(cabecalhos + [('Content-Encoding', codificacao)])
+            return start_response(status, cabecalhos, exc_info)
+
+        corpo = self.aplicacao(environ, start_response_comprimindo)
+        if 'compressor' not in estado:
+            return corpo
+        return self._comprimir(corpo, estado['compressor'])
+
+    def _com_vary_apenas(self, environ, start_response):
+        # Sem compressão aceita, mas a resposta ainda depende do cabeçalho (caches)
+        def start_response_vary(status, cabecalhos, exc_info=None):
+            if self._deve_comprimir(status, cabecalhos):
+                cabecalhos = _com_vary(cabecalhos)
+            return start_response(status, cabecalhos, exc_info)
+        return self.aplicacao(environ, start_response_vary)
+
+    @staticmethod
+    def _deve_comprimir(status, cabecalhos):
+        if not status.startswith('200') or _cabecalho(cabecalhos, 'Content-Encoding'):
+            return False
+        tipo = (_cabecalho(cabecalhos, 'Content-Type') or '').lower()
+        if not tipo.startswith(TIPOS_COMPRESSIVEIS):
+            return False
+        tamanho = _cabecalho(cabecalhos, 'Content-Length')
+        return tamanho is None or int(tamanho) >= TAMANHO_MINIMO
+
+    @staticmethod
+    def _comprimir(corpo, compressor):
+        try:
+            for pedaco in corpo:
+                if pedaco:
+                    saida = compressor.pedaco(pedaco)
+                    if saida:
+                        yield saida
+            yield compressor.fim()
+        finally:
+            if hasattr(corpo, 'close'):
+                corpo.close()
+
+    def _variante_estatica(self, caminho, codificacao, environ, start_response):
+        """Serve static/<arquivo>.br|.gz (mais novo que o original), se existir."""
+        relativo = caminho[len(self.url_estatica):]
+        original = os.path.abspath(os.path.join(self.pasta_estatica, relativo))
+        if not original.startswith(self.pasta_estatica + os.sep) or not os.path.isfile(original):
+            return None
+        sufixo = '.br' if codificacao == 'br' else '.gz'
+        variante = original + sufixo
+        if not os.path.isfile(variante) or os.path.getmtime(variante) < os.path.getmtime(original):
+            return None
+        tipo = mimetypes.guess_type(original)[0] or 'application/octet-stream'
+
+        def start_response_variante(status, cabecalhos, exc_info=None):
+            if status.startswith(('200', '206', '304')):
+                # Para o navegador é o próprio arquivo (sem "filename=style.css.gz")
+                cabecalhos = _sem(cabecalhos, 'Content-Type', 'Content-Encoding', 'Content-Disposition')
+                cabecalhos = _com_vary(cabecalhos + [('Content-Type', tipo),
+                                                     ('Content-Encoding', codificacao)])
+            return start_response(status, cabecalhos, exc_info)
+
+        # O próprio Flask serve a variante (com ETag, 304 e Range dela)
+        environ = dict(environ, PATH_INFO=caminho + sufixo)
+        return self.aplicacao(environ, start_response_variante)
+
+
+# ==========================================
+# VARIANTES PRÉ-COMPRIMIDAS DE static/
+# ==========================================
+
+def precomprimir_estaticos(pasta, forcar=False):
+    """
+    Gera <arquivo>.gz (e .br, com brotli instalado) no nível máximo para os
+    arquivos de `pasta`. Só refaz o que estiver desatualizado. Variantes que
+    não economizam ECONOMIA_MINIMA (ex.: a maioria dos PNGs) são descartadas.
+    Retorna [(arquivo, original, {codificação: tamanho ou None})].
+    """
+    relatorio = []
+    for raiz, _, arquivos in os.walk(pasta):
+        for nome in sorted(arquivos):
+            if not nome.lower().endswith(EXTENSOES_ESTATICAS):
+                continue
+            caminho = os.path.join(raiz, nome)
+            with open(caminho, 'rb') as f:
+                dados = f.read()
+            tamanhos = {}
+            for sufixo, comprimir in _compressores_estaticos():
+                destino = caminho + sufixo
+                if (not forcar and os.path.isfile(destino)
+                        and os.path.getmtime(destino) >= os.path.getmtime(caminho)):
+                    tamanhos[sufixo[1:]] = os.path.getsize(destino)
+                    continue
+                comprimido = comprimir(dados)
+                if len(comprimido) <= len(dados) * (1 - ECONOMIA_MINIMA):
+                    with open(destino, 'wb') as f:
+                        f.write(comprimido)
+                    tamanhos[sufixo[1:]] = len(comprimido)
+                else:
+                    if os.path.isfile(destino):
+                        os.remove(destino)
+                    tamanhos[sufixo[1:]] = None
+            relatorio.append((os.path.relpath(caminho, pasta), len(dados), tamanhos))
+    return relatorio
+
+
+def _compressores_estaticos():
+    # mtime=0: o mesmo arquivo gera sempre os mesmos bytes
+    yield '.gz', lambda dados: gzip.compress(dados, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda dados: brotli.compress(dados, quality=11)
+
+
+# ==========================================
+# RELATÓRIO: BYTES TRAFEGADOS POR ROTA
+# ==========================================
+
+ROTAS_DO_RELATORIO = ('/', '/listar', '/listar?per_page=100', '/top10', '/estatisticas',
+                      '/exportar_csv', '/buscar', '/cadastrar',
+                      '/graficos/origens.png', '/graficos/origens.svg',
+                      '/static/css/style.css', '/static/origens.png', '/static/nomes_comuns.png')
+
+
+def _relatorio(rotas=ROTAS_DO_RELATORIO):
+    from app import app  # Só aqui: o relatório precisa do banco configurado
+
+    pasta = app.static_folder
+    for arquivo, original, tamanhos in precomprimir_estaticos(pasta):
+        variantes = ", ".join(f"{c}={t if t is not None else 'descartada'}" for c, t in tamanhos.items())
+        print(f"static/{arquivo}: {original} B -> {variantes}")
+    print()
+
+    cliente = app.test_client()
+    codificacoes = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+    print(f"{'rota':28} " + " ".join(f"{c:>10}" for c in codificacoes) + "   redução")
+    for rota in rotas:
+        tamanhos = []
+        for codificacao in codificacoes:
+            resposta = cliente.get(rota, headers={'Accept-Encoding': codificacao})
+            tamanhos.append(len(resposta.get_data()))
+        melhor = min(tamanhos)
+        reducao = 100 * (1 - melhor / tamanhos[0]) if tamanhos[0] else 0
+        print(f"{rota:28} " + " ".join(f"{t:>10}" for t in tamanhos) + f"   {reducao:6.1f}%")
+
+
+if __name__ == '__main__':
+    if '--relatorio' in sys.argv:
+        _relatorio()
+    else:
+        pasta = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+        for arquivo, original, tamanhos in precomprimir_estaticos(pasta, forcar='--forcar' in sys.argv):
+            print(f"static/{arquivo}: {original} B -> {tamanhos}")
@@ -0,0 +1,44 @@
+# ==========================================
+# conftest.py - O APP DE TESTE (armazenamento em memória)
+# ==========================================
+# Os testes das rotas importam o app.py com o armazenamento em memória e
+# sem o agendador (nenhuma thread de fundo, nenhum banco de verdade). O
+# módulo é importado uma vez; cada teste recomeça com os mesmos nomes e
+# com os caches do worker vazios.
+# ==========================================
+
+import os
+
+import pytest
+
+NOMES_DO_APP = [
+    # (nome, significado, origem, motivo_escolha, pesquisas)
+    ("Ana", "Graciosa", "Hebraico", "Tradição", 5),
+    ("Bruno", "Moreno", "Germânico", "Som", 9),
+    ("Carla", "Forte", "Germânico", "Família", 2),
+    ("Daniel", "Deus é meu juiz", "Hebraico", "Bíblia", 9),
+    ("Mariana", "Amada", "Latim", "Avó", 1),
+]
+
+
+@pytest.fixture
+def app_teste(monkeypatch):
+    os.environ['ARMAZENAMENTO'] = 'memoria'
+    os.environ['AGENDADOR'] = '0'
+    import app as modulo
+    assert modulo.banco.nome == 'memoria', "app.py já importado com outro armazenamento"
+    modulo.banco.limpar()
+    modulo.banco.inserir_varios(NOMES_DO_APP)
+    modulo.versao_dados.invalidar()
+    modulo.paginas.limpar()
+    modulo.graficos.limpar()
+    # Sem snapshot das estatísticas: cada teste grava o seu, se quiser
+    monkeypatch.setattr(modulo.banco, '_snapshots', {})
+    monkeypatch.setattr(modulo, 'snapshot_estatisticas', modulo.servico_estatisticas.Estatisticas(modulo.banco))
+    monkeypatch.setattr(modulo.paginas, 'aquecer', False)
+    return modulo
+
+
+@pytest.fixture
+def cliente(app_teste):
+    return app_teste.app.test_client()
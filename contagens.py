@@ -0,0 +1,169 @@
+# ==========================================
+# contagens.py - SERVIÇO DE CONTAGENS DA LISTAGEM
+# ==========================================
+# COUNT(*) com filtro percorre todas as linhas que casam; em filtros amplos
+# é a parte mais cara da página. Este serviço evita repeti-lo:
+#   - total sem filtro: contador exato mantido pelo banco a cada escrita
+#     (tabela nomes_contagem, migração 4) - nunca é um COUNT;
+#   - contagens filtradas: guardadas por filtro, valem enquanto a "geração"
+#     do banco (muda a cada cadastro/remoção) for a mesma;
+#   - filtros muito amplos: estimativa do planejador (PostgreSQL) em vez da
+#     contagem exata, e a página mostra "cerca de N resultados";
+#   - origens com seus totais (o filtro da listagem) e o índice A-Z: prontos
+#     no banco (migrações 7 e 9), guardados aqui pela mesma geração.
+#
+# O cache é por worker. A geração é relida do banco no máximo a cada
+# CONTAGEM_GERACAO_TTL segundos, então a escrita feita em OUTRO worker
+# aparece nas contagens deste em até esse tempo (neste worker, na hora).
+# ==========================================
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from armazenamento import ORDENACAO_PADRAO, origem_chave
+
+# Acima dessa estimativa a listagem mostra "cerca de N" em vez de contar
+CONTAGEM_EXATA_ATE = int(os.environ.get('CONTAGEM_EXATA_ATE', 5000))
+# Segundos entre duas leituras da geração do banco
+CONTAGEM_GERACAO_TTL = float(os.environ.get('CONTAGEM_GERACAO_TTL', 5))
+# Quantos filtros diferentes guardar (os menos usados saem)
+CONTAGENS_MAX = 1024
+
+
+def arredondar(n):
+    """Estimativa com 2 algarismos significativos (12.345 -> 12.000): precisão honesta."""
+    if n < 100:
+        return n
+    escala = 10 ** (len(str(n)) - 2)
+    return round(n / escala) * escala
+
+
+class Contagens:
+    """Contagens da listagem com cache por filtro. Um por worker (veja app.py)."""
+
+    def __init__(self, banco, exata_ate=CONTAGEM_EXATA_ATE, ttl=CONTAGEM_GERACAO_TTL):
+        self._banco = banco
+        self.exata_ate = exata_ate
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # (nome, origem) -> (geração, total, aproximado)
+        self._geracao = None
+        self._geracao_lida_em = 0.0
+        self._listas = {}  # 'origens' / 'iniciais' -> (geração, lista)
+
+    def geracao(self):
+        """Geração atual do banco (relida no máximo a cada `ttl` segundos)."""
+        agora = time.monotonic()
+        with self._lock:
+            if self._geracao is not None and agora - self._geracao_lida_em < self.ttl:
+                return self._geracao
+        geracao = self._banco.geracao()
+        with self._lock:
+            self._geracao, self._geracao_lida_em = geracao, agora
+        return geracao
+
+    def invalidar(self):
+        """
+        Força reler a geração na próxima contagem. Chamado depois de uma
+        escrita deste worker: as contagens que ela mudou deixam de valer.
+        """
+        with self._lock:
+            self._geracao = None
+
+    @staticmethod
+    def _chave(filtro_nome, filtro_origem):
+        # Nome: ILIKE não diferencia maiúsculas. Origem: a chave normalizada
+        return (filtro_nome or '').lower(), origem_chave(filtro_origem)
+
+    def _guardado(self, chave, geracao):
+        with self._lock:
+            guardado = self._cache.get(chave)
+            if guardado is None or guardado[0] != geracao:
+                return None
+            self._cache.move_to_end(chave)
+            return guardado[1], guardado[2]
+
+    def _guardar(self, chave, geracao, total, aproximado):
+        with self._lock:
+            self._cache[chave] = (geracao, total, aproximado)
+            self._cache.move_to_end(chave)
+            while len(self._cache) > CONTAGENS_MAX:
+                self._cache.popitem(last=False)
+
+    def pagina(self, filtro_nome='', filtro_origem='', limite=10, offset=0, apos=None, antes=None,
+               ordem=ORDENACAO_PADRAO):
+        """
+        (total, aproximado, linhas) de uma página da listagem
+        (apos/antes: paginação por chave; ordem: veja Armazenamento.listar).
+        Contagem em cache: só a página vai ao banco. Sem cache: filtros
+        pequenos são contados junto com a página (uma ida ao banco, como
+        antes); filtros com estimativa acima de `exata_ate` usam a estimativa.
+        """
+        chave = self._chave(filtro_nome, filtro_origem)
+        geracao = self.geracao()
+        guardado = self._guardado(chave, geracao)
+        if guardado is not None:
+            total, aproximado = guardado
+            linhas = self._banco.listar(filtro_nome, filtro_origem, limite, offset, apos, antes, ordem)
+            return total, aproximado, linhas
+
+        estimativa = self._banco.estimar(filtro_nome, filtro_origem) if any(chave) else None
+        if estimativa is not None and estimativa > self.exata_ate:
+            total, aproximado = arredondar(estimativa), True
+            linhas = self._banco.listar(filtro_nome, filtro_origem, limite, offset, apos, antes, ordem)
+        else:
+            total, linhas = self._banco.pagina_listagem(
+                filtro_nome, filtro_origem, limite, offset, apos, antes, ordem
+            )
+            aproximado = False
+        # Guardada com a geração lida ANTES de contar: se alguém gravou no
+        # meio, a próxima leitura da geração já invalida esta contagem.
+        self._guardar(chave, geracao, total, aproximado)
+        return total, aproximado, linhas
+
+    def contar(self, filtro_nome='', filtro_origem=''):
+        """
+        Só (total, aproximado), sem a página: para quem vai buscar as linhas
+        de outro jeito (listagem em streaming). Mesmas regras de pagina().
+        """
+        chave = self._chave(filtro_nome, filtro_origem)
+        geracao = self.geracao()
+        guardado = self._guardado(chave, geracao)
+        if guardado is not None:
+            return guardado
+
+        estimativa = self._banco.estimar(filtro_nome, filtro_origem) if any(chave) else None
+        if estimativa is not None and estimativa > self.exata_ate:
+            total, aproximado = arredondar(estimativa), True
+        else:
+            total, aproximado = self._banco.contar(filtro_nome, filtro_origem), False
+        self._guardar(chave, geracao, total, aproximado)
+        return total, aproximado
+
+    def origens(self):
+        """
+        [{'origem', 'count'}] em ordem alfabética, para o filtro da listagem.
+        Os totais já vêm prontos do banco; relidos só quando a geração muda.
+        """
+        return self._da_geracao('origens', lambda: sorted(
+            (o for o in self._banco.contagem_por_origem() if o['origem']),
+            key=lambda o: o['origem'].lower(),
+        ))
+
+    def iniciais(self):
+        """Armazenamento.iniciais(), relido só quando a geração muda."""
+        return self._da_geracao('iniciais', self._banco.iniciais)
+
+    def _da_geracao(self, nome, carregar):
+        # Guardada com a geração lida ANTES de carregar (como as contagens)
+        geracao = self.geracao()
+        with self._lock:
+            guardada = self._listas.get(nome)
+            if guardada is not None and guardada[0] == geracao:
+                return guardada[1]
+        lista = carregar()
+        with self._lock:
+            self._listas[nome] = (geracao, lista)
+        return lista
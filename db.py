@@ -1,29 +1,340 @@
 import os
-from psycopg2 import pool
+import itertools
+import threading
+import time
+from psycopg2 import pool, connect, OperationalError, InterfaceError
+from psycopg2.errors import QueryCanceled
 from dotenv import load_dotenv
 
+import metricas
+
 # Carregar variáveis do .env
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-if not DATABASE_URL:
-    raise Exception("❌ Faltando a variável DATABASE_URL no .env!")
+# Réplicas de leitura (opcional), separadas por vírgula. Sem elas tudo vai
+# para o DATABASE_URL, como antes.
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
 
-connection_pool = None
+# Tamanho do pool e tempo máximo (segundos) que uma requisição espera por uma
+# conexão livre. No modo async (gevent) milhares de requisições dividem essas
+# conexões; com o pooler do Supabase (porta 6543) dá para subir DB_POOL_MAX.
+# Cada réplica tem um pool próprio do mesmo tamanho.
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 5))  # Mantém uso leve
+DB_POOL_ESPERA = float(os.getenv("DB_POOL_ESPERA", 10))
 
-def get_connection():
-    """Obtém uma conexão do pool."""
-    global connection_pool
-    if connection_pool is None:
-        print("🔄 Inicializando pool de conexões PostgreSQL (Supabase/Render)...")
-        connection_pool = pool.ThreadedConnectionPool(
-            minconn=1,
-            maxconn=5,  # Mantém uso leve
-            dsn=DATABASE_URL,
+# Réplica com atraso maior que isso (segundos) deixa de receber leituras.
+DB_REPLICA_ATRASO_MAX = float(os.getenv("DB_REPLICA_ATRASO_MAX", 5))
+# De quanto em quanto tempo o atraso de cada réplica é medido.
+DB_REPLICA_CHECAGEM = float(os.getenv("DB_REPLICA_CHECAGEM", 10))
+# Por quanto tempo uma réplica que falhou fica fora da rotação.
+DB_REPLICA_QUARENTENA = float(os.getenv("DB_REPLICA_QUARENTENA", 30))
+# De quanto em quanto tempo (segundos) uma consulta cancelável confere se
+# deve ser cancelada (ex.: o cliente fechou a conexão).
+DB_VIGIA_INTERVALO = float(os.getenv("DB_VIGIA_INTERVALO", 0.25))
+
+
+class _PoolComEspera:
+    """
+    ThreadedConnectionPool que ESPERA uma conexão ser devolvida quando todas
+    estão em uso (o pool do psycopg2 sozinho lança 'connection pool exhausted').
+    """
+
+    def __init__(self, dsn, nome):
+        self.nome = nome
+        # Criado na primeira conexão (e não no import) para que, no worker
+        # gevent, o semáforo já seja a versão cooperativa do monkey-patch.
+        self._vagas = threading.BoundedSemaphore(DB_POOL_MAX)
+        self._em_uso = 0
+        self._contagem_lock = threading.Lock()
+        self._pool = pool.ThreadedConnectionPool(
+            minconn=DB_POOL_MIN,
+            maxconn=DB_POOL_MAX,
+            dsn=dsn,
             sslmode='require' # Necessário para Supabase/Render
         )
-    return connection_pool.getconn()
+
+    def getconn(self):
+        if not self._vagas.acquire(timeout=DB_POOL_ESPERA):
+            raise pool.PoolError(f"Nenhuma conexão livre em '{self.nome}' após {DB_POOL_ESPERA}s de espera.")
+        try:
+            conn = self._pool.getconn()
+        except Exception:
+            self._vagas.release()
+            raise
+        with self._contagem_lock:
+            self._em_uso += 1
+        return conn
+
+    def putconn(self, conn, close=False):
+        try:
+            self._pool.putconn(conn, close=close)
+        finally:
+            with self._contagem_lock:
+                self._em_uso -= 1
+            self._vagas.release()
+
+    def livres(self):
+        """Quantas conexões dá para pegar agora sem esperar."""
+        return DB_POOL_MAX - self._em_uso
+
+
+class _Replica:
+    """Estado de uma réplica: pool, último atraso medido e quarentena."""
+
+    def __init__(self, dsn, numero):
+        self.dsn = dsn
+        self.nome = f"réplica {numero}"
+        self.pool = None
+        self.atraso = 0.0
+        self.checada_em = 0.0
+        self.fora_ate = 0.0
+
+    def disponivel(self, agora):
+        return agora >= self.fora_ate and self.atraso <= DB_REPLICA_ATRASO_MAX
+
+
+_primario = None
+_replicas = [_Replica(dsn, i) for i, dsn in enumerate(DATABASE_REPLICA_URLS, 1)]
+_rodizio = itertools.count()
+# Nome da origem das leituras quando elas vão ao primário (veja fixar_leituras)
+PRIMARIO = "primário"
+# Origem fixada das leituras da requisição atual (por thread; por greenlet no gevent)
+_fixacao = threading.local()
+_pool_lock = threading.Lock()
+# conexão emprestada -> pool de onde veio (para devolver no lugar certo)
+_emprestadas = {}
+
+def get_connection():
+    """
+    Obtém uma conexão do PRIMÁRIO (escritas e leituras que precisam do dado
+    mais recente). Se todas estiverem em uso, espera uma ser devolvida.
+    Devolva com release_connection().
+    """
+    global _primario
+    if _primario is None:
+        # Só é obrigatória quando o PostgreSQL é usado de fato (veja armazenamento.py)
+        if not DATABASE_URL:
+            raise Exception("❌ Faltando a variável DATABASE_URL no .env!")
+        with _pool_lock:
+            if _primario is None:
+                print("🔄 Inicializando pool de conexões PostgreSQL (Supabase/Render)...")
+                _primario = _PoolComEspera(DATABASE_URL, "primário")
+    conn = _primario.getconn()
+    _emprestadas[id(conn)] = _primario
+    return conn
+
+def conexao_avulsa():
+    """
+    Conexão própria com o PRIMÁRIO, fora do pool, para quem a segura por
+    muito tempo (ex.: a liderança das tarefas de fundo). Feche com close().
+    """
+    if not DATABASE_URL:
+        raise Exception("❌ Faltando a variável DATABASE_URL no .env!")
+    return connect(DATABASE_URL, sslmode='require')
+
+def _medir_atraso(replica, conn):
+    """Atualiza o atraso de replicação (segundos) da réplica."""
+    cursor = conn.cursor()
+    try:
+        # Sem WAL pendente a réplica está em dia, mesmo que o primário esteja ocioso.
+        cursor.execute("""
+            SELECT CASE
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+            END
+        """)
+        replica.atraso = float(cursor.fetchone()[0] or 0)
+        conn.commit()
+    finally:
+        cursor.close()
+    replica.checada_em = time.monotonic()
+    if replica.atraso > DB_REPLICA_ATRASO_MAX:
+        print(f"⚠️ {replica.nome} atrasada {replica.atraso:.1f}s; leituras vão para outra réplica/primário.")
+
+def _marcar_falha(replica, erro):
+    replica.fora_ate = time.monotonic() + DB_REPLICA_QUARENTENA
+    print(f"⚠️ {replica.nome} fora da rotação por {DB_REPLICA_QUARENTENA:.0f}s: {erro}")
+
+def fixar_leituras(ativo, origem=None):
+    """
+    Liga/desliga, para a thread (requisição) atual, uma ORIGEM ÚNICA para as
+    leituras: uma réplica saudável escolhida agora (round-robin) ou, sem
+    nenhuma, o primário. Assim a versão dos dados e as linhas da página saem
+    do mesmo servidor, e a versão nunca é mais nova que as linhas. Se a
+    réplica fixada falhar ou atrasar, a requisição passa (e fica) no
+    primário, que nunca está atrás de ninguém.
+    `origem`: fixa numa origem já escolhida (veja origem_das_leituras),
+    ex.: na thread que aquece a próxima página da mesma requisição.
+    """
+    if not ativo:
+        _fixacao.origem = None
+        return
+    agora = time.monotonic()
+    disponiveis = [r for r in _replicas if r.disponivel(agora)]
+    if origem is not None:
+        disponiveis = [r for r in disponiveis if r.nome == origem]
+        if not disponiveis and origem != PRIMARIO:
+            origem = PRIMARIO
+    if origem is None:
+        origem = disponiveis[next(_rodizio) % len(disponiveis)].nome if disponiveis else PRIMARIO
+    _fixacao.origem = origem
+
+def origem_das_leituras():
+    """Nome da origem fixada das leituras (PRIMARIO ou 'réplica N'), ou None sem fixação."""
+    return getattr(_fixacao, 'origem', None)
+
+def conexao_livre(origem=None):
+    """
+    True se a `origem` das leituras (veja origem_das_leituras; None: o
+    primário) tem conexão livre agora. Para trabalho opcional (ex.: aquecer
+    a próxima página) não disputar o pool com as requisições.
+    """
+    if origem is None or origem == PRIMARIO:
+        pool_da_origem = _primario
+    else:
+        pool_da_origem = next((r.pool for r in _replicas if r.nome == origem), None)
+    # Pool ainda não criado: nenhuma conexão em uso
+    return pool_da_origem is None or pool_da_origem.livres() > 0
+
+def get_read_connection():
+    """
+    Obtém uma conexão para SELECT: a próxima réplica saudável (round-robin),
+    ou a réplica fixada da requisição (fixar_leituras). Réplicas atrasadas
+    ou fora do ar são puladas; sem nenhuma disponível, a leitura cai no
+    primário. Devolva com release_connection().
+    """
+    agora = time.monotonic()
+    fixada = origem_das_leituras()
+    if fixada == PRIMARIO:
+        return get_connection()
+    candidatas = [r for r in _replicas if agora >= r.fora_ate and fixada in (None, r.nome)]
+    if candidatas:
+        inicio = next(_rodizio)
+        for i in range(len(candidatas)):
+            replica = candidatas[(inicio + i) % len(candidatas)]
+            conn = None
+            try:
+                if replica.pool is None:
+                    with _pool_lock:
+                        if replica.pool is None:
+                            replica.pool = _PoolComEspera(replica.dsn, replica.nome)
+                conn = replica.pool.getconn()
+                _emprestadas[id(conn)] = replica
+                if agora - replica.checada_em >= DB_REPLICA_CHECAGEM:
+                    _medir_atraso(replica, conn)
+                if replica.disponivel(agora):
+                    return conn
+                release_connection(conn)
+            except (OperationalError, InterfaceError, pool.PoolError) as e:
+                if conn is not None:
+                    release_connection(conn, falhou=True)
+                else:
+                    _marcar_falha(replica, e)
+    if fixada is not None:
+        _fixacao.origem = PRIMARIO  # A réplica fixada saiu: o resto da requisição vai ao primário
+    return get_connection()
+
+def is_replica(conn):
+    """True se a conexão veio de uma réplica (e não do primário)."""
+    return isinstance(_emprestadas.get(id(conn)), _Replica)
+
+def release_connection(conn, falhou=False):
+    """
+    Devolve a conexão ao pool de onde ela veio e libera a vaga para quem
+    estiver esperando. falhou=True descarta a conexão e, se for de réplica,
+    tira a réplica da rotação por um tempo.
+    """
+    origem = _emprestadas.pop(id(conn), None) or _primario
+    if isinstance(origem, _Replica):
+        if falhou:
+            _marcar_falha(origem, "erro de conexão")
+        origem.pool.putconn(conn, close=falhou)
+    else:
+        origem.putconn(conn, close=falhou)
+
+def _vigiar(conn, cancelado, parar):
+    """Roda ao lado da consulta e a cancela no servidor se cancelado() ficar True."""
+    while not parar.wait(DB_VIGIA_INTERVALO):
+        try:
+            if cancelado():
+                conn.cancel()
+                return
+        except Exception as e:
+            print(f"[ERRO] vigia de cancelamento: {e}")
+            return
+
+def executar_leitura(query, params=None, primario=False, unico=False, limite=None, cancelado=None):
+    """
+    Executa um SELECT e devolve (colunas, linhas) — ou (colunas, linha) se unico=True.
+    Vai para uma réplica, a não ser que primario=True. Se a réplica cair no
+    meio da consulta, ela sai da rotação e a consulta é repetida no primário.
+
+    limite: segundos máximos da consulta (statement_timeout só desta transação).
+    cancelado: função sem argumentos; se devolver True durante a consulta,
+    ela é cancelada. Nos dois casos sobe psycopg2.errors.QueryCanceled.
+    """
+    inicio = time.perf_counter()
+    conn = get_connection() if primario else get_read_connection()
+    espera_pool = time.perf_counter() - inicio
+    falhou = False
+    vigia = parar = None
+    try:
+        cursor = conn.cursor()
+        try:
+            if limite:
+                # SET LOCAL vale só até o fim desta transação: a conexão volta
+                # ao pool sem limite nenhum para a próxima requisição.
+                cursor.execute("SET LOCAL statement_timeout = %s", (max(1, int(limite * 1000)),))
+            if cancelado is not None:
+                parar = threading.Event()
+                vigia = threading.Thread(target=_vigiar, args=(conn, cancelado, parar), daemon=True)
+                vigia.start()
+            with metricas.Cronometro(
+                query, espera_pool, explicar=lambda: explicar_consulta(query, params, primario)
+            ) as medida:
+                cursor.execute(query, params or ())
+                columns = [desc[0] for desc in cursor.description]
+                resultado = cursor.fetchone() if unico else cursor.fetchall()
+                medida.linhas = cursor.rowcount
+            return columns, resultado
+        finally:
+            if vigia is not None:
+                parar.set()
+                vigia.join()
+            cursor.close()
+    except QueryCanceled:
+        raise  # Tempo esgotado ou cancelamento: a réplica está saudável
+    except (OperationalError, InterfaceError):
+        falhou = True
+        if not is_replica(conn):
+            raise
+    finally:
+        release_connection(conn, falhou=falhou)
+    if origem_das_leituras() is not None:
+        _fixacao.origem = PRIMARIO  # Não volta para a réplica que caiu
+    return executar_leitura(query, params, primario=True, unico=unico, limite=limite, cancelado=cancelado)
+
+def explicar_consulta(query, params=None, primario=False, limite=30):
+    """
+    Plano REAL de um SELECT (EXPLAIN ANALYZE, BUFFERS), em texto.
+    Atenção: executa a consulta de novo. Usado pelo metricas.py nas lentas.
+    """
+    conn = get_connection() if primario else get_read_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SET LOCAL statement_timeout = %s", (int(limite * 1000),))
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params or ())
+            return "\n".join(linha[0] for linha in cursor.fetchall())
+        finally:
+            cursor.close()
+    finally:
+        release_connection(conn)
 
 def clear_db():
     """Deleta todos os dados da tabela 'nomes' e reinicia o contador SERIAL ID."""
@@ -44,54 +355,4 @@ def clear_db():
     finally:
         if conn:
             cursor.close()
-            connection_pool.putconn(conn)
-
-def init_db():
-    """Cria tabela 'nomes' se não existir e garante a restrição UNIQUE."""
-    conn = None
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # 1. Cria a tabela (sem o UNIQUE inicialmente para evitar conflito se já existir)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS nomes (
-                id SERIAL PRIMARY KEY,
-                nome VARCHAR(255) NOT NULL,
-                significado TEXT,
-                origem VARCHAR(100),
-                motivo_escolha TEXT,
-                pesquisas INTEGER DEFAULT 0
-            );
-        """)
-        
-        # 2. Tenta adicionar a restrição UNIQUE, ignorando o erro se ela já existir.
-        # Isso garante que a restrição seja aplicada, mesmo se a tabela já existia.
-        try:
-            cursor.execute("""
-                ALTER TABLE nomes 
-                ADD CONSTRAINT nomes_nome_unique 
-                UNIQUE (nome);
-            """)
-            print("✅ Restrição UNIQUE na coluna 'nome' aplicada.")
-        except Exception:
-             # Se der erro aqui (porque a restrição já existe), precisamos reverter a transação no banco.
-            conn.rollback() # <<<<<< CORREÇÃO APLICADA AQUI
-            pass
-        
-        # 3. Cria índices (opcional, mas bom para performance)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_nome ON nomes(nome);
-            CREATE INDEX IF NOT EXISTS idx_origem ON nomes(origem);
-        """)
-        
-        conn.commit()
-        print("✅ Tabela 'nomes' verificada/ajustada com sucesso no PostgreSQL.")
-    except Exception as e:
-        print(f"❌ Erro ao inicializar o banco: {e}")
-        # Re-raise para o app.py capturar e encerrar se o banco falhar
-        raise 
-    finally:
-        if conn:
-            cursor.close()
-            connection_pool.putconn(conn)
+            release_connection(conn)
@@ -0,0 +1,137 @@
+# ==========================================
+# estaticos.py - ARQUIVOS DE static/ COM HASH NO NOME (cache imutável)
+# ==========================================
+# Sem isso o navegador revalida style.css e os PNGs a cada página. Com o
+# conteúdo no nome, o arquivo nunca muda naquela URL e pode ser guardado
+# por um ano sem perguntar de novo:
+#
+#   static/css/style.css  ->  static/css/style.3f9a1c2b7e.css  (cópia)
+#   static/manifesto.json  {"css/style.css": "css/style.3f9a1c2b7e.css", ...}
+#
+# O app.py troca o nome em url_for('static', filename=...) pelo do manifesto
+# e responde esses arquivos com Cache-Control: immutable, max-age=1 ano.
+# Mudou o CSS? Muda o hash, muda a URL: ninguém fica com a versão velha.
+#
+# Passo de build (também roda no boot do gunicorn, antes da pré-compressão):
+#   python estaticos.py
+# Sem manifesto (ou desatualizado) o app tenta gerar sozinho; se o disco
+# for somente leitura, usa os nomes originais com o cache normal.
+# ESTATICOS_COM_HASH=0 desliga.
+# ==========================================
+
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+
+ESTATICOS_COM_HASH = os.environ.get('ESTATICOS_COM_HASH', '1') != '0'
+MANIFESTO = 'manifesto.json'
+TAMANHO_HASH = 10
+# Um ano: o conteúdo daquela URL nunca muda
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+
+# nome.<hash>.ext (as cópias geradas aqui)
+_COM_HASH = re.compile(r'\.[0-9a-f]{%d}\.[^./]+$' % TAMANHO_HASH)
+# Variantes pré-comprimidas (compressao.py)
+_VARIANTES = ('.gz', '.br')
+
+
+def originais(pasta):
+    """Arquivos de `pasta` que ganham cópia com hash (caminhos relativos, com '/')."""
+    for raiz, diretorios, arquivos in os.walk(pasta):
+        diretorios[:] = sorted(d for d in diretorios if not d.startswith('.'))
+        for nome in sorted(arquivos):
+            relativo = os.path.relpath(os.path.join(raiz, nome), pasta).replace(os.sep, '/')
+            if (nome.startswith('.') or relativo == MANIFESTO
+                    or nome.endswith(_VARIANTES) or _COM_HASH.search(nome)):
+                continue
+            yield relativo
+
+
+def com_hash(relativo, dados):
+    """'css/style.css' + conteúdo -> 'css/style.<hash>.css'."""
+    base, extensao = os.path.splitext(relativo)
+    return f"{base}.{hashlib.sha256(dados).hexdigest()[:TAMANHO_HASH]}{extensao}"
+
+
+def gerar(pasta):
+    """
+    Cria as cópias com hash que faltam, apaga as de versões antigas e grava
+    o manifesto. Só escreve o que mudou. Retorna o manifesto (dict).
+    """
+    manifesto = {}
+    for relativo in originais(pasta):
+        with open(os.path.join(pasta, relativo), 'rb') as f:
+            dados = f.read()
+        destino = com_hash(relativo, dados)
+        manifesto[relativo] = destino
+        if not os.path.isfile(os.path.join(pasta, destino)):
+            _gravar(pasta, destino, dados)
+
+    # Cópias de conteúdos que não existem mais (e as variantes .gz/.br delas)
+    atuais = set(manifesto.values())
+    for raiz, _, arquivos in os.walk(pasta):
+        for nome in arquivos:
+            relativo = os.path.relpath(os.path.join(raiz, nome), pasta).replace(os.sep, '/')
+            for variante in _VARIANTES:
+                if relativo.endswith(variante):
+                    relativo = relativo[:-len(variante)]
+            if _COM_HASH.search(relativo) and relativo not in atuais:
+                os.remove(os.path.join(raiz, nome))
+
+    conteudo = json.dumps(manifesto, indent=2, sort_keys=True).encode('utf-8')
+    caminho = os.path.join(pasta, MANIFESTO)
+    try:
+        with open(caminho, 'rb') as f:
+            mudou = f.read() != conteudo
+    except OSError:
+        mudou = True
+    if mudou:
+        _gravar(pasta, MANIFESTO, conteudo)
+    else:
+        os.utime(caminho)  # Conferido agora: carregar() não refaz à toa
+    return manifesto
+
+
+def _gravar(pasta, relativo, dados):
+    # Temporário + rename: um worker servindo o arquivo nunca o vê pela metade
+    destino = os.path.join(pasta, relativo)
+    fd, temporario = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(dados)
+    os.replace(temporario, destino)
+
+
+def carregar(pasta):
+    """
+    Manifesto para o url_for. Se faltar, estiver desatualizado (arquivo
+    novo ou editado depois do build) ou apontar para cópia que não existe,
+    gera de novo. Sem permissão de escrita: {} (nomes originais).
+    """
+    try:
+        with open(os.path.join(pasta, MANIFESTO), encoding='utf-8') as f:
+            manifesto = json.load(f)
+        atualizado = os.path.getmtime(os.path.join(pasta, MANIFESTO))
+        em_dia = sorted(manifesto) == sorted(originais(pasta)) and all(
+            os.path.isfile(os.path.join(pasta, destino))
+            and os.path.getmtime(os.path.join(pasta, original)) <= atualizado
+            for original, destino in manifesto.items()
+        )
+    except (OSError, ValueError):
+        em_dia = False
+    if em_dia:
+        return manifesto
+    try:
+        return gerar(pasta)
+    except OSError as e:
+        print(f"[AVISO] static/ sem nomes com hash (cache normal): {e}")
+        return {}
+
+
+if __name__ == '__main__':
+    pasta = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'static')
+    for original, destino in gerar(pasta).items():
+        print(f"static/{original} -> static/{destino}")
@@ -0,0 +1,133 @@
+# ==========================================
+# estatisticas.py - ESTATÍSTICAS PRÉ-CALCULADAS (snapshot)
+# ==========================================
+# /estatisticas não agrega nada na hora: o worker líder (agendador.py)
+# confere a versão dos dados a cada rodada e, se ela mudou, recalcula a
+# contagem por origem, o top 5 e os gráficos em SVG e grava tudo, em JSON,
+# no snapshot 'estatisticas' do banco (tabela snapshots, migração 11).
+#
+# Os outros workers só leem o snapshot, com cache curto (ESTATISTICAS_TTL):
+# uma página de estatísticas custa uma leitura por chave primária, ou nada.
+# Depois de uma escrita o snapshot fica para trás no máximo um intervalo
+# do agendador; a página mostra sempre um snapshot inteiro e coerente.
+#
+# Com AGENDADOR=0 ninguém grava o snapshot: /estatisticas volta a agregar
+# na requisição (e avisa no log). Nesse caso grave-o por fora, de tempos
+# em tempos (ex.: um cron), com:
+#   python estatisticas.py
+# ==========================================
+
+import json
+import os
+import sys
+import threading
+import time
+
+import graficos as servico_graficos
+
+SNAPSHOT = 'estatisticas'
+TOP = 5
+ESTATISTICAS_TTL = float(os.environ.get('ESTATISTICAS_TTL', 2))
+
+
+def tabela_de_origens(origens_raw):
+    """Top 10 origens e, se houver mais, uma linha "Outras" com a soma do resto."""
+    outras_count = sum(item['count'] for item in origens_raw[10:])
+    return origens_raw[:10] + ([{'origem': 'Outras', 'count': outras_count}] if outras_count > 0 else [])
+
+
+def graficos(origens_raw, top):
+    """
+    Parâmetros de graficos.desenhar_barras() de cada gráfico da página,
+    só dos que têm dados:
+    - 'origens': top 10 origens + "Outras" (barras horizontais)
+    - 'top5': top 5 pesquisados (barras verticais)
+    """
+    graficos_da_pagina = {}
+    tabela = tabela_de_origens(origens_raw)
+    if tabela:
+        graficos_da_pagina['origens'] = dict(
+            labels=[item['origem'] for item in tabela], values=[item['count'] for item in tabela],
+            tipo='barh', titulo='Top 10 Origens Mais Comuns + Outras', xlabel='Quantidade',
+        )
+    if top:
+        graficos_da_pagina['top5'] = dict(
+            labels=[d['nome'] for d in top], values=[d['pesquisas'] for d in top],
+            tipo='bar', titulo='Top 5 Nomes Mais Pesquisados', ylabel='Pesquisas',
+        )
+    return graficos_da_pagina
+
+
+def montar(origens_raw, top, versao):
+    """Conteúdo do snapshot: tabela, top 5 e o SVG de cada gráfico."""
+    return {
+        'versao': versao,
+        'tabela_origem': tabela_de_origens(origens_raw),
+        'top5': top,
+        'graficos': {
+            nome: servico_graficos.desenhar_barras(formato='svg', **parametros).decode('utf-8')
+            for nome, parametros in graficos(origens_raw, top).items()
+        },
+    }
+
+
+def atualizar(banco):
+    """
+    Tarefa do agendador: recalcula e grava o snapshot se a versão dos dados
+    mudou desde o último. Retorna True se gravou. Com réplicas, chame com as
+    leituras fixadas (banco.fixar_leituras, como o agendador faz): versão e
+    agregados têm que vir da mesma origem.
+    """
+    versao = banco.versao_dados()[0]
+    anterior = banco.ler_snapshot(SNAPSHOT)
+    if anterior is not None and anterior['versao'] == versao:
+        return False
+    # A versão é lida ANTES de agregar: se alguém gravar no meio, a próxima
+    # rodada vê a versão nova e recalcula.
+    origens_raw, top = banco.resumo_estatisticas(TOP)
+    conteudo = json.dumps(montar(origens_raw, top, versao), ensure_ascii=False)
+    banco.gravar_snapshot(SNAPSHOT, versao, conteudo)
+    return True
+
+
+class Estatisticas:
+    """Leitura do snapshot com cache curto por worker. Um por worker (veja app.py)."""
+
+    def __init__(self, banco, ttl=ESTATISTICAS_TTL):
+        self._banco = banco
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._atual = None
+        self._lido_em = 0.0
+
+    def atual(self):
+        """
+        {'versao', 'gerado_em', 'tabela_origem', 'top5', 'graficos'} do
+        snapshot, relido no máximo a cada `ttl` segundos; None se o líder
+        ainda não gravou nenhum.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            if self._atual is not None and agora - self._lido_em < self.ttl:
+                return self._atual
+        snapshot = self._banco.ler_snapshot(SNAPSHOT)
+        if snapshot is None:
+            return None
+        with self._lock:
+            if self._atual is None or self._atual['versao'] != snapshot['versao']:
+                self._atual = dict(json.loads(snapshot['conteudo']), gerado_em=snapshot['gerado_em'])
+            self._lido_em = agora
+            return self._atual
+
+
+if __name__ == '__main__':
+    import armazenamento
+
+    banco = armazenamento.criar()
+    banco.fixar_leituras(True)
+    try:
+        gravou = atualizar(banco)
+    except Exception as e:
+        print(f"❌ Falha ao gravar o snapshot das estatísticas: {e}")
+        sys.exit(1)
+    print("✅ Snapshot das estatísticas gravado." if gravou else "✅ Snapshot das estatísticas já estava em dia.")
@@ -0,0 +1,154 @@
+# ==========================================
+# fragmentos.py - CACHE DE FRAGMENTOS DE TEMPLATE ({% cache %})
+# ==========================================
+# Partes de página que só mudam quando os dados mudam (top 10, tabela de
+# origens) são renderizadas uma vez e reaproveitadas:
+#
+#   {% cache 'top10-tabela' %} ...HTML caro... {% endcache %}
+#   {% cache 'linha', item.id %} ... {% endcache %}     (várias partes na chave)
+#
+# A chave final = template + linha do bloco + partes + VERSÃO DOS DADOS
+# (versao_dados.py). Qualquer escrita no banco muda a versão, então nada
+# precisa ser apagado: as chaves antigas simplesmente param de ser pedidas.
+#
+# Onde fica guardado:
+#   - LRU em memória, por worker (FRAGMENTOS_MAX entradas);
+#   - opcionalmente, uma pasta compartilhada por todos os workers da máquina
+#     (FRAGMENTOS_DIR): o fragmento renderizado por um serve para os outros.
+# ==========================================
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+FRAGMENTOS_MAX = int(os.environ.get('FRAGMENTOS_MAX', 512))
+# Pasta compartilhada (vazio = só a memória do worker)
+FRAGMENTOS_DIR = os.environ.get('FRAGMENTOS_DIR', '')
+# Arquivos mais velhos que isso (s) são apagados da pasta compartilhada
+FRAGMENTOS_DIR_IDADE = float(os.environ.get('FRAGMENTOS_DIR_IDADE', 3600))
+# A cada quantas gravações na pasta a limpeza roda
+LIMPEZA_A_CADA = 200
+
+
+class Fragmentos:
+    """
+    Guarda fragmentos renderizados. `versao` é uma função sem argumentos
+    que devolve a versão atual dos dados, ou None para NÃO usar o cache
+    nesta renderização (ex.: a página está mostrando dados antigos).
+    """
+
+    def __init__(self, versao, maximo=FRAGMENTOS_MAX, pasta=FRAGMENTOS_DIR):
+        self._versao = versao
+        self.maximo = maximo
+        self.pasta = pasta or None
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()  # hash da chave -> HTML
+        self._gravacoes = 0
+        if self.pasta:
+            os.makedirs(self.pasta, exist_ok=True)
+
+    def obter_ou_renderizar(self, chave, renderizar):
+        """HTML do fragmento `chave`; chama renderizar() só se não estiver guardado."""
+        versao = self._versao()
+        if versao is None:
+            return renderizar()
+        resumo = hashlib.sha1(repr((versao, chave)).encode('utf-8')).hexdigest()
+
+        with self._lock:
+            html = self._lru.get(resumo)
+            if html is not None:
+                self._lru.move_to_end(resumo)
+                return html
+
+        html = self._ler_da_pasta(resumo)
+        if html is None:
+            html = str(renderizar())
+            self._gravar_na_pasta(resumo, html)
+        with self._lock:
+            self._lru[resumo] = html
+            while len(self._lru) > self.maximo:
+                self._lru.popitem(last=False)
+        return html
+
+    def limpar(self):
+        with self._lock:
+            self._lru.clear()
+
+    # --- Pasta compartilhada ---
+
+    def _ler_da_pasta(self, resumo):
+        if not self.pasta:
+            return None
+        try:
+            with open(os.path.join(self.pasta, resumo + '.html'), encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _gravar_na_pasta(self, resumo, html):
+        if not self.pasta:
+            return
+        try:
+            # Grava num temporário e renomeia: outro worker nunca lê pela metade
+            fd, temporario = tempfile.mkstemp(dir=self.pasta, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(html)
+            os.replace(temporario, os.path.join(self.pasta, resumo + '.html'))
+        except OSError as e:
+            print(f"[AVISO] Fragmento não gravado em {self.pasta}: {e}")
+            return
+        with self._lock:
+            self._gravacoes += 1
+            limpar = self._gravacoes % LIMPEZA_A_CADA == 0
+        if limpar:
+            self._apagar_antigos()
+
+    def _apagar_antigos(self):
+        limite = time.time() - FRAGMENTOS_DIR_IDADE
+        for nome in os.listdir(self.pasta):
+            caminho = os.path.join(self.pasta, nome)
+            try:
+                if os.path.getmtime(caminho) < limite:
+                    os.remove(caminho)
+            except OSError:
+                pass  # Outro worker apagou antes
+
+
+class CacheDeFragmentos(Extension):
+    """
+    Extensão do Jinja com o bloco {% cache chave[, mais, partes] %}...{% endcache %}.
+    Sem `environment.fragmentos` configurado, o bloco só renderiza normalmente.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragmentos=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        partes = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            partes.append(parser.parse_expression())
+        corpo = parser.parse_statements(['name:endcache'], drop_needle=True)
+        # Template + linha (+ ordem na linha): dois blocos com a mesma chave não se misturam
+        na_linha = vars(parser).setdefault('_blocos_cache', {})
+        ordem = na_linha[lineno] = na_linha.get(lineno, -1) + 1
+        origem = nodes.Const(f"{parser.name}:{lineno}:{ordem}")
+        chamada = self.call_method('_renderizar', [origem, nodes.List(partes)])
+        return nodes.CallBlock(chamada, [], [], corpo).set_lineno(lineno)
+
+    def _renderizar(self, origem, partes, caller):
+        fragmentos = self.environment.fragmentos
+        if fragmentos is None:
+            return caller()
+        # O HTML guardado já saiu escapado do template
+        return Markup(fragmentos.obter_ou_renderizar((origem, *partes), caller))
@@ -0,0 +1,264 @@
+# ==========================================
+# graficos.py - GRÁFICOS DAS ESTATÍSTICAS, DESENHADOS UMA VEZ POR VERSÃO
+# ==========================================
+# Os gráficos de /estatisticas são barras simples: o SVG é montado aqui
+# mesmo, como texto (barras_svg), em menos de um milissegundo e sem o
+# matplotlib. O matplotlib fica como opção: o PNG sai dele, e com
+# GRAFICOS_MATPLOTLIB=1 o SVG também. Sem o pacote instalado, só SVG.
+#
+# Desenhar no matplotlib (dpi=120) leva centenas de milissegundos de CPU,
+# e os gráficos só mudam quando os dados mudam. Então a imagem pronta fica
+# guardada aqui, com a chave:
+#
+#   (versão dos dados, nome do gráfico, formato, parâmetros do desenho)
+#
+# Os gráficos são servidos como imagens (rota /graficos/<nome>.<png|svg> do
+# app.py), com a versão na URL: o navegador guarda cada uma sem revalidar.
+#
+# Como nos fragmentos (fragmentos.py), qualquer escrita muda a versão e os
+# desenhos antigos só deixam de ser pedidos (saem pelo LRU).
+#
+# Vários pedidos ao mesmo tempo para um gráfico que não está guardado
+# desenham UMA vez: o primeiro desenha, os outros esperam por ele (por
+# worker). O pyplot tem estado global: dois desenhos nunca rodam juntos.
+#
+# O matplotlib só é importado no primeiro desenho que precisa dele (_pyplot),
+# com o backend Agg (sem tela): o import custa mais de meio segundo e dezenas
+# de MB, e a maioria dos workers nunca desenha um PNG.
+# ==========================================
+
+import importlib.util
+import io
+import math
+import os
+import threading
+from collections import OrderedDict
+from xml.sax.saxutils import escape, quoteattr
+
+# Opcional: sem ele, só o SVG próprio. Aqui só se confere se está instalado.
+MATPLOTLIB_INSTALADO = importlib.util.find_spec('matplotlib') is not None
+
+GRAFICOS_MAX = int(os.environ.get('GRAFICOS_MAX', 64))
+# GRAFICOS_MATPLOTLIB=1: o SVG também sai do matplotlib (mais pesado)
+GRAFICOS_MATPLOTLIB = os.environ.get('GRAFICOS_MATPLOTLIB', '0') == '1' and MATPLOTLIB_INSTALADO
+DPI = 120
+# Formatos servidos -> Content-Type (PNG só com o matplotlib)
+FORMATOS = {'svg': 'image/svg+xml'}
+if MATPLOTLIB_INSTALADO:
+    FORMATOS['png'] = 'image/png'
+
+# Tamanho do SVG (a página o redimensiona) e cores do gráfico do matplotlib
+LARGURA, ALTURA = 1000, 600
+CORES_SET3 = ('#8dd3c7', '#ffffb3', '#bebada', '#fb8072', '#80b1d3', '#fdb462',
+              '#b3de69', '#fccde5', '#d9d9d9', '#bc80bd', '#ccebc5', '#ffed6f')
+# Largura média de um caractere, em frações do tamanho da fonte (para as margens)
+_LARGURA_DO_CARACTERE = 0.6
+
+# O pyplot guarda a "figura atual" no módulo: um desenho de cada vez
+_pyplot_lock = threading.Lock()
+_plt = None
+
+
+def _pyplot():
+    """matplotlib.pyplot, importado na primeira chamada (com _pyplot_lock)."""
+    global _plt
+    if _plt is None:
+        import matplotlib
+        matplotlib.use('Agg')  # Sem tela: nunca tenta abrir janela
+        import matplotlib.pyplot
+        _plt = matplotlib.pyplot
+    return _plt
+
+
+def desenhar_barras(labels, values, tipo, titulo, xlabel=None, ylabel=None, dpi=DPI, formato='svg'):
+    """
+    Gráfico de barras (bytes no `formato` de FORMATOS): tipo 'barh'
+    (horizontais) ou 'bar' (verticais).
+    """
+    if formato == 'svg' and not GRAFICOS_MATPLOTLIB:
+        return barras_svg(labels, values, tipo, titulo, xlabel, ylabel)
+    if not MATPLOTLIB_INSTALADO:
+        raise RuntimeError(f"gráfico em {formato} precisa do matplotlib")
+    return _barras_matplotlib(labels, values, tipo, titulo, xlabel, ylabel, dpi, formato)
+
+
+def _barras_matplotlib(labels, values, tipo, titulo, xlabel, ylabel, dpi, formato):
+    with _pyplot_lock:
+        plt = _pyplot()
+        plt.figure(figsize=(10, 6))
+        colors = plt.cm.Set3(range(len(labels))) if tipo == 'barh' else ['#4e79a7']
+
+        if tipo == 'barh':  # Barras horizontais
+            bars = plt.barh(labels, values, color=colors, edgecolor='navy', alpha=0.8)
+            plt.title(titulo, fontsize=14, fontweight='bold', pad=20)
+            plt.xlabel(xlabel or 'Quantidade de Nomes', fontsize=12)
+            plt.grid(axis='x', alpha=0.3, linestyle='--')
+            plt.gca().invert_yaxis()  # Maior no topo
+            for i, bar in enumerate(bars):
+                width = bar.get_width()
+                plt.text(width + 0.5, bar.get_y() + bar.get_height()/2,
+                         f'{int(width)}', va='center', fontsize=10, fontweight='bold')
+        elif tipo == 'bar':  # Barras verticais
+            bars = plt.bar(labels, values, color='#66b3ff', edgecolor='navy', linewidth=1)
+            plt.title(titulo, fontsize=14, fontweight='bold', pad=20)
+            plt.ylabel(ylabel or 'Pesquisas', fontsize=12)
+            plt.xlabel('Nome', fontsize=12)
+            plt.xticks(rotation=45, ha='right')
+            plt.grid(axis='y', alpha=0.3)
+            for bar in bars:
+                height = bar.get_height()
+                plt.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+                         f'{int(height)}', ha='center', va='bottom', fontsize=10)
+
+        plt.tight_layout()
+        buf = io.BytesIO()
+        plt.savefig(buf, format=formato, transparent=True, bbox_inches='tight', dpi=dpi)
+        plt.close()
+        return buf.getvalue()
+
+
+# ==========================================
+# SVG PRÓPRIO
+# ==========================================
+
+def _passo(maximo, marcas=5):
+    """Intervalo "redondo" (1, 2 ou 5 x 10^n, nunca menor que 1) entre as marcas do eixo."""
+    bruto = max(maximo, 1) / marcas
+    base = 10 ** math.floor(math.log10(bruto))
+    for multiplo in (1, 2, 5, 10):
+        if multiplo * base >= bruto:
+            return max(multiplo * base, 1)
+
+
+def _largura_do_texto(texto, fonte):
+    return len(texto) * fonte * _LARGURA_DO_CARACTERE
+
+
+def _texto(x, y, conteudo, fonte=12, extra=''):
+    return (f'<text x="{x:.1f}" y="{y:.1f}" font-size="{fonte}"{extra}>'
+            f'{escape(conteudo)}</text>')
+
+
+def barras_svg(labels, values, tipo, titulo, xlabel=None, ylabel=None):
+    """
+    Os mesmos gráficos de barras do matplotlib ('barh' / 'bar'), em SVG
+    montado como texto: título, grade, eixos, rótulos e o valor de cada barra.
+    """
+    labels = ['' if l is None else str(l) for l in labels]
+    values = [v or 0 for v in values]
+    maximo = max(values, default=0)
+    passo = _passo(maximo)
+    # Folga acima da maior barra para o número dela caber
+    limite = max(math.ceil(maximo * 1.1 / passo) * passo, passo)
+    marcas = [passo * i for i in range(int(limite // passo) + 1)]
+
+    partes = [_texto(LARGURA / 2, 36, titulo, 18, ' text-anchor="middle" font-weight="bold"')]
+    if tipo == 'barh':  # Barras horizontais, maior no topo
+        esquerda = min(20 + max((_largura_do_texto(l, 13) for l in labels), default=0), LARGURA * 0.35)
+        direita, topo, base = LARGURA - 40, 70, ALTURA - 70
+        escala = (direita - esquerda) / limite
+        for m in marcas:
+            x = esquerda + m * escala
+            partes.append(f'<line x1="{x:.1f}" y1="{topo}" x2="{x:.1f}" y2="{base}" '
+                          'stroke="#000" stroke-opacity="0.3" stroke-dasharray="4 4"/>')
+            partes.append(_texto(x, base + 18, f'{m:g}', 12, ' text-anchor="middle"'))
+        faixa = (base - topo) / max(len(values), 1)
+        for i, (rotulo, valor) in enumerate(zip(labels, values)):
+            y = topo + i * faixa + faixa * 0.1
+            altura = faixa * 0.8
+            largura = valor * escala
+            partes.append(
+                f'<rect x="{esquerda:.1f}" y="{y:.1f}" width="{largura:.1f}" height="{altura:.1f}" '
+                f'fill="{CORES_SET3[i % len(CORES_SET3)]}" fill-opacity="0.8" stroke="navy"/>'
+            )
+            meio = y + altura / 2
+            partes.append(_texto(esquerda - 8, meio, rotulo, 13,
+                                 ' text-anchor="end" dominant-baseline="middle"'))
+            partes.append(_texto(esquerda + largura + 6, meio, f'{int(valor)}', 12,
+                                 ' dominant-baseline="middle" font-weight="bold"'))
+        partes.append(_texto((esquerda + direita) / 2, ALTURA - 22,
+                             xlabel or 'Quantidade de Nomes', 14, ' text-anchor="middle"'))
+    else:  # 'bar': barras verticais, rótulos inclinados
+        inclinados = max((_largura_do_texto(l, 13) for l in labels), default=0) * 0.71
+        esquerda, direita, topo = 80, LARGURA - 30, 70
+        base = ALTURA - min(50 + inclinados, ALTURA * 0.4)
+        escala = (base - topo) / limite
+        for m in marcas:
+            y = base - m * escala
+            partes.append(f'<line x1="{esquerda}" y1="{y:.1f}" x2="{direita}" y2="{y:.1f}" '
+                          'stroke="#000" stroke-opacity="0.3"/>')
+            partes.append(_texto(esquerda - 8, y, f'{m:g}', 12,
+                                 ' text-anchor="end" dominant-baseline="middle"'))
+        faixa = (direita - esquerda) / max(len(values), 1)
+        for i, (rotulo, valor) in enumerate(zip(labels, values)):
+            x = esquerda + i * faixa + faixa * 0.1
+            largura = faixa * 0.8
+            altura = valor * escala
+            centro = x + largura / 2
+            partes.append(
+                f'<rect x="{x:.1f}" y="{base - altura:.1f}" width="{largura:.1f}" height="{altura:.1f}" '
+                'fill="#66b3ff" stroke="navy"/>'
+            )
+            partes.append(_texto(centro, base - altura - 6, f'{int(valor)}', 12, ' text-anchor="middle"'))
+            partes.append(_texto(centro, base + 16, rotulo, 13,
+                                 f' text-anchor="end" transform="rotate(-45 {centro:.1f} {base + 16:.1f})"'))
+        partes.append(_texto(22, (topo + base) / 2, ylabel or 'Pesquisas', 14,
+                             f' text-anchor="middle" transform="rotate(-90 22 {(topo + base) / 2:.1f})"'))
+        partes.append(_texto((esquerda + direita) / 2, ALTURA - 12, 'Nome', 14, ' text-anchor="middle"'))
+    # Eixos (esquerdo e de baixo)
+    partes.append(f'<path d="M{esquerda:.1f} {topo} V{base:.1f} H{direita}" fill="none" stroke="#000"/>')
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {LARGURA} {ALTURA}" '
+        f'width="{LARGURA}" height="{ALTURA}" role="img" aria-label={quoteattr(titulo)} '
+        'font-family="DejaVu Sans, Arial, sans-serif">'
+        f'<title>{escape(titulo)}</title>' + ''.join(partes) + '</svg>'
+    ).encode('utf-8')
+
+
+class Graficos:
+    """Desenhos prontos por chave, com um só desenho por vez para cada chave. Um por worker."""
+
+    def __init__(self, maximo=GRAFICOS_MAX):
+        self.maximo = maximo
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()  # chave -> bytes
+        self._desenhando = {}      # chave -> threading.Event de quem está desenhando
+
+    def obter_ou_desenhar(self, chave, desenhar):
+        """
+        Bytes do gráfico `chave`; chama desenhar() só se não estiver guardado
+        e ninguém mais estiver desenhando. chave=None: desenha sem guardar
+        (ex.: a página está com dados antigos).
+        """
+        if chave is None:
+            return desenhar()
+        while True:
+            with self._lock:
+                dados = self._lru.get(chave)
+                if dados is not None:
+                    self._lru.move_to_end(chave)
+                    return dados
+                evento = self._desenhando.get(chave)
+                if evento is None:
+                    evento = self._desenhando[chave] = threading.Event()
+                    break
+            # Outro pedido já está desenhando: espera e confere de novo
+            # (se o desenho dele falhou, um dos que esperavam tenta)
+            evento.wait()
+
+        try:
+            dados = desenhar()
+            with self._lock:
+                self._lru[chave] = dados
+                while len(self._lru) > self.maximo:
+                    self._lru.popitem(last=False)
+            return dados
+        finally:
+            with self._lock:
+                del self._desenhando[chave]
+            evento.set()
+
+    def limpar(self):
+        with self._lock:
+            self._lru.clear()
@@ -0,0 +1,58 @@
+# ==========================================
+# gunicorn.conf.py - CONFIGURAÇÃO DO SERVIDOR WEB
+# ==========================================
+# O gunicorn lê este arquivo sozinho (o Procfile continua "gunicorn app:app").
+#
+# MODO_SERVIDOR=sync  (padrão)
+#   Workers síncronos: cada requisição ocupa uma thread enquanto espera o
+#   Supabase, então a concorrência fica limitada a workers x threads.
+#
+# MODO_SERVIDOR=async
+#   Workers gevent: as MESMAS rotas do app.py rodam em greenlets e o psycopg2
+#   passa a esperar a rede de forma cooperativa (psycogreen). Um processo
+#   segura milhares de requisições lentas ao mesmo tempo; quem não tem
+#   conexão livre espera no pool (db.get_connection) em vez de dar erro.
+#
+# No boot (uma vez, antes dos workers) gera as cópias de static/ com hash no
+# nome (estaticos.py) e as variantes .gz/.br que o compressao.py entrega
+# pré-comprimidas.
+#
+# Variáveis úteis: WEB_CONCURRENCY (workers), PORT, WORKER_CONNECTIONS,
+# DB_POOL_MAX (veja db.py), COMPRESSAO (veja compressao.py).
+# ==========================================
+
+import os
+
+MODO_SERVIDOR = os.environ.get('MODO_SERVIDOR', 'sync').strip().lower()
+
+
+def on_starting(server):
+    """Roda no processo mestre: static/ com hash e pré-comprimido (só o que mudou)."""
+    import compressao
+    import estaticos
+    pasta = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    if estaticos.ESTATICOS_COM_HASH:
+        try:
+            manifesto = estaticos.gerar(pasta)
+            server.log.info(f"static/ com hash: {len(manifesto)} arquivo(s).")
+        except OSError as e:
+            # Os workers usam os nomes originais (cache normal)
+            server.log.warning(f"Não foi possível gerar os nomes com hash de static/: {e}")
+    try:
+        gerados = compressao.precomprimir_estaticos(pasta)
+        server.log.info(f"static/ pré-comprimido: {len(gerados)} arquivo(s).")
+    except OSError as e:
+        # Disco somente leitura etc.: segue comprimindo na hora
+        server.log.warning(f"Não foi possível pré-comprimir static/: {e}")
+
+
+if MODO_SERVIDOR == 'async':
+    worker_class = 'gevent'
+    # Máximo de requisições simultâneas por worker
+    worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 2000))
+
+    def post_worker_init(worker):
+        """Torna o psycopg2 cooperativo: a espera pelo banco libera o greenlet."""
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+        worker.log.info("Modo async: psycopg2 em modo cooperativo (gevent).")
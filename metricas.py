@@ -0,0 +1,182 @@
+# ==========================================
+# metricas.py - INSTRUMENTAÇÃO DAS CONSULTAS AO BANCO
+# ==========================================
+# Para cada consulta registra, agrupando pela "impressão digital" do SQL
+# (o texto sem valores literais):
+#   - histograma de tempos, total, média e máximo
+#   - linhas devolvidas
+#   - tempo esperando uma conexão livre no pool
+# Consultas acima de CONSULTA_LENTA_MS ganham uma amostra do plano de
+# execução (EXPLAIN ANALYZE/BUFFERS no PostgreSQL, EXPLAIN QUERY PLAN no
+# SQLite) num buffer circular. Tudo aparece em /admin/consultas.
+#
+# As métricas são por processo (cada worker do gunicorn tem as suas).
+# ==========================================
+
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Acima disso (ms) a consulta é considerada lenta e tem o plano capturado
+CONSULTA_LENTA_MS = float(os.environ.get('CONSULTA_LENTA_MS', 500))
+# Quantos planos de consultas lentas guardar (os mais antigos saem)
+PLANOS_MAX = int(os.environ.get('PLANOS_MAX', 50))
+# Intervalo mínimo (s) entre duas capturas de plano da MESMA consulta:
+# o EXPLAIN ANALYZE executa a consulta de novo, então não pode ser a cada lentidão.
+PLANO_INTERVALO = float(os.environ.get('PLANO_INTERVALO', 300))
+
+# Limites superiores (ms) das faixas do histograma; a última pega o resto
+FAIXAS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+_lock = threading.Lock()
+_por_consulta = {}                  # impressão digital -> estatísticas
+_planos = deque(maxlen=PLANOS_MAX)  # buffer circular de consultas lentas
+_plano_capturado_em = {}            # impressão digital -> último instante de captura
+iniciado_em = datetime.now()
+
+
+def impressao_digital(sql):
+    """
+    Normaliza o SQL para agrupar execuções da mesma consulta:
+    literais viram '?', listas IN (...) viram 'IN (...)' e espaços são unificados.
+    """
+    texto = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    texto = re.sub(r'\b\d+(?:\.\d+)?\b', '?', texto)
+    texto = re.sub(r'%s', '?', texto)
+    texto = re.sub(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', 'IN (...)', texto, flags=re.IGNORECASE)
+    return re.sub(r'\s+', ' ', texto).strip()
+
+
+def explicavel(sql):
+    """False para o que já é um EXPLAIN (ex.: a estimativa de contagem): EXPLAIN de EXPLAIN é erro."""
+    return not sql.lstrip().upper().startswith('EXPLAIN')
+
+
+def _novas_estatisticas():
+    return {
+        'execucoes': 0,
+        'total_ms': 0.0,
+        'max_ms': 0.0,
+        'linhas': 0,
+        'espera_pool_ms': 0.0,
+        'erros': 0,
+        'histograma': [0] * len(FAIXAS_MS),
+    }
+
+
+def registrar(sql, segundos, linhas=0, espera_pool=0.0, erro=False, explicar=None):
+    """
+    Registra uma execução.
+    segundos: duração da consulta; espera_pool: tempo esperando conexão.
+    explicar: função sem argumentos que devolve o plano (texto). Só é chamada,
+    em segundo plano, se a consulta for lenta.
+    """
+    chave = impressao_digital(sql)
+    ms = segundos * 1000
+    with _lock:
+        est = _por_consulta.get(chave)
+        if est is None:
+            est = _por_consulta[chave] = _novas_estatisticas()
+        est['execucoes'] += 1
+        est['total_ms'] += ms
+        est['max_ms'] = max(est['max_ms'], ms)
+        est['linhas'] += linhas or 0
+        est['espera_pool_ms'] += espera_pool * 1000
+        est['erros'] += 1 if erro else 0
+        for i, limite in enumerate(FAIXAS_MS):
+            if ms <= limite:
+                est['histograma'][i] += 1
+                break
+
+        capturar = False
+        if explicar is not None and not erro and ms >= CONSULTA_LENTA_MS:
+            agora = time.monotonic()
+            if agora - _plano_capturado_em.get(chave, -PLANO_INTERVALO) >= PLANO_INTERVALO:
+                _plano_capturado_em[chave] = agora
+                capturar = True
+
+    if capturar:
+        # Fora da requisição: quem esperou a consulta lenta não espera o EXPLAIN
+        threading.Thread(
+            target=_capturar_plano, args=(chave, sql, ms, linhas, explicar), daemon=True
+        ).start()
+
+
+def _capturar_plano(chave, sql, ms, linhas, explicar):
+    try:
+        plano = explicar()
+    except Exception as e:
+        plano = f"(falha ao capturar o plano: {e})"
+    with _lock:
+        _planos.appendleft({
+            'quando': datetime.now(),
+            'consulta': chave,
+            'sql': sql.strip(),
+            'duracao_ms': ms,
+            'linhas': linhas,
+            'plano': plano,
+        })
+    print(f"[LENTA] {ms:.0f} ms: {chave}")
+
+
+class Cronometro:
+    """
+    Mede uma consulta e registra ao sair do bloco:
+
+        with metricas.Cronometro(sql) as c:
+            ...executa...
+            c.linhas = len(resultado)
+    """
+
+    def __init__(self, sql, espera_pool=0.0, explicar=None):
+        self.sql = sql
+        self.espera_pool = espera_pool
+        self.explicar = explicar if explicavel(sql) else None
+        self.linhas = 0
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, erro, tb):
+        registrar(self.sql, time.perf_counter() - self._inicio, self.linhas,
+                  self.espera_pool, erro=tipo is not None, explicar=self.explicar)
+        return False
+
+
+def resumo():
+    """Estatísticas por consulta (da mais cara no total para a mais barata) e planos lentos."""
+    with _lock:
+        consultas = []
+        for chave, est in _por_consulta.items():
+            n = est['execucoes'] or 1
+            consultas.append(dict(
+                est,
+                consulta=chave,
+                histograma=list(est['histograma']),
+                media_ms=est['total_ms'] / n,
+                linhas_media=est['linhas'] / n,
+                espera_pool_media_ms=est['espera_pool_ms'] / n,
+            ))
+        planos = list(_planos)
+    consultas.sort(key=lambda c: c['total_ms'], reverse=True)
+    return {
+        'desde': iniciado_em,
+        'consulta_lenta_ms': CONSULTA_LENTA_MS,
+        'faixas_ms': [('∞' if f == float('inf') else f) for f in FAIXAS_MS],
+        'consultas': consultas,
+        'planos': planos,
+    }
+
+
+def zerar():
+    """Apaga tudo o que foi medido até agora."""
+    global iniciado_em
+    with _lock:
+        _por_consulta.clear()
+        _planos.clear()
+        _plano_capturado_em.clear()
+        iniciado_em = datetime.now()
@@ -0,0 +1,938 @@
+# ==========================================
+# migracoes.py - MIGRAÇÕES VERSIONADAS DO ESQUEMA DO BANCO
+# ==========================================
+# Cada mudança de esquema é uma migração numerada. A tabela schema_versao
+# guarda quais já foram aplicadas, então o boot de cada worker faz só uma
+# consulta barata (SELECT MAX(versao)) em vez de rodar DDL na tabela viva.
+#
+# Passo de release (uma vez por deploy, antes dos workers novos subirem):
+#   python migracoes.py            # aplica o que falta
+#   python migracoes.py --status   # só mostra a versão atual e as pendentes
+#
+# Regras para novas migrações:
+#   - só ACRESCENTE no fim da lista, nunca altere uma migração já publicada;
+#   - índices em tabelas que já têm dados: use indice_concorrente() (o
+#     PostgreSQL cria sem travar escritas; roda fora de transação);
+#   - mantenha PostgreSQL e SQLite com o mesmo número de migrações.
+# ==========================================
+
+import sys
+
+# Chave do pg_advisory_lock: só um processo migra por vez
+CHAVE_LOCK_MIGRACAO = 72025031
+
+
+def indice_concorrente(nome, definicao, unico=False):
+    """Passo de migração: CREATE INDEX CONCURRENTLY (só PostgreSQL)."""
+    return ('indice', nome, definicao, unico)
+
+
+# Posição de cada prefixo do índice A-Z na listagem: quantos nomes vêm antes
+# do cursor (prefixo, 0), na ordenação (collation) do próprio banco. Cada
+# prefixo conta só os nomes entre ele e o anterior (faixas do índice de
+# nome): a tabela é lida uma vez. Só para recontar tudo (migração 12, cargas
+# grandes); no dia a dia os triggers ajustam as posições.
+_SQL_POSICOES_INICIAIS = """
+    SELECT prefixo, CAST(SUM(entre) OVER (ORDER BY prefixo) AS INTEGER) AS antes
+    FROM (
+        SELECT i.prefixo, (
+            SELECT COUNT(*) FROM nomes
+            WHERE nome < i.prefixo AND (i.anterior IS NULL OR nome >= i.anterior)
+        ) AS entre
+        FROM (SELECT prefixo, LAG(prefixo) OVER (ORDER BY prefixo) AS anterior FROM nomes_iniciais) i
+    ) c
+"""
+
+# Cada migração: (versão, descrição, [passos]). Passo = SQL ou indice_concorrente().
+MIGRACOES_POSTGRES = [
+    (1, "tabela nomes", ["""
+        CREATE TABLE IF NOT EXISTS nomes (
+            id SERIAL PRIMARY KEY,
+            nome VARCHAR(255) NOT NULL,
+            significado TEXT,
+            origem VARCHAR(100),
+            motivo_escolha TEXT,
+            pesquisas INTEGER DEFAULT 0
+        )
+    """]),
+    (2, "nome único", ["""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'nomes_nome_unique') THEN
+                ALTER TABLE nomes ADD CONSTRAINT nomes_nome_unique UNIQUE (nome);
+            END IF;
+        END $$
+    """]),
+    (3, "índices de nome e origem", [
+        indice_concorrente('idx_nome', 'nomes (nome)'),
+        indice_concorrente('idx_origem', 'nomes (origem)'),
+    ]),
+    # Total exato de nomes mantido por triggers (a página inicial não faz
+    # mais COUNT) e uma "geração" que muda a cada alteração de nome/origem,
+    # usada para invalidar as contagens filtradas em cache (contagens.py).
+    # Triggers por comando: uma carga em massa atualiza o contador uma vez só.
+    (4, "contador de nomes", [
+        """
+        CREATE TABLE IF NOT EXISTS nomes_contagem (
+            id SMALLINT PRIMARY KEY CHECK (id = 1),
+            total BIGINT NOT NULL,
+            geracao BIGINT NOT NULL DEFAULT 0
+        )
+        """,
+        "LOCK TABLE nomes IN SHARE MODE",  # o total inicial não pode perder inserções
+        """
+        INSERT INTO nomes_contagem (id, total)
+        SELECT 1, COUNT(*) FROM nomes
+        ON CONFLICT (id) DO UPDATE SET total = EXCLUDED.total
+        """,
+        """
+        CREATE OR REPLACE FUNCTION nomes_contagem_atualizar() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE nomes_contagem
+                SET total = total + (SELECT COUNT(*) FROM novas), geracao = geracao + 1
+                WHERE id = 1;
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE nomes_contagem
+                SET total = total - (SELECT COUNT(*) FROM antigas), geracao = geracao + 1
+                WHERE id = 1;
+            ELSIF TG_OP = 'TRUNCATE' THEN
+                UPDATE nomes_contagem SET total = 0, geracao = geracao + 1 WHERE id = 1;
+            ELSE
+                UPDATE nomes_contagem SET geracao = geracao + 1 WHERE id = 1;
+            END IF;
+            RETURN NULL;
+        END $$
+        """,
+        "DROP TRIGGER IF EXISTS nomes_contagem_ins ON nomes",
+        "DROP TRIGGER IF EXISTS nomes_contagem_del ON nomes",
+        "DROP TRIGGER IF EXISTS nomes_contagem_upd ON nomes",
+        "DROP TRIGGER IF EXISTS nomes_contagem_trunc ON nomes",
+        """
+        CREATE TRIGGER nomes_contagem_ins AFTER INSERT ON nomes
+        REFERENCING NEW TABLE AS novas
+        FOR EACH STATEMENT EXECUTE FUNCTION nomes_contagem_atualizar()
+        """,
+        """
+        CREATE TRIGGER nomes_contagem_del AFTER DELETE ON nomes
+        REFERENCING OLD TABLE AS antigas
+        FOR EACH STATEMENT EXECUTE FUNCTION nomes_contagem_atualizar()
+        """,
+        # Só nome/origem mudam o resultado dos filtros; pesquisas não
+        """
+        CREATE TRIGGER nomes_contagem_upd AFTER UPDATE OF nome, origem ON nomes
+        FOR EACH STATEMENT EXECUTE FUNCTION nomes_contagem_atualizar()
+        """,
+        """
+        CREATE TRIGGER nomes_contagem_trunc AFTER TRUNCATE ON nomes
+        FOR EACH STATEMENT EXECUTE FUNCTION nomes_contagem_atualizar()
+        """,
+    ]),
+    # Paginação por chave: WHERE (nome, id) > (%s, %s) ORDER BY nome, id
+    # vira um Index Scan que começa direto na posição (sem OFFSET).
+    (5, "índice da paginação por chave", [
+        indice_concorrente('idx_nome_id', 'nomes (nome, id)'),
+    ]),
+    # Versão dos dados para ETag/Last-Modified (app.py): muda com QUALQUER
+    # escrita em nomes - cadastro, contador de pesquisas, carga, limpeza.
+    (6, "versão dos dados", [
+        """
+        ALTER TABLE nomes_contagem
+            ADD COLUMN IF NOT EXISTS versao BIGINT NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+        """,
+        """
+        CREATE OR REPLACE FUNCTION nomes_versao_atualizar() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE nomes_contagem
+            SET versao = versao + 1, atualizado_em = now()
+            WHERE id = 1;
+            RETURN NULL;
+        END $$
+        """,
+        "DROP TRIGGER IF EXISTS nomes_versao ON nomes",
+        "DROP TRIGGER IF EXISTS nomes_versao_trunc ON nomes",
+        """
+        CREATE TRIGGER nomes_versao AFTER INSERT OR UPDATE OR DELETE ON nomes
+        FOR EACH STATEMENT EXECUTE FUNCTION nomes_versao_atualizar()
+        """,
+        """
+        CREATE TRIGGER nomes_versao_trunc AFTER TRUNCATE ON nomes
+        FOR EACH STATEMENT EXECUTE FUNCTION nomes_versao_atualizar()
+        """,
+    ]),
+    # Origens normalizadas: o texto extraído do PDF vem quebrado ("Hebr aico",
+    # "Hebraic o"). A chave (sem espaços, minúsculas) junta as variações numa
+    # linha de 'origens'; nomes.origem_id aponta para ela e nomes.origem passa
+    # a guardar o nome canônico. origens.total é o número de nomes de cada
+    # origem, mantido pelos triggers (a lista de filtros não faz GROUP BY).
+    # Nome canônico inicial: a grafia com menos espaços, depois a mais comum.
+    # Corrigir à mão: UPDATE origens SET nome = 'Hebraico' WHERE chave = 'hebraico'
+    # (o trigger origens_renomear repassa para os nomes). Só vale para grafias
+    # da mesma chave (espaços, maiúsculas); outro nome seria outra origem.
+    (7, "origens normalizadas", [
+        """
+        CREATE OR REPLACE FUNCTION origem_chave(texto TEXT) RETURNS TEXT
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT lower(regexp_replace(coalesce(texto, ''), '\\s+', '', 'g'))
+        $$
+        """,
+        """
+        CREATE OR REPLACE FUNCTION origem_rotulo(texto TEXT) RETURNS TEXT
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT btrim(regexp_replace(coalesce(texto, ''), '\\s+', ' ', 'g'))
+        $$
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS origens (
+            id SMALLSERIAL PRIMARY KEY,
+            chave VARCHAR(100) NOT NULL UNIQUE,
+            nome VARCHAR(100) NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "ALTER TABLE nomes ADD COLUMN IF NOT EXISTS origem_id SMALLINT REFERENCES origens (id)",
+        "LOCK TABLE nomes IN SHARE ROW EXCLUSIVE MODE",  # nenhum cadastro sem origem_id no meio
+        """
+        INSERT INTO origens (chave, nome)
+        SELECT chave, rotulo FROM (
+            SELECT origem_chave(origem) AS chave, origem_rotulo(origem) AS rotulo,
+                   row_number() OVER (
+                       PARTITION BY origem_chave(origem)
+                       ORDER BY length(origem_rotulo(origem)) - length(replace(origem_rotulo(origem), ' ', '')),
+                                COUNT(*) DESC, origem_rotulo(origem)
+                   ) AS ordem
+            FROM nomes
+            WHERE origem_chave(origem) <> ''
+            GROUP BY origem_chave(origem), origem_rotulo(origem)
+        ) grafias
+        WHERE ordem = 1
+        ORDER BY chave
+        ON CONFLICT (chave) DO NOTHING
+        """,
+        """
+        UPDATE nomes n SET origem_id = o.id, origem = o.nome
+        FROM origens o
+        WHERE o.chave = origem_chave(n.origem)
+        """,
+        """
+        UPDATE origens o SET total = c.total
+        FROM (SELECT origem_id, COUNT(*) AS total FROM nomes GROUP BY origem_id) c
+        WHERE o.id = c.origem_id
+        """,
+        # Cada linha nova/alterada ganha o origem_id (criando a origem se for nova)
+        """
+        CREATE OR REPLACE FUNCTION nomes_origem_resolver() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            v_chave TEXT := origem_chave(NEW.origem);
+            v_id SMALLINT;
+            v_nome TEXT;
+        BEGIN
+            IF v_chave = '' THEN
+                NEW.origem_id := NULL;
+                RETURN NEW;
+            END IF;
+            SELECT id, nome INTO v_id, v_nome FROM origens WHERE chave = v_chave;
+            IF NOT FOUND THEN
+                INSERT INTO origens (chave, nome) VALUES (v_chave, origem_rotulo(NEW.origem))
+                ON CONFLICT (chave) DO NOTHING
+                RETURNING id, nome INTO v_id, v_nome;
+                IF v_id IS NULL THEN  -- outra transação criou ao mesmo tempo
+                    SELECT id, nome INTO v_id, v_nome FROM origens WHERE chave = v_chave;
+                END IF;
+            END IF;
+            NEW.origem_id := v_id;
+            NEW.origem := v_nome;
+            RETURN NEW;
+        END $$
+        """,
+        # Totais por comando, como o contador da migração 4
+        """
+        CREATE OR REPLACE FUNCTION origens_total_atualizar() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE origens o SET total = o.total + d.n
+                FROM (SELECT origem_id, COUNT(*) AS n FROM novas
+                      WHERE origem_id IS NOT NULL GROUP BY origem_id) d
+                WHERE o.id = d.origem_id;
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE origens o SET total = o.total - d.n
+                FROM (SELECT origem_id, COUNT(*) AS n FROM antigas
+                      WHERE origem_id IS NOT NULL GROUP BY origem_id) d
+                WHERE o.id = d.origem_id;
+            ELSIF TG_OP = 'UPDATE' THEN
+                -- Só as origens cujo saldo mudou (somar pesquisas não mexe em nada)
+                UPDATE origens o SET total = o.total + d.n
+                FROM (SELECT origem_id, SUM(sinal) AS n
+                      FROM (SELECT origem_id, 1 AS sinal FROM novas
+                            UNION ALL
+                            SELECT origem_id, -1 AS sinal FROM antigas) m
+                      WHERE origem_id IS NOT NULL
+                      GROUP BY origem_id HAVING SUM(sinal) <> 0) d
+                WHERE o.id = d.origem_id;
+            ELSE
+                UPDATE origens SET total = 0 WHERE total <> 0;
+            END IF;
+            RETURN NULL;
+        END $$
+        """,
+        """
+        CREATE OR REPLACE FUNCTION origens_renomear() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE nomes SET origem = NEW.nome WHERE origem_id = NEW.id;
+            RETURN NULL;
+        END $$
+        """,
+        "DROP TRIGGER IF EXISTS nomes_origem ON nomes",
+        "DROP TRIGGER IF EXISTS origens_total_ins ON nomes",
+        "DROP TRIGGER IF EXISTS origens_total_upd ON nomes",
+        "DROP TRIGGER IF EXISTS origens_total_del ON nomes",
+        "DROP TRIGGER IF EXISTS origens_total_trunc ON nomes",
+        "DROP TRIGGER IF EXISTS origens_renomear ON origens",
+        """
+        CREATE TRIGGER nomes_origem BEFORE INSERT OR UPDATE OF origem ON nomes
+        FOR EACH ROW EXECUTE FUNCTION nomes_origem_resolver()
+        """,
+        """
+        CREATE TRIGGER origens_total_ins AFTER INSERT ON nomes
+        REFERENCING NEW TABLE AS novas
+        FOR EACH STATEMENT EXECUTE FUNCTION origens_total_atualizar()
+        """,
+        """
+        CREATE TRIGGER origens_total_upd AFTER UPDATE ON nomes
+        REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+        FOR EACH STATEMENT EXECUTE FUNCTION origens_total_atualizar()
+        """,
+        """
+        CREATE TRIGGER origens_total_del AFTER DELETE ON nomes
+        REFERENCING OLD TABLE AS antigas
+        FOR EACH STATEMENT EXECUTE FUNCTION origens_total_atualizar()
+        """,
+        """
+        CREATE TRIGGER origens_total_trunc AFTER TRUNCATE ON nomes
+        FOR EACH STATEMENT EXECUTE FUNCTION origens_total_atualizar()
+        """,
+        """
+        CREATE TRIGGER origens_renomear AFTER UPDATE OF nome ON origens
+        FOR EACH ROW WHEN (OLD.nome IS DISTINCT FROM NEW.nome AND origem_chave(NEW.nome) = NEW.chave)
+        EXECUTE FUNCTION origens_renomear()
+        """,
+    ]),
+    # Filtro por origem: WHERE origem_id = X ORDER BY nome, id vira um Index
+    # Scan que já sai na ordem da listagem (e a paginação por chave continua).
+    (8, "índice de origem_id", [
+        indice_concorrente('idx_origem_id_nome', 'nomes (origem_id, nome, id)'),
+    ]),
+    # Índice A-Z da listagem: quantos nomes começam com cada letra e com cada
+    # par de letras ("M", "Ma"), mantido pelos triggers. O salto para uma
+    # letra é um cursor (letra, 0) - busca direta no índice (nome, id) - e a
+    # página dela sai da soma dos totais das letras anteriores, sem COUNT.
+    (9, "índice alfabético", [
+        """
+        CREATE OR REPLACE FUNCTION nome_prefixo(texto TEXT, tamanho INTEGER) RETURNS TEXT
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT upper(left(texto, 1)) || lower(substr(texto, 2, tamanho - 1))
+        $$
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS nomes_iniciais (
+            prefixo VARCHAR(2) PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "LOCK TABLE nomes IN SHARE MODE",  # os totais iniciais não podem perder cadastros
+        """
+        INSERT INTO nomes_iniciais (prefixo, total)
+        SELECT nome_prefixo(nome, t), COUNT(*)
+        FROM nomes CROSS JOIN (VALUES (1), (2)) AS tamanhos (t)
+        WHERE length(nome) >= t
+        GROUP BY 1
+        ON CONFLICT (prefixo) DO UPDATE SET total = EXCLUDED.total
+        """,
+        """
+        CREATE OR REPLACE FUNCTION nomes_iniciais_atualizar() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            entram TEXT[] := '{}';
+            saem TEXT[] := '{}';
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                UPDATE nomes_iniciais SET total = 0 WHERE total <> 0;
+                RETURN NULL;
+            ELSIF TG_OP = 'INSERT' THEN
+                SELECT coalesce(array_agg(nome), '{}') INTO entram FROM novas;
+            ELSIF TG_OP = 'DELETE' THEN
+                SELECT coalesce(array_agg(nome), '{}') INTO saem FROM antigas;
+            ELSE
+                -- Só as linhas que mudaram de nome (somar pesquisas não conta)
+                SELECT coalesce(array_agg(n.nome), '{}'), coalesce(array_agg(a.nome), '{}')
+                INTO entram, saem
+                FROM novas n JOIN antigas a USING (id)
+                WHERE n.nome IS DISTINCT FROM a.nome;
+            END IF;
+            IF cardinality(entram) = 0 AND cardinality(saem) = 0 THEN
+                RETURN NULL;
+            END IF;
+            -- Em ordem de prefixo: cargas simultâneas travam as linhas na mesma ordem
+            INSERT INTO nomes_iniciais AS i (prefixo, total)
+            SELECT nome_prefixo(m.nome, t), SUM(m.sinal)
+            FROM (SELECT unnest(entram) AS nome, 1 AS sinal
+                  UNION ALL
+                  SELECT unnest(saem), -1) m
+            CROSS JOIN (VALUES (1), (2)) AS tamanhos (t)
+            WHERE length(m.nome) >= t
+            GROUP BY 1
+            HAVING SUM(m.sinal) <> 0
+            ORDER BY 1
+            ON CONFLICT (prefixo) DO UPDATE SET total = i.total + EXCLUDED.total;
+            RETURN NULL;
+        END $$
+        """,
+        "DROP TRIGGER IF EXISTS nomes_iniciais_ins ON nomes",
+        "DROP TRIGGER IF EXISTS nomes_iniciais_upd ON nomes",
+        "DROP TRIGGER IF EXISTS nomes_iniciais_del ON nomes",
+        "DROP TRIGGER IF EXISTS nomes_iniciais_trunc ON nomes",
+        """
+        CREATE TRIGGER nomes_iniciais_ins AFTER INSERT ON nomes
+        REFERENCING NEW TABLE AS novas
+        FOR EACH STATEMENT EXECUTE FUNCTION nomes_iniciais_atualizar()
+        """,
+        """
+        CREATE TRIGGER nomes_iniciais_upd AFTER UPDATE ON nomes
+        REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+        FOR EACH STATEMENT EXECUTE FUNCTION nomes_iniciais_atualizar()
+        """,
+        """
+        CREATE TRIGGER nomes_iniciais_del AFTER DELETE ON nomes
+        REFERENCING OLD TABLE AS antigas
+        FOR EACH STATEMENT EXECUTE FUNCTION nomes_iniciais_atualizar()
+        """,
+        """
+        CREATE TRIGGER nomes_iniciais_trunc AFTER TRUNCATE ON nomes
+        FOR EACH STATEMENT EXECUTE FUNCTION nomes_iniciais_atualizar()
+        """,
+    ]),
+    # Um índice por ordenação da listagem (armazenamento.ORDENACOES), com as
+    # mesmas colunas e direções do ORDER BY: a página é lida do índice já em
+    # ordem, sem nó Sort (benchmark_ordenacoes.py confere o plano). O de
+    # origem substitui o idx_origem antigo (só origem), que ele cobre.
+    (10, "índices das ordenações", [
+        indice_concorrente('idx_pesquisas_nome', 'nomes (pesquisas DESC, nome, id)'),
+        indice_concorrente('idx_origem_nome', 'nomes (origem, nome, id)'),
+        indice_concorrente('idx_tamanho_nome', 'nomes ((length(nome)), nome, id)'),
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_origem",
+    ]),
+    # Resultados pré-calculados pelas tarefas de fundo (agendador.py), com
+    # a versão dos dados em que foram calculados. Não mexem na versão.
+    (11, "snapshots", ["""
+        CREATE TABLE IF NOT EXISTS snapshots (
+            nome VARCHAR(50) PRIMARY KEY,
+            versao BIGINT NOT NULL,
+            conteudo TEXT NOT NULL,
+            gerado_em TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """]),
+    # Posição de cada prefixo do índice A-Z ('antes': nomes antes do cursor
+    # (prefixo, 0)), guardada ao lado do total. A soma dos totais das letras
+    # anteriores não serve: com "Á" ou "maria" a ordem das iniciais não é a
+    # dos nomes. Cada escrita anda as posições dos prefixos depois do nome
+    # (só um prefixo novo é contado, uma vez); /listar só as lê.
+    (12, "posição das iniciais", [
+        "ALTER TABLE nomes_iniciais ADD COLUMN IF NOT EXISTS antes INTEGER NOT NULL DEFAULT 0",
+        "LOCK TABLE nomes IN SHARE MODE",  # as posições iniciais não podem perder cadastros
+        "UPDATE nomes_iniciais AS i SET antes = c.antes FROM (" + _SQL_POSICOES_INICIAIS + ") c"
+        " WHERE i.prefixo = c.prefixo",
+        """
+        CREATE OR REPLACE FUNCTION nomes_iniciais_atualizar() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            entram TEXT[] := '{}';
+            saem TEXT[] := '{}';
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                UPDATE nomes_iniciais SET total = 0, antes = 0 WHERE total <> 0 OR antes <> 0;
+                RETURN NULL;
+            ELSIF TG_OP = 'INSERT' THEN
+                SELECT coalesce(array_agg(nome), '{}') INTO entram FROM novas;
+            ELSIF TG_OP = 'DELETE' THEN
+                SELECT coalesce(array_agg(nome), '{}') INTO saem FROM antigas;
+            ELSE
+                -- Só as linhas que mudaram de nome (somar pesquisas não conta)
+                SELECT coalesce(array_agg(n.nome), '{}'), coalesce(array_agg(a.nome), '{}')
+                INTO entram, saem
+                FROM novas n JOIN antigas a USING (id)
+                WHERE n.nome IS DISTINCT FROM a.nome;
+            END IF;
+            IF cardinality(entram) = 0 AND cardinality(saem) = 0 THEN
+                RETURN NULL;
+            END IF;
+            -- Todas as linhas, em ordem de prefixo: cargas simultâneas não se cruzam
+            PERFORM 1 FROM nomes_iniciais ORDER BY prefixo FOR UPDATE;
+            -- Posições dos prefixos que já existem (os novos são contados abaixo)
+            IF cardinality(entram) + cardinality(saem) > 1000 THEN
+                -- Carga grande: recontar tudo lê o índice de nome uma vez só
+                UPDATE nomes_iniciais AS i SET antes = c.antes
+                FROM (""" + _SQL_POSICOES_INICIAIS + """) c
+                WHERE i.prefixo = c.prefixo AND i.antes <> c.antes;
+            ELSE
+                UPDATE nomes_iniciais AS i SET antes = i.antes + d.saldo
+                FROM (
+                    SELECT p.prefixo, SUM(m.sinal) AS saldo
+                    FROM nomes_iniciais p
+                    JOIN (SELECT unnest(entram) AS nome, 1 AS sinal
+                          UNION ALL
+                          SELECT unnest(saem), -1) m ON m.nome < p.prefixo
+                    GROUP BY p.prefixo
+                    HAVING SUM(m.sinal) <> 0
+                ) d
+                WHERE i.prefixo = d.prefixo;
+            END IF;
+            INSERT INTO nomes_iniciais AS i (prefixo, total, antes)
+            SELECT s.prefixo, s.total,
+                   CASE WHEN EXISTS (SELECT 1 FROM nomes_iniciais WHERE prefixo = s.prefixo) THEN 0
+                        ELSE (SELECT COUNT(*) FROM nomes WHERE nome < s.prefixo) END
+            FROM (
+                SELECT nome_prefixo(m.nome, t) AS prefixo, SUM(m.sinal) AS total
+                FROM (SELECT unnest(entram) AS nome, 1 AS sinal
+                      UNION ALL
+                      SELECT unnest(saem), -1) m
+                CROSS JOIN (VALUES (1), (2)) AS tamanhos (t)
+                WHERE length(m.nome) >= t
+                GROUP BY 1
+                HAVING SUM(m.sinal) <> 0
+            ) s
+            ORDER BY 1
+            ON CONFLICT (prefixo) DO UPDATE SET total = i.total + EXCLUDED.total;
+            RETURN NULL;
+        END $$
+        """,
+    ]),
+]
+
+MIGRACOES_SQLITE = [
+    (1, "tabela nomes", ["""
+        CREATE TABLE IF NOT EXISTS nomes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL UNIQUE,
+            significado TEXT,
+            origem TEXT,
+            motivo_escolha TEXT,
+            pesquisas INTEGER DEFAULT 0
+        )
+    """]),
+    # A restrição UNIQUE já nasce com a tabela no SQLite
+    (2, "nome único", []),
+    (3, "índices de origem e pesquisas", [
+        "CREATE INDEX IF NOT EXISTS idx_origem ON nomes(origem)",
+        "CREATE INDEX IF NOT EXISTS idx_pesquisas ON nomes(pesquisas)",
+    ]),
+    # No SQLite os triggers são por linha (não há triggers por comando)
+    (4, "contador de nomes", [
+        """
+        CREATE TABLE IF NOT EXISTS nomes_contagem (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total INTEGER NOT NULL,
+            geracao INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "INSERT OR REPLACE INTO nomes_contagem (id, total) SELECT 1, COUNT(*) FROM nomes",
+        """
+        CREATE TRIGGER IF NOT EXISTS nomes_contagem_ins AFTER INSERT ON nomes BEGIN
+            UPDATE nomes_contagem SET total = total + 1, geracao = geracao + 1 WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS nomes_contagem_del AFTER DELETE ON nomes BEGIN
+            UPDATE nomes_contagem SET total = total - 1, geracao = geracao + 1 WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS nomes_contagem_upd AFTER UPDATE OF nome, origem ON nomes BEGIN
+            UPDATE nomes_contagem SET geracao = geracao + 1 WHERE id = 1;
+        END
+        """,
+    ]),
+    # O índice UNIQUE de nome já termina no rowid (= id): serve para (nome, id)
+    (5, "índice da paginação por chave", []),
+    # ADD COLUMN não aceita DEFAULT CURRENT_TIMESTAMP no SQLite: preenche depois
+    (6, "versão dos dados", [
+        "ALTER TABLE nomes_contagem ADD COLUMN versao INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE nomes_contagem ADD COLUMN atualizado_em TEXT NOT NULL DEFAULT '1970-01-01 00:00:00'",
+        "UPDATE nomes_contagem SET atualizado_em = CURRENT_TIMESTAMP",
+        """
+        CREATE TRIGGER IF NOT EXISTS nomes_versao_ins AFTER INSERT ON nomes BEGIN
+            UPDATE nomes_contagem SET versao = versao + 1, atualizado_em = CURRENT_TIMESTAMP WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS nomes_versao_upd AFTER UPDATE ON nomes BEGIN
+            UPDATE nomes_contagem SET versao = versao + 1, atualizado_em = CURRENT_TIMESTAMP WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS nomes_versao_del AFTER DELETE ON nomes BEGIN
+            UPDATE nomes_contagem SET versao = versao + 1, atualizado_em = CURRENT_TIMESTAMP WHERE id = 1;
+        END
+        """,
+    ]),
+    # origem_chave()/origem_rotulo() são funções Python registradas em cada
+    # conexão (armazenamento.py). O SQLite não deixa um trigger mudar NEW:
+    # a linha recebe o origem_id num UPDATE logo depois de entrar, e os
+    # totais seguem as mudanças de origem_id.
+    (7, "origens normalizadas", [
+        """
+        CREATE TABLE IF NOT EXISTS origens (
+            id INTEGER PRIMARY KEY,
+            chave TEXT NOT NULL UNIQUE,
+            nome TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "ALTER TABLE nomes ADD COLUMN origem_id INTEGER REFERENCES origens (id)",
+        """
+        INSERT OR IGNORE INTO origens (chave, nome)
+        SELECT chave, rotulo FROM (
+            SELECT origem_chave(origem) AS chave, origem_rotulo(origem) AS rotulo,
+                   row_number() OVER (
+                       PARTITION BY origem_chave(origem)
+                       ORDER BY length(origem_rotulo(origem)) - length(replace(origem_rotulo(origem), ' ', '')),
+                                COUNT(*) DESC, origem_rotulo(origem)
+                   ) AS ordem
+            FROM nomes
+            WHERE origem_chave(origem) <> ''
+            GROUP BY origem_chave(origem), origem_rotulo(origem)
+        )
+        WHERE ordem = 1
+        ORDER BY chave
+        """,
+        """
+        UPDATE nomes SET
+            origem_id = (SELECT id FROM origens WHERE chave = origem_chave(nomes.origem)),
+            origem = coalesce((SELECT nome FROM origens WHERE chave = origem_chave(nomes.origem)), origem)
+        """,
+        "UPDATE origens SET total = (SELECT COUNT(*) FROM nomes WHERE origem_id = origens.id)",
+        """
+        CREATE TRIGGER IF NOT EXISTS nomes_origem_ins AFTER INSERT ON nomes BEGIN
+            INSERT OR IGNORE INTO origens (chave, nome)
+            SELECT origem_chave(NEW.origem), origem_rotulo(NEW.origem) WHERE origem_chave(NEW.origem) <> '';
+            UPDATE nomes SET
+                origem_id = (SELECT id FROM origens WHERE chave = origem_chave(NEW.origem)),
+                origem = coalesce((SELECT nome FROM origens WHERE chave = origem_chave(NEW.origem)), origem)
+            WHERE id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS nomes_origem_upd AFTER UPDATE OF origem ON nomes
+        WHEN origem_chave(NEW.origem) <> origem_chave(OLD.origem) BEGIN
+            INSERT OR IGNORE INTO origens (chave, nome)
+            SELECT origem_chave(NEW.origem), origem_rotulo(NEW.origem) WHERE origem_chave(NEW.origem) <> '';
+            UPDATE nomes SET
+                origem_id = (SELECT id FROM origens WHERE chave = origem_chave(NEW.origem)),
+                origem = coalesce((SELECT nome FROM origens WHERE chave = origem_chave(NEW.origem)), origem)
+            WHERE id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS origens_total_upd AFTER UPDATE OF origem_id ON nomes
+        WHEN NEW.origem_id IS NOT OLD.origem_id BEGIN
+            UPDATE origens SET total = total - 1 WHERE id = OLD.origem_id;
+            UPDATE origens SET total = total + 1 WHERE id = NEW.origem_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS origens_total_del AFTER DELETE ON nomes
+        WHEN OLD.origem_id IS NOT NULL BEGIN
+            UPDATE origens SET total = total - 1 WHERE id = OLD.origem_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS origens_renomear AFTER UPDATE OF nome ON origens
+        WHEN NEW.nome IS NOT OLD.nome AND origem_chave(NEW.nome) = NEW.chave BEGIN
+            UPDATE nomes SET origem = NEW.nome WHERE origem_id = NEW.id;
+        END
+        """,
+    ]),
+    # Termina no rowid (= id): serve para origem_id = X ORDER BY nome, id
+    (8, "índice de origem_id", [
+        "CREATE INDEX IF NOT EXISTS idx_origem_id_nome ON nomes(origem_id, nome)",
+    ]),
+    # nome_prefixo() também é uma função Python registrada na conexão
+    (9, "índice alfabético", [
+        """
+        CREATE TABLE IF NOT EXISTS nomes_iniciais (
+            prefixo TEXT PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        INSERT OR REPLACE INTO nomes_iniciais (prefixo, total)
+        SELECT nome_prefixo(nome, t), COUNT(*)
+        FROM nomes CROSS JOIN (SELECT 1 AS t UNION ALL SELECT 2) tamanhos
+        WHERE length(nome) >= t
+        GROUP BY 1
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS nomes_iniciais_ins AFTER INSERT ON nomes BEGIN
+            INSERT INTO nomes_iniciais (prefixo, total)
+            SELECT nome_prefixo(NEW.nome, t), 1
+            FROM (SELECT 1 AS t UNION ALL SELECT 2) WHERE length(NEW.nome) >= t
+            ON CONFLICT (prefixo) DO UPDATE SET total = total + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS nomes_iniciais_del AFTER DELETE ON nomes BEGIN
+            UPDATE nomes_iniciais SET total = total - 1
+            WHERE prefixo IN (nome_prefixo(OLD.nome, 1),
+                              CASE WHEN length(OLD.nome) >= 2 THEN nome_prefixo(OLD.nome, 2) END);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS nomes_iniciais_upd AFTER UPDATE OF nome ON nomes
+        WHEN NEW.nome IS NOT OLD.nome BEGIN
+            UPDATE nomes_iniciais SET total = total - 1
+            WHERE prefixo IN (nome_prefixo(OLD.nome, 1),
+                              CASE WHEN length(OLD.nome) >= 2 THEN nome_prefixo(OLD.nome, 2) END);
+            INSERT INTO nomes_iniciais (prefixo, total)
+            SELECT nome_prefixo(NEW.nome, t), 1
+            FROM (SELECT 1 AS t UNION ALL SELECT 2) WHERE length(NEW.nome) >= t
+            ON CONFLICT (prefixo) DO UPDATE SET total = total + 1;
+        END
+        """,
+    ]),
+    # Terminam no rowid (= id). Os de origem e de pesquisas cobrem os da
+    # migração 3, que saem.
+    (10, "índices das ordenações", [
+        "CREATE INDEX IF NOT EXISTS idx_pesquisas_nome ON nomes(pesquisas DESC, nome)",
+        "CREATE INDEX IF NOT EXISTS idx_origem_nome ON nomes(origem, nome)",
+        "CREATE INDEX IF NOT EXISTS idx_tamanho_nome ON nomes(length(nome), nome)",
+        "DROP INDEX IF EXISTS idx_origem",
+        "DROP INDEX IF EXISTS idx_pesquisas",
+    ]),
+    (11, "snapshots", ["""
+        CREATE TABLE IF NOT EXISTS snapshots (
+            nome TEXT PRIMARY KEY,
+            versao INTEGER NOT NULL,
+            conteudo TEXT NOT NULL,
+            gerado_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """]),
+    # Os triggers da migração 9, refeitos: primeiro andam as posições dos
+    # prefixos que já existem, depois entra o prefixo novo (contado uma vez)
+    (12, "posição das iniciais", [
+        "ALTER TABLE nomes_iniciais ADD COLUMN antes INTEGER NOT NULL DEFAULT 0",
+        "UPDATE nomes_iniciais AS i SET antes = c.antes FROM (" + _SQL_POSICOES_INICIAIS + ") c"
+        " WHERE i.prefixo = c.prefixo",
+        "DROP TRIGGER IF EXISTS nomes_iniciais_ins",
+        "DROP TRIGGER IF EXISTS nomes_iniciais_del",
+        "DROP TRIGGER IF EXISTS nomes_iniciais_upd",
+        """
+        CREATE TRIGGER nomes_iniciais_ins AFTER INSERT ON nomes BEGIN
+            UPDATE nomes_iniciais SET antes = antes + 1 WHERE prefixo > NEW.nome;
+            INSERT INTO nomes_iniciais (prefixo, total, antes)
+            SELECT p, 1, CASE WHEN EXISTS (SELECT 1 FROM nomes_iniciais WHERE prefixo = p) THEN 0
+                              ELSE (SELECT COUNT(*) FROM nomes WHERE nome < p) END
+            FROM (SELECT nome_prefixo(NEW.nome, t) AS p
+                  FROM (SELECT 1 AS t UNION ALL SELECT 2) WHERE length(NEW.nome) >= t)
+            WHERE 1
+            ON CONFLICT (prefixo) DO UPDATE SET total = total + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER nomes_iniciais_del AFTER DELETE ON nomes BEGIN
+            UPDATE nomes_iniciais SET antes = antes - 1 WHERE prefixo > OLD.nome;
+            UPDATE nomes_iniciais SET total = total - 1
+            WHERE prefixo IN (nome_prefixo(OLD.nome, 1),
+                              CASE WHEN length(OLD.nome) >= 2 THEN nome_prefixo(OLD.nome, 2) END);
+        END
+        """,
+        """
+        CREATE TRIGGER nomes_iniciais_upd AFTER UPDATE OF nome ON nomes
+        WHEN NEW.nome IS NOT OLD.nome BEGIN
+            UPDATE nomes_iniciais SET antes = antes - 1 WHERE prefixo > OLD.nome;
+            UPDATE nomes_iniciais SET antes = antes + 1 WHERE prefixo > NEW.nome;
+            UPDATE nomes_iniciais SET total = total - 1
+            WHERE prefixo IN (nome_prefixo(OLD.nome, 1),
+                              CASE WHEN length(OLD.nome) >= 2 THEN nome_prefixo(OLD.nome, 2) END);
+            INSERT INTO nomes_iniciais (prefixo, total, antes)
+            SELECT p, 1, CASE WHEN EXISTS (SELECT 1 FROM nomes_iniciais WHERE prefixo = p) THEN 0
+                              ELSE (SELECT COUNT(*) FROM nomes WHERE nome < p) END
+            FROM (SELECT nome_prefixo(NEW.nome, t) AS p
+                  FROM (SELECT 1 AS t UNION ALL SELECT 2) WHERE length(NEW.nome) >= t)
+            WHERE 1
+            ON CONFLICT (prefixo) DO UPDATE SET total = total + 1;
+        END
+        """,
+    ]),
+]
+
+VERSAO_ATUAL = MIGRACOES_POSTGRES[-1][0]
+assert VERSAO_ATUAL == MIGRACOES_SQLITE[-1][0], "PostgreSQL e SQLite com migrações diferentes"
+
+_SQL_TABELA_VERSAO = """
+    CREATE TABLE IF NOT EXISTS schema_versao (
+        versao INTEGER PRIMARY KEY,
+        descricao TEXT NOT NULL,
+        aplicada_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def pendentes(migracoes, versao):
+    """Migrações com número maior que `versao`."""
+    return [m for m in migracoes if m[0] > versao]
+
+
+# ==========================================
+# POSTGRESQL
+# ==========================================
+
+def versao_postgres(db):
+    """Versão aplicada no PostgreSQL (0 se nunca migrou). Uma consulta barata."""
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT to_regclass('schema_versao') IS NOT NULL")
+            if not cursor.fetchone()[0]:
+                return 0
+            cursor.execute("SELECT COALESCE(MAX(versao), 0) FROM schema_versao")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+            conn.rollback()
+    finally:
+        db.release_connection(conn)
+
+
+def _criar_indice_concorrente(cursor, nome, definicao, unico):
+    # Um CONCURRENTLY interrompido deixa o índice INVÁLIDO; o IF NOT EXISTS
+    # o consideraria pronto, então ele é removido e recriado.
+    cursor.execute("""
+        SELECT NOT i.indisvalid
+        FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s
+    """, (nome,))
+    linha = cursor.fetchone()
+    if linha and linha[0]:
+        print(f"⚠️ Índice {nome} inválido (criação interrompida); recriando...")
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}")
+    cursor.execute(
+        f"CREATE {'UNIQUE ' if unico else ''}INDEX CONCURRENTLY IF NOT EXISTS {nome} ON {definicao}"
+    )
+
+
+def migrar_postgres(db):
+    """
+    Aplica as migrações pendentes no PostgreSQL. Seguro com vários processos
+    ao mesmo tempo (advisory lock). Retorna as versões aplicadas.
+    """
+    conn = db.get_connection()
+    aplicadas = []
+    conn.autocommit = True  # CREATE INDEX CONCURRENTLY não roda em transação
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (CHAVE_LOCK_MIGRACAO,))
+            try:
+                cursor.execute(_SQL_TABELA_VERSAO)
+                cursor.execute("SELECT COALESCE(MAX(versao), 0) FROM schema_versao")
+                versao = cursor.fetchone()[0]
+
+                for numero, descricao, passos in pendentes(MIGRACOES_POSTGRES, versao):
+                    print(f"🔄 Migração {numero}: {descricao}...")
+                    concorrente = any(isinstance(p, tuple) for p in passos)
+                    if not concorrente:
+                        cursor.execute("BEGIN")
+                    for passo in passos:
+                        if isinstance(passo, tuple):
+                            _criar_indice_concorrente(cursor, *passo[1:])
+                        else:
+                            cursor.execute(passo)
+                    cursor.execute(
+                        "INSERT INTO schema_versao (versao, descricao) VALUES (%s, %s)",
+                        (numero, descricao),
+                    )
+                    if not concorrente:
+                        cursor.execute("COMMIT")
+                    aplicadas.append(numero)
+            except Exception:
+                if conn.info.transaction_status != 0:  # 0 = ocioso, sem transação aberta
+                    cursor.execute("ROLLBACK")
+                raise
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (CHAVE_LOCK_MIGRACAO,))
+        finally:
+            cursor.close()
+    finally:
+        conn.autocommit = False
+        db.release_connection(conn)
+    return aplicadas
+
+
+# ==========================================
+# SQLITE
+# ==========================================
+
+def versao_sqlite(conn):
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_versao'"
+    ).fetchone()
+    if not existe:
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(versao), 0) FROM schema_versao").fetchone()[0]
+
+
+def migrar_sqlite(conn):
+    """
+    Aplica as migrações pendentes no SQLite (cada uma numa transação).
+    Seguro com vários processos ao mesmo tempo: a versão é relida DEPOIS do
+    BEGIN IMMEDIATE (que tranca o arquivo para escrita), e a migração que
+    outro processo acabou de aplicar é pulada.
+    """
+    aplicadas = []
+    with conn:
+        conn.execute(_SQL_TABELA_VERSAO)
+    for numero, descricao, passos in pendentes(MIGRACOES_SQLITE, versao_sqlite(conn)):
+        with conn:  # commit no fim; rollback se algum passo falhar
+            conn.execute("BEGIN IMMEDIATE")
+            if versao_sqlite(conn) >= numero:
+                continue  # Outro worker já aplicou (a lista acima foi lida sem trava)
+            for passo in passos:
+                conn.execute(passo)
+            conn.execute(
+                "INSERT INTO schema_versao (versao, descricao) VALUES (?, ?)", (numero, descricao)
+            )
+        aplicadas.append(numero)
+    return aplicadas
+
+
+# ==========================================
+# PASSO DE RELEASE
+# ==========================================
+
+if __name__ == '__main__':
+    import armazenamento
+
+    banco = armazenamento.criar()
+    versao = banco.versao_schema()
+    print(f"Banco: {banco.nome} | versão do esquema: {versao} | versão do código: {VERSAO_ATUAL}")
+
+    if '--status' in sys.argv:
+        for numero, descricao in banco.migracoes_pendentes():
+            print(f"  pendente: {numero} - {descricao}")
+        sys.exit(0)
+
+    try:
+        aplicadas = banco.migrar()
+    except Exception as e:
+        print(f"❌ Falha na migração: {e}")
+        sys.exit(1)
+    if aplicadas:
+        print(f"✅ Migrações aplicadas: {', '.join(map(str, aplicadas))}")
+    else:
+        print("✅ Esquema já estava atualizado.")
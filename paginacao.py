@@ -0,0 +1,197 @@
+# ==========================================
+# paginacao.py - CURSORES DA PAGINAÇÃO POR CHAVE
+# ==========================================
+# OFFSET faz o banco ler e descartar todas as linhas anteriores: a página
+# 5000 custa 5000 vezes a página 1, e um cadastro no meio "empurra" as
+# páginas. Na paginação por chave o link carrega a posição (nome, id) da
+# última linha vista e a próxima página começa direto ali pelo índice.
+#
+# Para o navegador o cursor é opaco: base64 (URL-safe) de um JSON
+#   {"d": "apos" | "antes", "n": nome, "i": id}
+# Cursor inválido ou adulterado é ignorado (volta para a paginação por OFFSET).
+#
+# A barra de navegação também é montada aqui (paginador): primeira, anterior,
+# as vizinhas da atual, próxima e última. O tamanho não depende do total de
+# páginas (nada de um <li> por página).
+#
+# LinhasEmFluxo: as linhas de uma página que chega aos poucos (template em
+# streaming). A barra só é montada depois da tabela, com o que passou.
+#
+# indice_alfabetico: a barra A-Z. Cada letra é um cursor (letra, 0), que
+# começa a página direto no primeiro nome com ela; a página mostrada vem de
+# quantos nomes há antes desse cursor, contados pelo banco na ordem da
+# listagem (Armazenamento.iniciais). Somar os totais das letras anteriores
+# não serve: com "Á" ou "maria" a ordem das iniciais não é a dos nomes.
+# ==========================================
+
+import base64
+import binascii
+import json
+
+DIRECOES = ('apos', 'antes')
+
+# Quantas páginas mostrar de cada lado da atual
+VIZINHOS = 2
+# Letra com mais nomes que isso ganha a linha de pares ("Ma", "Me", ...)
+PARES_ACIMA = 200
+
+
+def codificar_cursor(direcao, linha):
+    """Cursor para as linhas depois ('apos') ou antes ('antes') de `linha`."""
+    dados = json.dumps({'d': direcao, 'n': linha['nome'], 'i': linha['id']},
+                       ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(dados.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """
+    (direção, (nome, id)) de um cursor de codificar_cursor(),
+    ou None se ele estiver vazio ou inválido.
+    """
+    if not cursor:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        dados = json.loads(bruto.decode('utf-8'))
+        direcao, nome, id_ = dados['d'], dados['n'], dados['i']
+    except (binascii.Error, ValueError, TypeError, KeyError, UnicodeDecodeError):
+        return None
+    if direcao not in DIRECOES or not isinstance(nome, str) or type(id_) is not int:
+        return None
+    return direcao, (nome, id_)
+
+
+def argumentos_de_chave(cursor):
+    """{'apos': chave} / {'antes': chave} para o armazenamento, ou {} sem cursor válido."""
+    decodificado = decodificar_cursor(cursor)
+    if decodificado is None:
+        return {}
+    direcao, chave = decodificado
+    return {direcao: chave}
+
+
+def janela(pagina, total_paginas, vizinhos=VIZINHOS):
+    """
+    Números de página da barra: a primeira, a última e `vizinhos` de cada
+    lado da atual. None marca um salto ("…"). No máximo 2 * vizinhos + 5 itens.
+
+        janela(50, 100) -> [1, None, 48, 49, 50, 51, 52, None, 100]
+    """
+    if total_paginas < 1:
+        return []
+    pagina = min(max(pagina, 1), total_paginas)
+    inicio = max(2, pagina - vizinhos)
+    fim = min(total_paginas - 1, pagina + vizinhos)
+    numeros = [1]
+    if inicio > 2:
+        numeros.append(None)
+    numeros.extend(range(inicio, fim + 1))
+    if fim < total_paginas - 1:
+        numeros.append(None)
+    if total_paginas > 1:
+        numeros.append(total_paginas)
+    return numeros
+
+
+def paginador(pagina, total_paginas, cursor_anterior=None, cursor_proximo=None, vizinhos=VIZINHOS):
+    """
+    Tudo o que o template precisa para a barra de navegação:
+      paginas:  janela() (saltos diretos por ?page=N)
+      anterior / proxima: {'page', 'cursor'} ou None. Com cursor o salto é
+                pela chave; sem ele (ex.: resultado parcial), por OFFSET.
+    A página fora do intervalo (?page=0, ?page=999) vira a primeira/última.
+    """
+    pagina = min(max(pagina, 1), max(total_paginas, 1))
+    anterior = proxima = None
+    if pagina > 1:
+        anterior = {'page': pagina - 1, 'cursor': cursor_anterior}
+    if pagina < total_paginas:
+        proxima = {'page': pagina + 1, 'cursor': cursor_proximo}
+    return {
+        'atual': pagina,
+        'paginas': janela(pagina, total_paginas, vizinhos),
+        'anterior': anterior,
+        'proxima': proxima,
+    }
+
+
+def indice_alfabetico(prefixos, por_pagina, atual=None, pares_acima=PARES_ACIMA):
+    """
+    Barra A-Z a partir de Armazenamento.iniciais():
+      letras: [{'rotulo', 'total', 'page', 'cursor'}]
+      atual:  letra da página atual (ou None)
+      pares:  os pares da letra atual, se ela tiver mais de `pares_acima` nomes
+    """
+    letras, pares = [], []
+    for p in prefixos:
+        if len(p['prefixo']) != 1:
+            continue
+        letras.append(_entrada(p, por_pagina))
+        if p['prefixo'] == atual and p['total'] > pares_acima:
+            pares = [_entrada(q, por_pagina) for q in prefixos
+                     if len(q['prefixo']) == 2 and q['prefixo'][0] == atual]
+    return {'letras': letras, 'atual': atual, 'pares': pares}
+
+
+def _entrada(prefixo, por_pagina):
+    return {
+        'rotulo': prefixo['prefixo'],
+        'total': prefixo['total'],
+        # 'antes' = nomes antes do cursor abaixo: a posição dele na listagem
+        'page': prefixo['antes'] // por_pagina + 1,
+        # (prefixo, 0) vem antes de qualquer (nome, id) que comece com ele
+        'cursor': codificar_cursor('apos', {'nome': prefixo['prefixo'], 'id': 0}),
+    }
+
+
+class LinhasEmFluxo:
+    """
+    Envolve o iterador de Armazenamento.listar_em_fluxo() para o template:
+      {% if nomes %}   espia a primeira linha (sem perder nenhuma);
+      {% for ... %}    entrega as linhas e anota primeira, ultima, quantidade.
+    Erro no meio (tempo esgotado, conexão caiu) não derruba a resposta, que
+    já começou a ser enviada: a tabela termina ali e `erro` fica preenchido.
+    """
+
+    def __init__(self, linhas):
+        self._linhas = iter(linhas)
+        self._espiada = []
+        self.primeira = None
+        self.ultima = None
+        self.quantidade = 0
+        self.erro = None
+
+    def _proxima(self):
+        if self._espiada:
+            return self._espiada.pop()
+        if self.erro is not None:
+            raise StopIteration
+        try:
+            return next(self._linhas)
+        except StopIteration:
+            raise
+        except Exception as e:
+            print(f"[ERRO] Listagem interrompida: {e}")
+            self.erro = e
+            raise StopIteration
+
+    def __bool__(self):
+        if self.quantidade or self._espiada:
+            return True
+        try:
+            self._espiada.append(self._proxima())
+        except StopIteration:
+            return False
+        return True
+
+    def __iter__(self):
+        while True:
+            try:
+                linha = self._proxima()
+            except StopIteration:
+                return
+            if self.primeira is None:
+                self.primeira = linha
+            self.ultima = linha
+            self.quantidade += 1
+            yield linha
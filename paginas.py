@@ -0,0 +1,145 @@
+# ==========================================
+# paginas.py - PÁGINAS DA API DE LISTAGEM EM CACHE (com a próxima aquecida)
+# ==========================================
+# Quem rola a lista (/api/nomes, rolagem infinita) pede as páginas em
+# sequência, cada uma com o cursor da anterior. Então, a cada página
+# servida, a SEGUINTE já é buscada numa thread à parte e guardada aqui:
+# quando o cliente pedir, ela sai da memória do worker, sem ir ao banco.
+#
+# A chave tem a VERSÃO DOS DADOS (versao_dados.py): qualquer escrita muda
+# a versão e as páginas antigas simplesmente param de ser pedidas (saem
+# pelo LRU). Igual ao cache de fragmentos, nada precisa ser apagado.
+#
+# Guardadas as linhas inteiras; a escolha de campos (?campos=) é feita na
+# saída, então uma mesma página serve a qualquer combinação de campos.
+#
+# O aquecimento nunca disputa o banco com as requisições: uma thread só
+# por worker, com uma fila curta (PAGINAS_FILA). Fila cheia, ou nenhuma
+# conexão livre no pool, e a próxima página simplesmente não é aquecida
+# (será lida quando pedida, como sem este cache). Um robô que percorre a
+# lista não dobra a carga no banco.
+# ==========================================
+
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+from armazenamento import origem_chave
+
+PAGINAS_MAX = int(os.environ.get('PAGINAS_MAX', 1024))
+# PAGINAS_AQUECER=0 desliga a busca antecipada da próxima página
+PAGINAS_AQUECER = os.environ.get('PAGINAS_AQUECER', '1') != '0'
+# Limite de tempo (s) da consulta de aquecimento (ninguém está esperando por ela)
+LIMITE_AQUECIMENTO = float(os.environ.get('LIMITE_AQUECIMENTO', 5))
+# Quantas páginas podem esperar para ser aquecidas (as demais são descartadas)
+PAGINAS_FILA = int(os.environ.get('PAGINAS_FILA', 8))
+
+
+class Paginas:
+    """Páginas (por cursor) da listagem alfabética, por versão dos dados. Uma por worker."""
+
+    def __init__(self, banco, maximo=PAGINAS_MAX, aquecer=PAGINAS_AQUECER, fila=PAGINAS_FILA):
+        self._banco = banco
+        self.maximo = maximo
+        self.aquecer = aquecer
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()  # chave -> (linhas, posição da próxima página ou None)
+        self._aquecendo = set()    # chaves na fila ou sendo carregadas
+        self._fila = queue.Queue(maxsize=max(1, fila))
+        self._trabalhador = None   # thread criada no primeiro aquecimento
+
+    @staticmethod
+    def _chave(versao, filtro_nome, filtro_origem, limite, apos):
+        return (versao, filtro_nome.lower(), origem_chave(filtro_origem), limite,
+                tuple(apos) if apos is not None else None)
+
+    def pagina(self, versao, filtro_nome='', filtro_origem='', limite=20, apos=None):
+        """
+        (linhas, proxima) de uma página: `proxima` é a posição (nome, id)
+        de onde a página seguinte começa, ou None se esta é a última.
+        versao=None (versão indisponível): vai ao banco e não guarda nada.
+        """
+        chave = self._chave(versao, filtro_nome, filtro_origem, limite, apos)
+        guardada = self._guardada(chave) if versao is not None else None
+        if guardada is None:
+            guardada = self._carregar(filtro_nome, filtro_origem, limite, apos)
+            if versao is not None:
+                self._guardar(chave, guardada)
+        linhas, proxima = guardada
+        if proxima is not None and versao is not None and self.aquecer:
+            self._aquecer_proxima(versao, filtro_nome, filtro_origem, limite, proxima)
+        return [dict(l) for l in linhas], proxima
+
+    def limpar(self):
+        with self._lock:
+            self._lru.clear()
+
+    def _carregar(self, filtro_nome, filtro_origem, limite, apos):
+        # Uma linha a mais só para saber se existe a próxima página
+        linhas = self._banco.listar(filtro_nome, filtro_origem, limite + 1, 0, apos=apos)
+        if len(linhas) <= limite:
+            return linhas, None
+        linhas = linhas[:limite]
+        return linhas, (linhas[-1]['nome'], linhas[-1]['id'])
+
+    def _guardada(self, chave):
+        with self._lock:
+            guardada = self._lru.get(chave)
+            if guardada is not None:
+                self._lru.move_to_end(chave)
+            return guardada
+
+    def _guardar(self, chave, guardada):
+        with self._lock:
+            self._lru[chave] = guardada
+            self._lru.move_to_end(chave)
+            while len(self._lru) > self.maximo:
+                self._lru.popitem(last=False)
+
+    def _aquecer_proxima(self, versao, filtro_nome, filtro_origem, limite, apos):
+        if not self._banco.conexao_livre():
+            return  # Pool ocupado: as requisições têm preferência
+        chave = self._chave(versao, filtro_nome, filtro_origem, limite, apos)
+        with self._lock:
+            if chave in self._lru or chave in self._aquecendo:
+                return
+            self._aquecendo.add(chave)
+        # Lida da mesma origem (réplica) que a versão da chave
+        origem = self._banco.origem_das_leituras()
+        try:
+            self._fila.put_nowait((chave, origem, filtro_nome, filtro_origem, limite, apos))
+        except queue.Full:
+            with self._lock:
+                self._aquecendo.discard(chave)
+            return
+        self._iniciar_trabalhador()
+
+    def _iniciar_trabalhador(self):
+        with self._lock:
+            if self._trabalhador is None:
+                # Fora da requisição: quem pediu esta página não espera pela próxima
+                self._trabalhador = threading.Thread(target=self._trabalhar, name='paginas', daemon=True)
+                self._trabalhador.start()
+
+    def _trabalhar(self):
+        self._banco.definir_limite(LIMITE_AQUECIMENTO)
+        while True:
+            item = self._fila.get()
+            try:
+                self._aquecer(*item)
+            finally:
+                self._fila.task_done()
+
+    def _aquecer(self, chave, origem, filtro_nome, filtro_origem, limite, apos):
+        try:
+            self._banco.fixar_leituras(True, origem)
+            # Na fila, o pool pode ter enchido: aí esta página fica para quando for pedida
+            if self._banco.conexao_livre():
+                self._guardar(chave, self._carregar(filtro_nome, filtro_origem, limite, apos))
+        except Exception as e:
+            print(f"[AVISO] Próxima página não aquecida: {e}")
+        finally:
+            self._banco.fixar_leituras(False)
+            with self._lock:
+                self._aquecendo.discard(chave)
@@ -0,0 +1,157 @@
+# ==========================================
+# perfil_inicializacao.py - QUANTO CUSTA SUBIR UM WORKER?
+# ==========================================
+# Sobe o app.py do zero, como um worker do gunicorn (que importa o módulo),
+# várias vezes, cada uma num processo novo, e mede:
+#   - o boot a frio: do início do interpretador até "import app" terminar
+#   - a memória (RSS) do processo logo depois do import e depois das
+#     primeiras requisições (--rotas), com o test client do Flask
+#   - o tempo de import de cada módulo (python -X importtime): os imports
+#     diretos do app.py e os módulos mais pesados no total
+#
+# O boot (mediana) e o RSS depois das requisições têm que ficar dentro das
+# metas (--alvo-boot-ms, --alvo-rss-mb); senão o script termina com erro.
+# As metas padrão valem para um worker com o armazenamento em memória e
+# sem o agendador, numa máquina comum; ajuste-as para a sua.
+#
+# Uso:
+#   python perfil_inicializacao.py
+#   python perfil_inicializacao.py --rodadas 10 --rotas /,/estatisticas,/graficos/origens.png
+#   python perfil_inicializacao.py --armazenamento sqlite   # boot com o SQLite (nomes.db)
+#
+# Só Linux para o RSS (/proc/self/status); nos outros sistemas sai o pico
+# (ru_maxrss).
+# ==========================================
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+
+ALVO_BOOT_MS = 400
+ALVO_RSS_MB = 60
+
+# Roda no processo filho: importa o app, faz as requisições e devolve as medidas em JSON
+_FILHO = r'''
+import json, os, sys, time
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+inicio = time.perf_counter()
+import app
+import_ms = (time.perf_counter() - inicio) * 1000
+rss_import = rss_mb()
+cliente = app.app.test_client()
+status = {}
+for rota in sys.argv[1].split(','):
+    if rota:
+        status[rota] = cliente.get(rota).status_code
+print(json.dumps({
+    'import_ms': import_ms, 'rss_import': rss_import, 'rss_rotas': rss_mb(), 'status': status,
+    'matplotlib': 'matplotlib' in sys.modules,
+}))
+'''
+
+
+def ambiente(armazenamento):
+    env = dict(os.environ, ARMAZENAMENTO=armazenamento, AGENDADOR='0', PYTHONDONTWRITEBYTECODE='1')
+    env.pop('PYTHONPROFILEIMPORTTIME', None)
+    return env
+
+
+def rodada(armazenamento, rotas):
+    """Um boot num processo novo: (tempo total em ms, medidas do filho)."""
+    inicio = time.perf_counter()
+    saida = subprocess.run(
+        [sys.executable, '-c', _FILHO, rotas], cwd=PASTA, env=ambiente(armazenamento),
+        capture_output=True, text=True, check=True,
+    )
+    total_ms = (time.perf_counter() - inicio) * 1000
+    medidas = json.loads(saida.stdout.strip().splitlines()[-1])
+    return total_ms, medidas
+
+
+def tempos_de_import(armazenamento):
+    """
+    [(profundidade, módulo, próprio µs, acumulado µs)] de um "import app",
+    na ordem do -X importtime.
+    """
+    saida = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=PASTA,
+        env=ambiente(armazenamento), capture_output=True, text=True, check=True,
+    )
+    linhas = []
+    for linha in saida.stderr.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, acumulado, modulo = linha[len('import time:'):].split('|', 2)
+        profundidade = (len(modulo) - len(modulo.lstrip())) // 2
+        linhas.append((profundidade, modulo.strip(), int(proprio), int(acumulado)))
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Boot a frio, RSS e tempo de import por módulo de um worker")
+    parser.add_argument('--armazenamento', default='memoria', help="ARMAZENAMENTO do worker (padrão: memoria)")
+    parser.add_argument('--rodadas', type=int, default=5, help="boots medidos (cada um num processo novo)")
+    parser.add_argument('--rotas', default='/,/listar,/estatisticas',
+                        help="requisições feitas depois do import, separadas por vírgula")
+    parser.add_argument('--modulos', type=int, default=15, help="quantos módulos mostrar em cada lista")
+    parser.add_argument('--alvo-boot-ms', type=float, default=ALVO_BOOT_MS)
+    parser.add_argument('--alvo-rss-mb', type=float, default=ALVO_RSS_MB)
+    args = parser.parse_args()
+
+    # === TEMPO DE IMPORT POR MÓDULO ===
+    modulos = tempos_de_import(args.armazenamento)
+    app_total = next(acumulado for prof, nome, _, acumulado in modulos if nome == 'app' and prof == 0)
+    print(f"import app: {app_total / 1000:.0f} ms (python -X importtime)\n")
+    print(f"Imports diretos do app.py (acumulado), top {args.modulos}:")
+    # O -X importtime lista os filhos ANTES do pai: os do app vêm logo acima dele
+    fim = next(i for i, (prof, nome, _, _) in enumerate(modulos) if nome == 'app' and prof == 0)
+    inicio = max((i + 1 for i in range(fim) if modulos[i][0] == 0), default=0)
+    diretos = sorted(((acumulado, nome) for prof, nome, _, acumulado in modulos[inicio:fim] if prof == 1),
+                     reverse=True)
+    for acumulado, nome in diretos[:args.modulos]:
+        print(f"  {acumulado / 1000:8.1f} ms  {nome}")
+    print(f"\nMódulos mais pesados (tempo próprio), top {args.modulos}:")
+    for proprio, nome in sorted(((proprio, nome) for _, nome, proprio, _ in modulos), reverse=True)[:args.modulos]:
+        print(f"  {proprio / 1000:8.1f} ms  {nome}")
+
+    # === BOOT A FRIO E MEMÓRIA ===
+    rodadas = [rodada(args.armazenamento, args.rotas) for _ in range(args.rodadas)]
+    boot = statistics.median(total for total, _ in rodadas)
+    importar = statistics.median(m['import_ms'] for _, m in rodadas)
+    rss_import = statistics.median(m['rss_import'] for _, m in rodadas)
+    rss_rotas = statistics.median(m['rss_rotas'] for _, m in rodadas)
+    medidas = rodadas[-1][1]
+    print(f"\nBoot a frio (mediana de {args.rodadas}): {boot:.0f} ms no total, {importar:.0f} ms no import do app")
+    print(f"RSS do worker: {rss_import:.1f} MB depois do import, {rss_rotas:.1f} MB depois de "
+          + ', '.join(f"{rota} ({status})" for rota, status in medidas['status'].items()))
+    print(f"matplotlib carregado no fim: {'sim' if medidas['matplotlib'] else 'não'}")
+
+    falhas = []
+    if boot > args.alvo_boot_ms:
+        falhas.append(f"boot {boot:.0f} ms > meta {args.alvo_boot_ms:.0f} ms")
+    if rss_rotas > args.alvo_rss_mb:
+        falhas.append(f"RSS {rss_rotas:.1f} MB > meta {args.alvo_rss_mb:.0f} MB")
+    if falhas:
+        print("\n[ERRO] Fora da meta: " + '; '.join(falhas))
+        sys.exit(1)
+    print(f"\nDentro da meta (boot <= {args.alvo_boot_ms:.0f} ms, RSS <= {args.alvo_rss_mb:.0f} MB).")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 import os
-import db as db_conexao # Importa o módulo db com as funções init_db e clear_db
+import armazenamento # Camada de armazenamento (PostgreSQL, SQLite ou memória)
 from dotenv import load_dotenv
 import csv 
 import sys
@@ -62,45 +62,29 @@ def popular_banco_via_csv():
     print(f"✅ {len(dados_do_csv)} registros lidos do arquivo CSV.")
 
     # 2. --- INSERÇÃO NO BANCO ---
-    conn = None
+    # O destino segue a variável ARMAZENAMENTO (postgres, sqlite ou memoria),
+    # então a mesma carga serve para testes de desempenho locais.
     try:
+        banco = armazenamento.criar()
+
         # A. Inicializa o banco (cria a tabela com a restrição UNIQUE se não existir)
-        db_conexao.init_db() 
+        banco.inicializar()
         
         # B. LIMPA O BANCO COMPLETAMENTE (isso resolve as 5514 repetições)
-        db_conexao.clear_db() 
-
-        conn = db_conexao.get_connection()
-        cursor = conn.cursor()
+        banco.limpar()
 
-        print(f"🔄 Inserindo {len(dados_do_csv)} registros no PostgreSQL...")
-        
-        # Query de inserção com ON CONFLICT (que agora funcionará com a restrição UNIQUE)
-        query_insert = """
-            INSERT INTO nomes (nome, significado, origem, motivo_escolha, pesquisas)
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (nome) DO NOTHING; 
-        """
-        
-        # Executa a inserção de todos os dados
-        cursor.executemany(query_insert, dados_do_csv)
+        print(f"🔄 Inserindo {len(dados_do_csv)} registros no {banco.nome}...")
         
-        conn.commit()
+        # Inserção em massa; nomes repetidos são ignorados (ON CONFLICT DO NOTHING)
+        banco.inserir_varios(dados_do_csv)
         
         # Novo check de contagem total
-        cursor.execute("SELECT COUNT(*) FROM nomes")
-        final_count = cursor.fetchone()[0]
+        final_count = banco.contar()
         
         print(f"✅ Carga massiva concluída. Total de registros na tabela: {final_count}")
 
     except Exception as e:
         print(f"❌ Erro ao popular o banco de dados (SQL/Conexão): {e}")
-        if conn:
-            conn.rollback() # Reverte em caso de erro
-    finally:
-        if conn:
-            cursor.close()
-            db_conexao.connection_pool.putconn(conn)
 
 if __name__ == '__main__':
     popular_banco_via_csv()
@@ -0,0 +1,123 @@
+# ==========================================
+# test_app.py - ROTAS E GANCHOS DO APP.PY (armazenamento em memória)
+# ==========================================
+#   python -m pytest -q test_app.py
+# ==========================================
+
+import os
+import stat
+from collections import OrderedDict
+
+import flask
+import pytest
+from jinja2 import FileSystemBytecodeCache
+
+import armazenamento
+
+
+# ==========================================
+# Limite de tempo das consultas (consultar / TempoEsgotado)
+# ==========================================
+
+@pytest.fixture
+def sem_ultimos(app_teste, monkeypatch):
+    monkeypatch.setattr(app_teste, '_ultimos_resultados', OrderedDict())
+
+
+def test_tempo_esgotado_mostra_o_ultimo_resultado_bom(cliente, app_teste, sem_ultimos, monkeypatch):
+    assert cliente.get('/').status_code == 200  # Guarda o último resultado bom
+
+    def resumo_inicio(limite):  # Mesmo nome: mesma chave do último resultado
+        raise armazenamento.TempoEsgotado("canceling statement due to statement timeout")
+    monkeypatch.setattr(app_teste.banco, 'resumo_inicio', resumo_inicio)
+    app_teste.banco.inserir("Zara", "Princesa", "Árabe", "Som")  # O total atual seria 6
+    with cliente:
+        resposta = cliente.get('/')
+        assert flask.g.pagina_degradada
+    pagina = resposta.get_data(as_text=True)
+    assert resposta.status_code == 200
+    assert '<span class="badge bg-primary fs-5">5</span>' in pagina
+    assert "mostrando dados de" in pagina
+    # Página degradada não leva ETag (não pode ser revalidada como se fosse a atual)
+    assert 'ETag' not in resposta.headers
+
+
+def test_tempo_esgotado_sem_resultado_anterior_usa_o_padrao(cliente, app_teste, sem_ultimos, monkeypatch):
+    def resumo_inicio(limite):
+        raise armazenamento.TempoEsgotado("consulta interrompida")
+    monkeypatch.setattr(app_teste.banco, 'resumo_inicio', resumo_inicio)
+    with cliente:
+        resposta = cliente.get('/')
+        assert flask.g.pagina_degradada
+    pagina = resposta.get_data(as_text=True)
+    assert '<span class="badge bg-primary fs-5">0</span>' in pagina
+    assert "demorou demais" in pagina
+
+
+def test_consulta_cancelada_no_sqlite_cai_no_ultimo_resultado(app_teste, sem_ultimos, tmp_path, monkeypatch):
+    banco = armazenamento.ArmazenamentoSQLite(str(tmp_path / 'nomes.db'))
+    banco.inicializar()
+    banco.inserir("Ana", "Graciosa", "Hebraico", "Tradição")
+    monkeypatch.setattr(banco, 'PASSOS_ENTRE_VERIFICACOES', 1)
+    with app_teste.app.test_request_context('/'):
+        assert app_teste.consultar(banco.contar, 'an') == 1
+        banco.definir_limite(None, cancelado=lambda: True)  # Cliente desconectou
+        try:
+            assert app_teste.consultar(banco.contar, 'an') == 1
+        finally:
+            banco.definir_limite(None)
+        assert flask.g.pagina_degradada
+        assert any("mostrando dados de" in m for m in flask.get_flashed_messages())
+
+
+def test_requisicao_seguinte_sem_limite_nem_primario(cliente, app_teste):
+    cliente.get('/')
+    assert app_teste.banco._limite() == (None, None)
+    assert not getattr(app_teste.banco._requisicao(), 'primario', False)
+
+
+# ==========================================
+# Pasta do cache de bytecode dos templates (JINJA_CACHE_DIR)
+# ==========================================
+
+def test_app_usa_cache_de_bytecode_em_disco(app_teste):
+    assert isinstance(app_teste.app.jinja_env.bytecode_cache, FileSystemBytecodeCache)
+
+
+def test_pasta_do_cache_e_criada_so_para_o_dono(app_teste, tmp_path):
+    pasta = tmp_path / 'jinja' / 'cache'
+    app_teste._pasta_so_nossa(str(pasta))
+    assert stat.S_IMODE(os.stat(pasta).st_mode) & 0o077 == 0
+    app_teste._pasta_so_nossa(str(pasta))  # Já existe e é nossa: aceita
+
+
+@pytest.mark.parametrize('modo', [0o777, 0o775, 0o703])
+def test_pasta_gravavel_por_outros_e_recusada(app_teste, tmp_path, modo):
+    pasta = tmp_path / 'compartilhada'
+    pasta.mkdir()
+    os.chmod(pasta, modo)
+    with pytest.raises(OSError, match="outros usuários"):
+        app_teste._pasta_so_nossa(str(pasta))
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason="sem dono de arquivo (Windows)")
+def test_pasta_de_outro_usuario_e_recusada(app_teste, tmp_path, monkeypatch):
+    pasta = tmp_path / 'alheia'
+    pasta.mkdir(mode=0o700)
+    dono = os.stat(pasta).st_uid
+    monkeypatch.setattr(os, 'getuid', lambda: dono + 1)
+    with pytest.raises(OSError, match="outro usuário"):
+        app_teste._pasta_so_nossa(str(pasta))
+
+
+def test_link_ou_arquivo_no_lugar_da_pasta_e_recusado(app_teste, tmp_path):
+    verdadeira = tmp_path / 'verdadeira'
+    verdadeira.mkdir(mode=0o700)
+    link = tmp_path / 'link'
+    link.symlink_to(verdadeira, target_is_directory=True)
+    with pytest.raises(OSError, match="não é uma pasta"):
+        app_teste._pasta_so_nossa(str(link))
+    arquivo = tmp_path / 'arquivo'
+    arquivo.write_text('x')
+    with pytest.raises(OSError):
+        app_teste._pasta_so_nossa(str(arquivo))
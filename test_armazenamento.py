@@ -0,0 +1,504 @@
+# ==========================================
+# test_armazenamento.py - SUÍTE DE CONFORMIDADE DOS ARMAZENAMENTOS
+# ==========================================
+# Os mesmos testes rodam contra memória, SQLite e (opcionalmente) PostgreSQL.
+# O PostgreSQL só entra se TEST_DATABASE_URL estiver definida — a tabela
+# 'nomes' desse banco é APAGADA, então nunca aponte para produção.
+#
+#   python -m pytest -q test_armazenamento.py
+# ==========================================
+
+import os
+import time
+
+import pytest
+
+import armazenamento
+
+NOMES = [
+    # (nome, significado, origem, motivo_escolha, pesquisas)
+    ("Ana", "Graciosa", "Hebraico", "Tradição", 5),
+    ("Anabela", "Graciosa e bela", "Latim", "Som", 0),
+    ("Bruno", "Moreno", "Germânico", "Som", 9),
+    ("Carla", "Forte", "Germânico", "Família", 2),
+    ("Daniel", "Deus é meu juiz", "Hebraico", "Bíblia", 9),
+    ("Mariana", "Amada", "Latim", "Avó", 1),
+]
+
+
+@pytest.fixture(params=['memoria', 'sqlite', 'postgres'])
+def banco(request, tmp_path, monkeypatch):
+    if request.param == 'memoria':
+        b = armazenamento.ArmazenamentoMemoria()
+    elif request.param == 'sqlite':
+        b = armazenamento.ArmazenamentoSQLite(str(tmp_path / 'nomes.db'))
+    else:
+        url = os.environ.get('TEST_DATABASE_URL')
+        if not url:
+            pytest.skip("defina TEST_DATABASE_URL para testar o PostgreSQL")
+        import db
+        monkeypatch.setattr(db, 'DATABASE_URL', url)
+        b = armazenamento.ArmazenamentoPostgres()
+    b.inicializar()
+    b.limpar()
+    b.inserir_varios(NOMES)
+    return b
+
+
+def test_contar_sem_e_com_filtros(banco):
+    assert banco.contar() == 6
+    assert banco.contar('ana') == 3          # Ana, Anabela, Mariana
+    assert banco.contar(filtro_origem='germânico') == 2
+    assert banco.contar(filtro_origem='germ') == 0  # origem é exata (não é busca no texto)
+    assert banco.contar('ana', 'latim') == 2
+    assert banco.contar('zzz') == 0
+
+
+def test_listar_ordem_alfabetica_e_paginacao(banco):
+    pagina1 = banco.listar(limite=4, offset=0)
+    pagina2 = banco.listar(limite=4, offset=4)
+    assert [l['nome'] for l in pagina1] == ["Ana", "Anabela", "Bruno", "Carla"]
+    assert [l['nome'] for l in pagina2] == ["Daniel", "Mariana"]
+    assert set(pagina1[0]) == set(armazenamento.COLUNAS)
+
+
+@pytest.mark.parametrize('ordem, esperado', [
+    ('populares', ["Bruno", "Daniel", "Ana", "Carla", "Mariana", "Anabela"]),
+    ('origem', ["Bruno", "Carla", "Ana", "Daniel", "Anabela", "Mariana"]),
+    ('tamanho', ["Ana", "Bruno", "Carla", "Daniel", "Anabela", "Mariana"]),
+])
+def test_listar_em_outras_ordenacoes(banco, ordem, esperado):
+    assert [l['nome'] for l in banco.listar(limite=6, ordem=ordem)] == esperado
+    assert [l['nome'] for l in banco.listar(limite=2, offset=2, ordem=ordem)] == esperado[2:4]
+    total, pagina = banco.pagina_listagem(limite=3, offset=3, ordem=ordem)
+    assert (total, [l['nome'] for l in pagina]) == (6, esperado[3:])
+    # Com uma origem só, 'origem' é a ordem alfabética
+    assert [l['nome'] for l in banco.listar(filtro_origem='latim', ordem=ordem)] == \
+        [n for n in esperado if n in ("Anabela", "Mariana")]
+
+
+def test_ordenacao_fora_da_lista_branca(banco):
+    with pytest.raises(ValueError):
+        banco.listar(ordem='nome; DROP TABLE nomes')
+    with pytest.raises(ValueError):  # cursores (nome, id) só na ordem alfabética
+        banco.listar(ordem='populares', apos=("Bruno", 3))
+
+
+def test_listar_com_filtro(banco):
+    nomes = [l['nome'] for l in banco.listar('ANA', limite=10)]
+    assert nomes == ["Ana", "Anabela", "Mariana"]
+
+
+def test_buscar_prefixo_ignora_maiusculas(banco):
+    assert [l['nome'] for l in banco.buscar_prefixo('ana')] == ["Ana", "Anabela"]
+    assert banco.buscar_prefixo('xyz') == []
+
+
+def test_incrementar_pesquisas(banco):
+    ids = [l['id'] for l in banco.buscar_prefixo('ana')]
+    banco.incrementar_pesquisas(ids)
+    banco.incrementar_pesquisas(ids[:1])
+    linhas = {l['nome']: l['pesquisas'] for l in banco.listar('ana', limite=10)}
+    assert linhas == {"Ana": 7, "Anabela": 1, "Mariana": 1}
+    banco.incrementar_pesquisas([])
+
+
+def test_inserir_e_duplicata(banco):
+    assert banco.existe_nome('bruno')
+    assert not banco.existe_nome('Zeca')
+    assert banco.inserir("Zeca", "Deus lembrou", "Hebraico", "Teste")
+    assert not banco.inserir("Zeca", "Outro", "Outro", "Outro")
+    assert banco.existe_nome('ZECA')
+    assert banco.contar() == 7
+
+
+def test_inserir_varios_ignora_repetidos(banco):
+    inseridos = banco.inserir_varios([
+        ("Ana", "Repetido", "Hebraico", "x", 0),
+        ("Zilda", "Nova", "Tupi", "x", 0),
+    ])
+    assert inseridos == 1
+    assert banco.contar() == 7
+
+
+def test_mais_pesquisados_desempata_por_nome(banco):
+    assert banco.mais_pesquisados(3) == [
+        {'nome': "Bruno", 'pesquisas': 9},
+        {'nome': "Daniel", 'pesquisas': 9},
+        {'nome': "Ana", 'pesquisas': 5},
+    ]
+
+
+def test_contagem_por_origem(banco):
+    assert banco.contagem_por_origem() == [
+        {'origem': "Germânico", 'count': 2},
+        {'origem': "Hebraico", 'count': 2},
+        {'origem': "Latim", 'count': 2},
+    ]
+
+
+def test_origens_quebradas_viram_uma_so(banco):
+    banco.inserir("Abdão", "Aquele que serve", "\tHebraic o\t", "x")
+    banco.inserir("Abdala", "Servo de Deus", "Ára be", "x")
+    banco.inserir("Abdel", "Servo", "  Á rabe ", "x")
+    assert banco.contar(filtro_origem='HEBR AICO') == 3
+    assert [l['origem'] for l in banco.listar(filtro_origem='árabe')] == ["Ára be", "Ára be"]
+    assert {'origem': "Hebraico", 'count': 3} in banco.contagem_por_origem()
+
+
+def test_contagem_por_origem_acompanha_escritas(banco):
+    banco.inserir("Zeca", "Deus lembrou", "Hebraico", "x")
+    banco.inserir("Sem", "x", "", "x")
+    contagem = {o['origem']: o['count'] for o in banco.contagem_por_origem()}
+    assert contagem == {"Hebraico": 3, "Germânico": 2, "Latim": 2, None: 1}
+    assert banco.pagina_listagem('', 'hebraico', 1, 0)[0] == 3
+    banco.limpar()
+    assert banco.contagem_por_origem() == []
+    assert banco.contar(filtro_origem='hebraico') == 0
+
+
+def test_iniciais_acompanham_escritas(banco):
+    iniciais = {p['prefixo']: p['total'] for p in banco.iniciais()}
+    assert iniciais['A'] == 2 and iniciais['An'] == 2 and iniciais['M'] == 1
+    banco.inserir("maria", "x", "Latim", "x")
+    iniciais = {p['prefixo']: p['total'] for p in banco.iniciais()}
+    assert (iniciais['M'], iniciais['Ma']) == (2, 2)
+    assert [p['prefixo'] for p in banco.iniciais()][:3] == ["A", "An", "B"]
+    banco.limpar()
+    assert banco.iniciais() == []
+
+
+def test_salto_para_a_letra_pelo_cursor(banco):
+    # O cursor (letra, 0) do índice A-Z começa no primeiro nome com a letra
+    assert [l['nome'] for l in banco.listar(limite=2, apos=("C", 0))] == ["Carla", "Daniel"]
+
+
+def test_iniciais_contam_os_nomes_antes_do_cursor(banco):
+    # Iniciais acentuadas ou minúsculas não caem, na listagem, logo depois
+    # da letra anterior: a posição vem de uma contagem pela chave
+    banco.inserir_varios([("Ágata", "x", "Grego", "x", 0), ("maria", "x", "Latim", "x", 0),
+                          ("Élio", "x", "Grego", "x", 0)])
+    total = banco.contar()
+    for p in banco.iniciais():
+        depois = banco.listar(limite=total, apos=(p['prefixo'], 0))
+        assert p['antes'] == total - len(depois), p['prefixo']
+
+
+def test_posicoes_das_iniciais_acompanham_remocao_e_renomeacao_no_sqlite(tmp_path):
+    banco = armazenamento.ArmazenamentoSQLite(str(tmp_path / 'nomes.db'))
+    banco.inicializar()
+    banco.inserir_varios(NOMES + [("Ágata", "x", "Grego", "x", 0), ("maria", "x", "Latim", "x", 0)])
+    conn = banco._conexao()
+    with conn:
+        conn.execute("DELETE FROM nomes WHERE nome = 'Bruno'")
+        conn.execute("UPDATE nomes SET nome = 'Zeca' WHERE nome = 'Anabela'")
+    total = banco.contar()
+    for p in banco.iniciais():
+        depois = banco.listar(limite=total, apos=(p['prefixo'], 0))
+        assert p['antes'] == total - len(depois), p['prefixo']
+    # As posições gravadas batem com uma recontagem completa
+    import migracoes
+    recontadas = dict(conn.execute(migracoes._SQL_POSICOES_INICIAIS).fetchall())
+    assert {p['prefixo']: p['antes'] for p in banco.iniciais()} == \
+        {p: n for p, n in recontadas.items() if p in {q['prefixo'] for q in banco.iniciais()}}
+
+
+def test_todos_para_exportacao(banco):
+    linhas = banco.todos()
+    assert [l['nome'] for l in linhas][:2] == ["Ana", "Anabela"]
+    assert 'id' not in linhas[0]
+    assert linhas[0]['significado'] == "Graciosa"
+
+
+def test_limpar_reinicia_ids(banco):
+    banco.limpar()
+    assert banco.contar() == 0
+    banco.inserir("Ana", "Graciosa", "Hebraico", "x")
+    assert banco.listar()[0]['id'] == 1
+
+
+def test_resumo_inicio_igual_as_consultas_separadas(banco):
+    assert banco.resumo_inicio(3) == (banco.contar(), banco.mais_pesquisados(3))
+    banco.limpar()
+    assert banco.resumo_inicio(3) == (0, [])
+
+
+def test_pagina_listagem_igual_as_consultas_separadas(banco):
+    for filtro_nome, filtro_origem, offset in [('', '', 0), ('ana', '', 2), ('', 'Germânico', 0), ('ana', 'latim', 0)]:
+        assert banco.pagina_listagem(filtro_nome, filtro_origem, 2, offset) == (
+            banco.contar(filtro_nome, filtro_origem),
+            banco.listar(filtro_nome, filtro_origem, 2, offset),
+        )
+
+
+def test_pagina_listagem_alem_do_fim_ainda_traz_o_total(banco):
+    assert banco.pagina_listagem(limite=10, offset=100) == (6, [])
+
+
+def test_resumo_estatisticas_igual_as_consultas_separadas(banco):
+    assert banco.resumo_estatisticas(2) == (banco.contagem_por_origem(), banco.mais_pesquisados(2))
+
+
+def test_total_sem_filtro_acompanha_escritas(banco):
+    # Sem filtro o total vem do contador mantido a cada escrita
+    banco.inserir("Zeca", "Deus lembrou", "Hebraico", "x")
+    assert banco.contar() == 7
+    assert banco.resumo_inicio(1)[0] == 7
+    banco.limpar()
+    assert banco.contar() == 0
+
+
+def test_geracao_muda_com_cadastro_mas_nao_com_pesquisas(banco):
+    inicial = banco.geracao()
+    banco.incrementar_pesquisas([1, 2])
+    assert banco.geracao() == inicial
+    banco.inserir("Zeca", "Deus lembrou", "Hebraico", "x")
+    depois = banco.geracao()
+    assert depois != inicial
+    assert not banco.inserir("Zeca", "Outro", "Outro", "Outro")
+    assert banco.geracao() == depois
+
+
+def test_estimativa_quando_existe_e_um_numero(banco):
+    estimativa = banco.estimar('ana')
+    assert estimativa is None or estimativa >= 0
+
+
+def test_contagens_em_cache_ate_a_proxima_escrita(banco):
+    import contagens
+    servico = contagens.Contagens(banco, ttl=0)
+    assert servico.pagina('ana', '', 2, 0)[:2] == (3, False)
+    banco.inserir("Joana", "Graciosa", "Hebraico", "x")
+    total, aproximado, linhas = servico.pagina('ANA', '', 2, 0)
+    assert (total, aproximado) == (4, False)
+    assert [l['nome'] for l in linhas] == ["Ana", "Anabela"]
+
+
+def test_contagens_acima_do_limite_usam_a_estimativa(banco, monkeypatch):
+    import contagens
+    monkeypatch.setattr(banco, 'estimar', lambda *filtros: 123456)
+    total, aproximado, linhas = contagens.Contagens(banco, exata_ate=1000).pagina('a', '', 2, 0)
+    assert (total, aproximado) == (120000, True)
+    assert len(linhas) == 2
+
+
+def test_listar_por_chave_igual_ao_offset(banco):
+    pagina1 = banco.listar(limite=2)
+    ultima = (pagina1[-1]['nome'], pagina1[-1]['id'])
+    assert banco.listar(limite=2, apos=ultima) == banco.listar(limite=2, offset=2)
+    primeira = (banco.listar(limite=2, offset=4)[0]['nome'], banco.listar(limite=2, offset=4)[0]['id'])
+    assert banco.listar(limite=2, antes=primeira) == banco.listar(limite=2, offset=2)
+    assert banco.listar(limite=2, antes=ultima) == banco.listar(limite=1)
+
+
+def test_listar_por_chave_com_filtro_e_cadastro_no_meio(banco):
+    pagina1 = banco.listar('ana', limite=2)
+    banco.inserir("Aaana", "x", "x", "x")  # entra ANTES da posição já vista
+    seguinte = banco.listar('ana', limite=2, apos=(pagina1[-1]['nome'], pagina1[-1]['id']))
+    assert [l['nome'] for l in seguinte] == ["Mariana"]
+
+
+def test_pagina_listagem_por_chave(banco):
+    total, linhas = banco.pagina_listagem('', 'latim', 5, 0, apos=("Anabela", 2))
+    assert total == 2
+    assert [l['nome'] for l in linhas] == ["Mariana"]
+    total, linhas = banco.pagina_listagem(limite=2, antes=("Carla", 4))
+    assert (total, [l['nome'] for l in linhas]) == (6, ["Anabela", "Bruno"])
+
+
+def test_listar_em_fluxo_igual_ao_listar(banco):
+    assert list(banco.listar_em_fluxo(limite=4, offset=1)) == banco.listar(limite=4, offset=1)
+    assert list(banco.listar_em_fluxo('an', '', 10, 0)) == banco.listar('an', '', 10, 0)
+    assert (list(banco.listar_em_fluxo(limite=2, apos=("Bruno", 3)))
+            == banco.listar(limite=2, apos=("Bruno", 3)))
+    assert (list(banco.listar_em_fluxo(limite=2, antes=("Carla", 4)))
+            == banco.listar(limite=2, antes=("Carla", 4)))
+
+
+def test_versao_dados_muda_com_qualquer_escrita(banco):
+    versao, atualizado_em = banco.versao_dados()
+    assert atualizado_em.tzinfo is not None
+    banco.incrementar_pesquisas([1])
+    v1 = banco.versao_dados()[0]
+    assert v1 != versao
+    banco.inserir("Zeca", "Deus lembrou", "Hebraico", "x")
+    v2 = banco.versao_dados()[0]
+    assert v2 != v1
+    banco.limpar()
+    assert banco.versao_dados()[0] != v2
+
+
+def test_snapshot_fica_com_a_ultima_gravacao_e_nao_muda_a_versao(banco):
+    assert banco.ler_snapshot('teste-inexistente') is None
+    versao = banco.versao_dados()[0]
+    banco.gravar_snapshot('teste', 1, '{"a": 1}')
+    banco.gravar_snapshot('teste', 2, '{"a": 2}')
+    snapshot = banco.ler_snapshot('teste')
+    assert (snapshot['versao'], snapshot['conteudo']) == (2, '{"a": 2}')
+    assert snapshot['gerado_em'].tzinfo is not None
+    assert banco.versao_dados()[0] == versao
+
+
+def test_lideranca_fica_com_o_primeiro(banco, tmp_path):
+    assert banco.tentar_lideranca() and banco.tentar_lideranca()
+    if banco.nome == 'sqlite':
+        # Outro "worker" no mesmo arquivo não vira líder enquanto o primeiro vive
+        outro = armazenamento.ArmazenamentoSQLite(str(tmp_path / 'nomes.db'))
+        assert not outro.tentar_lideranca()
+
+
+def test_migracao_sqlite_pula_o_que_outro_processo_aplicou(tmp_path, monkeypatch):
+    import migracoes
+    caminho = str(tmp_path / 'nomes.db')
+    armazenamento.ArmazenamentoSQLite(caminho).inicializar()
+    # Segundo worker que leu a versão ANTES do primeiro migrar: lista pendente velha
+    leituras = []
+    versao_real = migracoes.versao_sqlite
+
+    def versao_sqlite(conn):
+        leituras.append(conn)
+        return 0 if len(leituras) == 1 else versao_real(conn)
+    monkeypatch.setattr(migracoes, 'versao_sqlite', versao_sqlite)
+    outro = armazenamento.ArmazenamentoSQLite(caminho)
+    assert outro.migrar() == []
+    assert outro.versao_schema() == migracoes.VERSAO_ATUAL
+
+
+def test_leituras_fixadas_numa_replica_ate_ela_cair(monkeypatch):
+    db = pytest.importorskip('db')
+
+    class PoolFalso:
+        def __init__(self, nome):
+            self.nome = nome
+
+        def getconn(self):
+            return object()
+
+        def putconn(self, conn, close=False):
+            pass
+
+    replicas = [db._Replica('dsn', i) for i in (1, 2)]
+    for r in replicas:
+        r.pool, r.checada_em = PoolFalso(r.nome), float('inf')  # sem medir atraso
+    monkeypatch.setattr(db, '_replicas', replicas)
+    monkeypatch.setattr(db, 'get_connection', lambda: 'primario')
+
+    db.fixar_leituras(True)
+    fixada = db.origem_das_leituras()
+    usadas = set()
+    for _ in range(4):
+        conn = db.get_read_connection()
+        usadas.add(db._emprestadas[id(conn)].nome)
+        db.release_connection(conn)
+    assert usadas == {fixada}
+
+    # A réplica fixada sai da rotação: o resto da requisição fica no primário
+    next(r for r in replicas if r.nome == fixada).fora_ate = float('inf')
+    assert db.get_read_connection() == 'primario'
+    assert db.origem_das_leituras() == db.PRIMARIO
+    db.fixar_leituras(False)
+    assert db.origem_das_leituras() is None
+
+
+def test_lideranca_postgres_nao_segura_conexao_de_quem_perde(monkeypatch):
+    db = pytest.importorskip('db')
+    pytest.importorskip('psycopg2')
+
+    class ConexaoFalsa:
+        def __init__(self, pega):
+            self.pega, self.closed, self.autocommit = pega, False, False
+
+        def cursor(self):
+            conexao = self
+
+            class Cursor:
+                def execute(self, sql, params=None):
+                    pass
+
+                def fetchone(self):
+                    return (conexao.pega,)
+
+                def close(self):
+                    pass
+            return Cursor()
+
+        def close(self):
+            self.closed = True
+
+    abertas, vez = [], iter([False, False, True])
+    monkeypatch.setattr(db, 'conexao_avulsa', lambda: abertas.append(ConexaoFalsa(next(vez))) or abertas[-1])
+    banco = armazenamento.ArmazenamentoPostgres()
+    assert not banco.tentar_lideranca() and not banco.tentar_lideranca()
+    assert len(abertas) == 2 and all(c.closed for c in abertas)
+    # Quem pega o lock segura a conexão (a sessão é o lock) e não abre outra
+    assert banco.tentar_lideranca() and banco.tentar_lideranca()
+    assert len(abertas) == 3 and not abertas[-1].closed
+
+
+def test_limite_de_tempo_interrompe_a_consulta_no_sqlite(tmp_path):
+    banco = armazenamento.ArmazenamentoSQLite(str(tmp_path / 'nomes.db'))
+    banco.inicializar()
+    sem_fim = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT COUNT(*) FROM c"
+    banco.definir_limite(0.05)
+    try:
+        with pytest.raises(armazenamento.TempoEsgotado):
+            banco._ler(sem_fim)
+    finally:
+        banco.definir_limite(None)
+    # Sem limite a conexão volta ao normal (nada de progress handler sobrando)
+    assert banco._ler("SELECT 1 AS um") == [{'um': 1}]
+
+
+def test_limite_e_cancelamento_no_postgres(monkeypatch):
+    db = pytest.importorskip('db')
+    from psycopg2.errors import QueryCanceled
+
+    class ConexaoFalsa:
+        def __init__(self):
+            self.comandos, self.cancelada = [], False
+
+        def cursor(self):
+            conexao = self
+
+            class Cursor:
+                description = [('um',)]
+                rowcount = 1
+
+                def execute(self, sql, params=()):
+                    conexao.comandos.append((sql, params))
+                    if sql.startswith("SELECT pg_sleep"):
+                        for _ in range(200):  # Até o vigia cancelar
+                            if conexao.cancelada:
+                                raise QueryCanceled("canceling statement due to user request")
+                            time.sleep(0.01)
+
+                def fetchall(self):
+                    return [(1,)]
+
+                def close(self):
+                    pass
+            return Cursor()
+
+        def cancel(self):
+            self.cancelada = True
+
+    conexao = ConexaoFalsa()
+    devolvidas = []
+    monkeypatch.setattr(db, 'get_connection', lambda: conexao)
+    monkeypatch.setattr(db, 'get_read_connection', lambda: conexao)
+    monkeypatch.setattr(db, 'release_connection', lambda conn, falhou=False: devolvidas.append(falhou))
+    monkeypatch.setattr(db, 'DB_VIGIA_INTERVALO', 0.01)
+
+    # O limite vira um statement_timeout só desta transação (SET LOCAL)
+    assert db.executar_leitura("SELECT 1", limite=2.5) == (['um'], [(1,)])
+    assert conexao.comandos[0] == ("SET LOCAL statement_timeout = %s", (2500,))
+
+    # cancelado() True: o vigia cancela a consulta no servidor; a conexão volta sã ao pool
+    banco = armazenamento.ArmazenamentoPostgres()
+    banco.definir_limite(None, cancelado=lambda: True)
+    try:
+        with pytest.raises(armazenamento.TempoEsgotado):
+            banco._ler("SELECT pg_sleep(10)")
+    finally:
+        banco.definir_limite(None)
+    assert conexao.cancelada and devolvidas == [False, False]
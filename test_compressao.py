@@ -0,0 +1,160 @@
+# ==========================================
+# test_compressao.py - O MIDDLEWARE DE COMPRESSÃO, PELO APP
+# ==========================================
+#   python -m pytest -q test_compressao.py
+# ==========================================
+
+import gzip
+import os
+
+import pytest
+
+import compressao
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+@pytest.fixture
+def middleware(app_teste):
+    if not isinstance(app_teste.app.wsgi_app, compressao.Compressao):
+        pytest.skip("COMPRESSAO=0")
+    return app_teste.app.wsgi_app
+
+
+@pytest.mark.parametrize('cabecalho, esperado', [
+    ('gzip', 'gzip'),
+    ('gzip, deflate', 'gzip'),
+    ('GZIP;q=0.5', 'gzip'),
+    ('gzip;q=0', None),
+    ('gzip;q=0.0, identity', None),
+    ('*', 'br' if compressao.brotli else 'gzip'),
+    ('gzip;q=0, *', 'br' if compressao.brotli else None),
+    ('br;q=0, *', 'gzip'),
+    ('identity', None),
+    ('', None),
+    (None, None),
+])
+def test_negociacao_do_accept_encoding(cabecalho, esperado):
+    assert compressao.escolher_codificacao(cabecalho) == esperado
+
+
+def test_pagina_comprimida_e_igual_a_original(cliente, middleware):
+    original = cliente.get('/listar', headers={'Accept-Encoding': 'identity'})
+    comprimida = cliente.get('/listar', headers=GZIP)
+    assert comprimida.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in comprimida.headers or \
+        int(comprimida.headers['Content-Length']) == len(comprimida.data)
+    assert 'Accept-Encoding' in comprimida.headers['Vary']
+    assert gzip.decompress(comprimida.data) == original.data
+    assert len(comprimida.data) < len(original.data)
+
+
+def test_sem_compressao_aceita_ainda_manda_vary(cliente, middleware):
+    for cabecalhos in ({'Accept-Encoding': 'identity'}, {'Accept-Encoding': 'gzip;q=0'}, {}):
+        resposta = cliente.get('/listar', headers=cabecalhos)
+        assert 'Content-Encoding' not in resposta.headers
+        assert 'Accept-Encoding' in resposta.headers['Vary']
+
+
+def test_head_passa_sem_comprimir(cliente, middleware):
+    resposta = cliente.head('/listar', headers=GZIP)
+    assert resposta.status_code == 200
+    assert 'Content-Encoding' not in resposta.headers
+    assert 'Accept-Encoding' in resposta.headers['Vary']
+
+
+def test_resposta_pequena_nao_e_comprimida(cliente, middleware):
+    resposta = cliente.get('/api/nomes?limite=1&campos=nome', headers=GZIP)
+    assert len(resposta.data) < compressao.TAMANHO_MINIMO
+    assert 'Content-Encoding' not in resposta.headers
+    assert resposta.get_json()['nomes'] == [{'nome': 'Ana'}]
+
+
+def test_erro_nao_e_comprimido(cliente, middleware):
+    resposta = cliente.get('/graficos/pizza.svg', headers=GZIP)
+    assert resposta.status_code == 404 and 'Content-Encoding' not in resposta.headers
+
+
+# ==========================================
+# static/: filtros, ETag e variantes pré-comprimidas
+# ==========================================
+
+@pytest.fixture
+def estatica(app_teste, middleware, tmp_path, monkeypatch):
+    """static/ do app trocada por uma pasta temporária (dentro de tmp_path/static)."""
+    pasta = tmp_path / 'static'
+    pasta.mkdir()
+    monkeypatch.setattr(app_teste.app, 'static_folder', str(pasta))
+    monkeypatch.setattr(middleware, 'pasta_estatica', str(pasta))
+    return pasta
+
+
+CSS = b"body { color: #333; }\n" * 100
+
+
+def envelhecer(caminho, segundos=100):
+    instante = os.path.getmtime(caminho) - segundos
+    os.utime(caminho, (instante, instante))
+
+
+def test_tipo_que_nao_comprime_passa_direto(cliente, estatica):
+    (estatica / 'foto.png').write_bytes(b'\x89PNG' + b'\x00' * 2000)
+    resposta = cliente.get('/static/foto.png', headers=GZIP)
+    assert resposta.status_code == 200 and 'Content-Encoding' not in resposta.headers
+    resposta.close()
+
+
+def test_etag_forte_vira_fraco_ao_comprimir(cliente, estatica):
+    (estatica / 'app.css').write_bytes(CSS)
+    forte = cliente.get('/static/app.css', headers={'Accept-Encoding': 'identity'})
+    comprimida = cliente.get('/static/app.css', headers=GZIP)
+    assert not forte.headers['ETag'].startswith('W/')
+    assert comprimida.headers['ETag'] == 'W/' + forte.headers['ETag']
+    assert gzip.decompress(comprimida.data) == CSS
+    forte.close()
+    comprimida.close()
+
+
+def test_variante_pre_comprimida_mais_nova_e_servida(cliente, estatica):
+    (estatica / 'app.css').write_bytes(CSS)
+    envelhecer(estatica / 'app.css')
+    variante = gzip.compress(b"/* variante */" + CSS)  # Conteúdo diferente: dá para saber de onde veio
+    (estatica / 'app.css.gz').write_bytes(variante)
+    resposta = cliente.get('/static/app.css', headers=GZIP)
+    assert resposta.headers['Content-Encoding'] == 'gzip'
+    assert resposta.mimetype == 'text/css'
+    assert 'Accept-Encoding' in resposta.headers['Vary']
+    assert resposta.data == variante
+    resposta.close()
+
+
+def test_variante_mais_velha_que_o_original_e_ignorada(cliente, estatica):
+    (estatica / 'app.css.gz').write_bytes(gzip.compress(b"/* velha */"))
+    envelhecer(estatica / 'app.css.gz')
+    (estatica / 'app.css').write_bytes(CSS)
+    resposta = cliente.get('/static/app.css', headers=GZIP)
+    assert resposta.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(resposta.data) == CSS  # Comprimida na hora, do original
+    resposta.close()
+
+
+@pytest.mark.parametrize('caminho', ['/static/../segredo.css', '/static/%2e%2e/segredo.css'])
+def test_variante_fora_de_static_nao_e_servida(cliente, estatica, caminho):
+    (estatica.parent / 'segredo.css').write_bytes(CSS)
+    (estatica.parent / 'segredo.css.gz').write_bytes(gzip.compress(CSS))
+    resposta = cliente.get(caminho, headers=GZIP)
+    assert resposta.status_code == 404
+    assert CSS not in resposta.data and gzip.compress(CSS) not in resposta.data
+
+
+def test_precomprimir_so_refaz_o_desatualizado(tmp_path):
+    (tmp_path / 'app.css').write_bytes(CSS)
+    (tmp_path / 'foto.png').write_bytes(os.urandom(4000))  # Não comprime: variante descartada
+    relatorio = {arquivo: tamanhos for arquivo, _, tamanhos in compressao.precomprimir_estaticos(str(tmp_path))}
+    assert relatorio['app.css']['gz'] < len(CSS) and relatorio['foto.png']['gz'] is None
+    assert not (tmp_path / 'foto.png.gz').exists()
+    assert gzip.decompress((tmp_path / 'app.css.gz').read_bytes()) == CSS
+    antes = os.path.getmtime(tmp_path / 'app.css.gz')
+    envelhecer(tmp_path / 'app.css.gz', -100)  # Mais nova que o original: fica
+    compressao.precomprimir_estaticos(str(tmp_path))
+    assert os.path.getmtime(tmp_path / 'app.css.gz') == antes + 100
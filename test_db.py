@@ -1,5 +1,6 @@
 from db import get_connection
 
+conn = None
 try:
     conn = get_connection()
     cursor = conn.cursor()
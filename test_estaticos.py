@@ -0,0 +1,138 @@
+# ==========================================
+# test_estaticos.py - static/ COM HASH NO NOME E CACHE IMUTÁVEL
+# ==========================================
+#   python -m pytest -q test_estaticos.py
+# ==========================================
+
+import gzip
+import json
+import os
+
+import pytest
+
+import estaticos
+
+CSS = b"body { color: #333; }\n"
+
+
+@pytest.fixture
+def pasta(tmp_path):
+    """Uma static/ pequena: um CSS numa subpasta e uma imagem."""
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'style.css').write_bytes(CSS)
+    (tmp_path / 'logo.png').write_bytes(b'\x89PNG' + b'\x00' * 100)
+    return tmp_path
+
+
+def manifesto_em_disco(pasta):
+    return json.loads((pasta / estaticos.MANIFESTO).read_text(encoding='utf-8'))
+
+
+def envelhecer(caminho, segundos=100):
+    instante = os.path.getmtime(caminho) - segundos
+    os.utime(caminho, (instante, instante))
+
+
+def test_gerar_cria_copias_e_manifesto(pasta):
+    manifesto = estaticos.gerar(str(pasta))
+    assert manifesto == manifesto_em_disco(pasta)
+    assert sorted(manifesto) == ['css/style.css', 'logo.png']
+    destino = manifesto['css/style.css']
+    assert destino == estaticos.com_hash('css/style.css', CSS)
+    assert destino.startswith('css/style.') and destino.endswith('.css')
+    assert (pasta / destino).read_bytes() == CSS
+    # Rodar de novo não acha "originais" nas cópias, no manifesto nem nas variantes
+    (pasta / (destino + '.gz')).write_bytes(b'gz')
+    assert estaticos.gerar(str(pasta)) == manifesto
+    assert not list(pasta.rglob('*.tmp'))
+
+
+def test_copia_antiga_e_suas_variantes_sao_apagadas(pasta):
+    antigo = estaticos.gerar(str(pasta))['css/style.css']
+    for variante in ('', '.gz', '.br'):
+        (pasta / (antigo + variante)).write_bytes(b'velho')
+    (pasta / 'css' / 'style.css').write_bytes(CSS + b"a { color: red; }\n")
+    novo = estaticos.gerar(str(pasta))['css/style.css']
+    assert novo != antigo
+    for variante in ('', '.gz', '.br'):
+        assert not (pasta / (antigo + variante)).exists()
+    assert (pasta / novo).exists()
+    assert (pasta / 'css' / 'style.css').exists()  # O original nunca é apagado
+
+
+def test_carregar_usa_o_manifesto_em_dia(pasta, monkeypatch):
+    manifesto = estaticos.gerar(str(pasta))
+    monkeypatch.setattr(estaticos, 'gerar', lambda _: pytest.fail("gerou de novo"))
+    assert estaticos.carregar(str(pasta)) == manifesto
+
+
+def test_carregar_refaz_quando_o_original_e_mais_novo(pasta):
+    antigo = estaticos.gerar(str(pasta))['css/style.css']
+    envelhecer(pasta / estaticos.MANIFESTO)
+    (pasta / 'css' / 'style.css').write_bytes(b"/* editado depois do build */")
+    manifesto = estaticos.carregar(str(pasta))
+    assert manifesto['css/style.css'] != antigo
+    assert manifesto == manifesto_em_disco(pasta)
+
+
+def test_carregar_refaz_com_arquivo_novo_ou_copia_faltando(pasta):
+    manifesto = estaticos.gerar(str(pasta))
+    (pasta / 'novo.js').write_bytes(b"1;")
+    assert 'novo.js' in estaticos.carregar(str(pasta))
+    os.remove(pasta / manifesto['logo.png'])
+    assert estaticos.carregar(str(pasta))['logo.png'] == manifesto['logo.png']
+    assert (pasta / manifesto['logo.png']).exists()
+
+
+def test_carregar_em_disco_somente_leitura_usa_os_nomes_originais(pasta, monkeypatch):
+    def negar(*_):
+        raise PermissionError(30, "Read-only file system")
+    monkeypatch.setattr(estaticos, '_gravar', negar)
+    assert estaticos.carregar(str(pasta)) == {}
+
+
+# ==========================================
+# No app: url_for e Cache-Control
+# ==========================================
+
+@pytest.fixture
+def app_com_hash(app_teste, pasta, monkeypatch):
+    """O app servindo a static/ temporária, com o manifesto dela."""
+    manifesto = estaticos.gerar(str(pasta))
+    monkeypatch.setattr(app_teste.app, 'static_folder', str(pasta))
+    if hasattr(app_teste.app.wsgi_app, 'pasta_estatica'):
+        monkeypatch.setattr(app_teste.app.wsgi_app, 'pasta_estatica', str(pasta))
+    monkeypatch.setattr(app_teste, 'ESTATICOS', manifesto)
+    monkeypatch.setattr(app_teste, '_ESTATICOS_COM_HASH', set(manifesto.values()))
+    return app_teste, manifesto
+
+
+def test_url_for_troca_pelo_nome_com_hash(app_com_hash):
+    app_teste, manifesto = app_com_hash
+    with app_teste.app.test_request_context():
+        assert app_teste.url_for('static', filename='css/style.css') == '/static/' + manifesto['css/style.css']
+        assert app_teste.url_for('static', filename='fora.css') == '/static/fora.css'
+
+
+def test_cache_imutavel_so_nas_urls_com_hash(app_com_hash, cliente):
+    _, manifesto = app_com_hash
+    com_hash = cliente.get('/static/' + manifesto['css/style.css'])
+    assert com_hash.status_code == 200
+    assert com_hash.headers['Cache-Control'] == estaticos.CACHE_IMUTAVEL
+    original = cliente.get('/static/css/style.css')
+    assert original.status_code == 200
+    assert 'immutable' not in original.headers.get('Cache-Control', '')
+    com_hash.close()
+    original.close()
+
+
+def test_variante_pre_comprimida_da_copia_tambem_e_imutavel(app_com_hash, cliente, pasta):
+    app_teste, manifesto = app_com_hash
+    if not hasattr(app_teste.app.wsgi_app, 'pasta_estatica'):
+        pytest.skip("COMPRESSAO=0")
+    (pasta / (manifesto['css/style.css'] + '.gz')).write_bytes(gzip.compress(CSS))
+    resposta = cliente.get('/static/' + manifesto['css/style.css'], headers={'Accept-Encoding': 'gzip'})
+    assert resposta.headers['Content-Encoding'] == 'gzip'
+    assert resposta.headers['Cache-Control'] == estaticos.CACHE_IMUTAVEL
+    resposta.close()
+
@@ -0,0 +1,41 @@
+# ==========================================
+# test_estatisticas.py - O SNAPSHOT DAS ESTATÍSTICAS E A PÁGINA
+# ==========================================
+#   python -m pytest -q test_estatisticas.py
+# ==========================================
+
+import estatisticas
+
+
+def test_sem_snapshot_agrega_na_requisicao_e_avisa(cliente, app_teste, capsys, monkeypatch):
+    monkeypatch.setattr(app_teste, '_sem_snapshot_desde', None)
+    resposta = cliente.get('/estatisticas')
+    assert resposta.status_code == 200 and 'Germânico' in resposta.get_data(as_text=True)
+    assert "sem snapshot" in capsys.readouterr().out
+
+
+def test_com_snapshot_nao_agrega(cliente, app_teste, capsys, monkeypatch):
+    assert estatisticas.atualizar(app_teste.banco)
+    assert not estatisticas.atualizar(app_teste.banco)  # Mesma versão: nada a refazer
+    monkeypatch.setattr(app_teste, '_sem_snapshot_desde', None)
+    monkeypatch.setattr(app_teste.banco, 'resumo_estatisticas', None)  # Se for chamado, quebra
+    resposta = cliente.get('/estatisticas')
+    assert resposta.status_code == 200 and 'Germânico' in resposta.get_data(as_text=True)
+    assert "sem snapshot" not in capsys.readouterr().out
+
+
+def test_agendador_le_versao_e_dados_da_mesma_origem(monkeypatch):
+    import agendador
+    import armazenamento
+    banco = armazenamento.ArmazenamentoMemoria()
+    banco.inserir("Ana", "Graciosa", "Hebraico", "Tradição")
+    eventos = []
+    monkeypatch.setattr(banco, 'fixar_leituras', lambda ativo, origem=None: eventos.append(('fixar', ativo)))
+    for metodo in ('versao_dados', 'resumo_estatisticas'):
+        original = getattr(banco, metodo)
+        monkeypatch.setattr(banco, metodo, lambda *a, _m=metodo, _o=original: eventos.append(_m) or _o(*a))
+    tarefas = agendador.Agendador(banco)
+    tarefas.agendar('estatisticas', lambda: estatisticas.atualizar(banco))
+    assert tarefas.rodar_agora()
+    # A versão é lida primeiro, e tudo com as leituras fixadas
+    assert eventos == [('fixar', True), 'versao_dados', 'resumo_estatisticas', ('fixar', False)]
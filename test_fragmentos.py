@@ -0,0 +1,122 @@
+# ==========================================
+# test_fragmentos.py - CACHE DE FRAGMENTOS ({% cache %})
+# ==========================================
+#   python -m pytest -q test_fragmentos.py
+# ==========================================
+
+import pytest
+from jinja2 import DictLoader, Environment
+
+import fragmentos
+
+
+class Contador:
+    """Conta quantas vezes cada bloco foi de fato renderizado."""
+
+    def __init__(self):
+        self.vezes = {}
+
+    def __call__(self, nome):
+        self.vezes[nome] = self.vezes.get(nome, 0) + 1
+        return f"{nome}#{self.vezes[nome]}"
+
+
+@pytest.fixture
+def ambiente():
+    """Ambiente Jinja com a extensão; a versão dos dados é mudada pelo teste."""
+    estado = {'versao': 1}
+    env = Environment(extensions=[fragmentos.CacheDeFragmentos], loader=DictLoader({
+        'a.html': "{% cache 'k' %}{{ conta('a1') }}{% endcache %}|"
+                  "{% cache 'k' %}{{ conta('a2') }}{% endcache %}",
+        'b.html': "{% cache 'k' %}{{ conta('b') }}{% endcache %}",
+        'c.html': "{% cache 'k' %}{{ conta('c1') }}{% endcache %}\n"
+                  "{% cache 'k' %}{{ conta('c2') }}{% endcache %}",
+        'linhas.html': "{% for i in itens %}{% cache 'linha', i %}{{ conta(i) }}{% endcache %};{% endfor %}",
+        'escape.html': "{% cache 'e' %}{{ texto }}{% endcache %}",
+    }))
+    env.fragmentos = fragmentos.Fragmentos(lambda: estado['versao'], maximo=8, pasta='')
+    env.globals['conta'] = Contador()
+    return env, estado
+
+
+def render(env, nome, **contexto):
+    return env.get_template(nome).render(**contexto)
+
+
+def test_mesma_chave_em_templates_e_linhas_diferentes_nao_colide(ambiente):
+    env, _ = ambiente
+    assert render(env, 'a.html') == "a1#1|a2#1"
+    assert render(env, 'b.html') == "b#1"
+    assert render(env, 'c.html') == "c1#1\nc2#1"
+    assert render(env, 'a.html') == "a1#1|a2#1"  # Do cache, cada bloco o seu
+    assert render(env, 'b.html') == "b#1"
+    assert render(env, 'c.html') == "c1#1\nc2#1"
+
+
+def test_partes_da_chave_separam_os_fragmentos(ambiente):
+    env, _ = ambiente
+    assert render(env, 'linhas.html', itens=['x', 'y']) == "x#1;y#1;"
+    assert render(env, 'linhas.html', itens=['y', 'z', 'x']) == "y#1;z#1;x#1;"
+
+
+def test_nova_versao_renderiza_de_novo(ambiente):
+    env, estado = ambiente
+    assert render(env, 'b.html') == "b#1"
+    estado['versao'] = 2
+    assert render(env, 'b.html') == "b#2"
+    estado['versao'] = 1  # A versão velha ainda está no LRU
+    assert render(env, 'b.html') == "b#1"
+
+
+def test_versao_none_nao_usa_o_cache(ambiente):
+    env, estado = ambiente
+    assert render(env, 'b.html') == "b#1"
+    estado['versao'] = None
+    assert render(env, 'b.html') == "b#2"
+    assert render(env, 'b.html') == "b#3"
+    estado['versao'] = 1  # O que foi renderizado sem versão não entrou no cache
+    assert render(env, 'b.html') == "b#1"
+
+
+def test_sem_fragmentos_configurados_o_bloco_so_renderiza(ambiente):
+    env, _ = ambiente
+    env.fragmentos = None
+    assert render(env, 'b.html') == "b#1"
+    assert render(env, 'b.html') == "b#2"
+
+
+def test_html_guardado_nao_e_escapado_de_novo():
+    env = Environment(autoescape=True, extensions=[fragmentos.CacheDeFragmentos])
+    env.fragmentos = fragmentos.Fragmentos(lambda: 1, pasta='')
+    modelo = env.from_string("{% cache 'e' %}{{ texto }}{% endcache %}")
+    assert modelo.render(texto='<b>') == "&lt;b&gt;"
+    assert modelo.render(texto='outro') == "&lt;b&gt;"
+
+
+def test_lru_descarta_o_menos_usado_ao_passar_do_maximo():
+    vezes = []
+    cache = fragmentos.Fragmentos(lambda: 1, maximo=2, pasta='')
+
+    def obter(chave):
+        return cache.obter_ou_renderizar(chave, lambda: vezes.append(chave) or chave)
+
+    obter('a')
+    obter('b')
+    obter('a')  # 'a' passa a ser o mais recente
+    obter('c')  # Passa do máximo: sai 'b'
+    assert len(cache._lru) == 2
+    obter('a')
+    obter('c')
+    assert vezes == ['a', 'b', 'c']
+    obter('b')
+    assert vezes == ['a', 'b', 'c', 'b']
+
+
+def test_pasta_compartilhada_serve_outro_worker(tmp_path):
+    vezes = []
+    um = fragmentos.Fragmentos(lambda: 7, pasta=str(tmp_path))
+    outro = fragmentos.Fragmentos(lambda: 7, pasta=str(tmp_path))
+    assert um.obter_ou_renderizar('k', lambda: vezes.append(1) or 'html') == 'html'
+    assert outro.obter_ou_renderizar('k', lambda: vezes.append(2) or 'outro') == 'html'
+    assert vezes == [1]
+    assert not list(tmp_path.glob('*.tmp'))
@@ -0,0 +1,171 @@
+# ==========================================
+# test_graficos.py - GRÁFICOS DESENHADOS UMA VEZ POR VERSÃO
+# ==========================================
+#   python -m pytest -q test_graficos.py
+# ==========================================
+
+import threading
+import time
+from xml.etree import ElementTree
+
+import pytest
+
+import graficos as servico_graficos
+
+
+# ==========================================
+# graficos.Graficos (um desenho por chave)
+# ==========================================
+
+def test_pedidos_simultaneos_desenham_uma_vez():
+    graficos = servico_graficos.Graficos()
+    comecou, liberar = threading.Event(), threading.Event()
+    desenhos = []
+
+    def desenhar():
+        desenhos.append(1)
+        comecou.set()
+        liberar.wait(5)
+        return b'<svg/>'
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(graficos.obter_ou_desenhar('k', desenhar)))
+               for _ in range(8)]
+    threads[0].start()
+    assert comecou.wait(5)
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.05)  # Os outros chegam enquanto o primeiro desenha
+    liberar.set()
+    for t in threads:
+        t.join(5)
+    assert resultados == [b'<svg/>'] * 8
+    assert len(desenhos) == 1
+    assert graficos.obter_ou_desenhar('k', lambda: pytest.fail("desenhou de novo")) == b'<svg/>'
+
+
+def test_se_o_desenho_falha_quem_esperava_tenta_de_novo():
+    graficos = servico_graficos.Graficos()
+    comecou, liberar = threading.Event(), threading.Event()
+
+    def desenho_que_falha():
+        comecou.set()
+        liberar.wait(5)
+        raise RuntimeError("falhou")
+
+    erros, resultados = [], []
+
+    def primeiro():
+        try:
+            graficos.obter_ou_desenhar('k', desenho_que_falha)
+        except RuntimeError as e:
+            erros.append(e)
+
+    t1 = threading.Thread(target=primeiro)
+    t1.start()
+    assert comecou.wait(5)
+    t2 = threading.Thread(target=lambda: resultados.append(graficos.obter_ou_desenhar('k', lambda: b'ok')))
+    t2.start()
+    time.sleep(0.05)  # O segundo espera pelo primeiro...
+    liberar.set()  # ... que falha
+    t1.join(5)
+    t2.join(5)
+    assert len(erros) == 1 and resultados == [b'ok']
+    assert graficos.obter_ou_desenhar('k', lambda: b'outro') == b'ok'
+
+
+def test_sem_chave_desenha_sem_guardar():
+    graficos = servico_graficos.Graficos()
+    assert graficos.obter_ou_desenhar(None, lambda: b'a') == b'a'
+    assert graficos.obter_ou_desenhar(None, lambda: b'b') == b'b'
+
+
+def test_lru_descarta_o_mais_antigo():
+    graficos = servico_graficos.Graficos(maximo=2)
+    for chave in 'abc':
+        graficos.obter_ou_desenhar(chave, lambda: chave.encode())
+    assert graficos.obter_ou_desenhar('a', lambda: b'novo') == b'novo'
+    assert graficos.obter_ou_desenhar('c', lambda: b'novo') == b'c'
+
+
+# ==========================================
+# graficos.barras_svg
+# ==========================================
+
+def ler_svg(dados):
+    """Árvore do SVG (falha se não for XML válido) e os textos dele."""
+    raiz = ElementTree.fromstring(dados)
+    return raiz, [t.text for t in raiz.iter('{http://www.w3.org/2000/svg}text')]
+
+
+@pytest.mark.parametrize('tipo', ['bar', 'barh'])
+@pytest.mark.parametrize('labels, values', [
+    ([], []),
+    (["Ana", "Bruno"], [None, None]),
+    (["Ana", "Bruno"], [0, 0]),
+    (["Ana", None, "Carla"], [3, None, 0]),
+])
+def test_svg_com_dados_vazios_ou_zerados(tipo, labels, values):
+    raiz, textos = ler_svg(servico_graficos.barras_svg(labels, values, tipo, "Título"))
+    retangulos = list(raiz.iter('{http://www.w3.org/2000/svg}rect'))
+    assert len(retangulos) == len(values)
+    assert all(float(r.get('width')) >= 0 and float(r.get('height')) >= 0 for r in retangulos)
+    assert "Título" in textos
+    assert 'nan' not in ''.join(t or '' for t in textos)
+
+
+@pytest.mark.parametrize('tipo', ['bar', 'barh'])
+def test_svg_escapa_rotulos_e_titulo(tipo):
+    dados = servico_graficos.barras_svg(['<&>', 'a"b'], [2, 1], tipo, 'Top <5> & "mais"', xlabel='<x>', ylabel='<y>')
+    raiz, textos = ler_svg(dados)
+    assert '<&>' in textos and 'a"b' in textos
+    assert raiz.get('aria-label') == 'Top <5> & "mais"'
+    assert b'<&>' not in dados and b'<5>' not in dados
+
+
+# ==========================================
+# Rota /graficos/<nome>.<formato>
+# ==========================================
+
+@pytest.mark.parametrize('url', ['/graficos/pizza.svg', '/graficos/origens.gif', '/graficos/top5.exe'])
+def test_grafico_desconhecido_e_404(cliente, url):
+    assert cliente.get(url).status_code == 404
+
+
+def test_grafico_sem_dados_e_404(cliente, app_teste):
+    app_teste.banco.limpar()
+    app_teste.versao_dados.invalidar()
+    assert cliente.get('/graficos/origens.svg').status_code == 404
+
+
+def test_grafico_responde_304_com_o_mesmo_etag(cliente, app_teste):
+    resposta = cliente.get('/graficos/origens.svg')
+    assert resposta.status_code == 200 and resposta.mimetype == 'image/svg+xml'
+    etag = resposta.headers['ETag']
+    assert cliente.get('/graficos/origens.svg', headers={'If-None-Match': etag}).status_code == 304
+    # O outro gráfico tem outro ETag
+    assert cliente.get('/graficos/top5.svg', headers={'If-None-Match': etag}).status_code == 200
+    app_teste.banco.inserir("Zara", "Princesa", "Árabe", "Som")
+    app_teste.versao_dados.invalidar()
+    assert cliente.get('/graficos/origens.svg', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_grafico_imutavel_so_com_a_versao_atual(cliente, app_teste):
+    versao = app_teste.versao_dados.atual()[0]
+    atual = cliente.get('/graficos/origens.svg', query_string={'v': versao})
+    assert 'immutable' in atual.headers['Cache-Control']
+    for v in (None, 'velha', versao + 1):
+        resposta = cliente.get('/graficos/origens.svg', query_string={'v': v} if v else None)
+        assert resposta.status_code == 200
+        assert resposta.headers['Cache-Control'] == 'no-cache'
+        assert resposta.data == atual.data
+
+
+def test_grafico_do_snapshot_usa_a_versao_dele(cliente, app_teste, monkeypatch):
+    import estatisticas
+    estatisticas.atualizar(app_teste.banco)
+    versao = app_teste.banco.ler_snapshot(estatisticas.SNAPSHOT)['versao']
+    monkeypatch.setattr(app_teste.banco, 'resumo_estatisticas', None)  # Nada é desenhado aqui
+    resposta = cliente.get('/graficos/top5.svg', query_string={'v': versao})
+    assert resposta.status_code == 200 and 'immutable' in resposta.headers['Cache-Control']
+    assert cliente.get('/graficos/top5.svg', headers={'If-None-Match': resposta.headers['ETag']}).status_code == 304
@@ -0,0 +1,129 @@
+# ==========================================
+# test_metricas.py - MÉTRICAS DAS CONSULTAS E /admin/consultas
+# ==========================================
+#   python -m pytest -q test_metricas.py
+# ==========================================
+
+import pytest
+
+import armazenamento
+import metricas
+
+
+@pytest.fixture(autouse=True)
+def metricas_zeradas():
+    metricas.zerar()
+    yield
+    metricas.zerar()
+
+
+@pytest.fixture
+def planos_na_hora(monkeypatch):
+    """O plano das lentas é capturado na hora, sem a thread de fundo."""
+    class ThreadNaHora:
+        def __init__(self, target, args, daemon):
+            self._rodar = lambda: target(*args)
+
+        def start(self):
+            self._rodar()
+    monkeypatch.setattr(metricas.threading, 'Thread', ThreadNaHora)
+
+
+def estatisticas_de(sql):
+    return next(c for c in metricas.resumo()['consultas'] if c['consulta'] == metricas.impressao_digital(sql))
+
+
+def test_impressao_digital_agrupa_pelo_formato_da_consulta():
+    assert metricas.impressao_digital("SELECT * FROM nomes WHERE nome = 'Ana'  LIMIT 10") == \
+        metricas.impressao_digital("SELECT * FROM nomes WHERE nome = 'O''Neil' LIMIT 20") == \
+        "SELECT * FROM nomes WHERE nome = ? LIMIT ?"
+    assert metricas.impressao_digital("UPDATE nomes SET pesquisas = 1 WHERE id IN (%s, %s, %s)") == \
+        "UPDATE nomes SET pesquisas = ? WHERE id IN (...)"
+
+
+def test_histograma_por_faixa_e_totais():
+    sql = "SELECT 1"
+    for segundos in (0.0005, 0.001, 0.003, 0.4, 99):
+        metricas.registrar(sql, segundos, linhas=2, espera_pool=0.01)
+    metricas.registrar(sql, 0.002, erro=True)
+    est = estatisticas_de(sql)
+    faixas = metricas.FAIXAS_MS
+    esperado = [0] * len(faixas)
+    for ms in (0.5, 1, 3, 400, 99000, 2):
+        esperado[next(i for i, f in enumerate(faixas) if ms <= f)] += 1
+    assert est['histograma'] == esperado
+    assert (est['execucoes'], est['erros'], est['linhas']) == (6, 1, 10)
+    assert est['max_ms'] == pytest.approx(99000)
+    assert est['espera_pool_media_ms'] == pytest.approx(50 / 6)
+
+
+def test_plano_das_lentas_uma_vez_por_intervalo(monkeypatch, planos_na_hora):
+    monkeypatch.setattr(metricas, 'CONSULTA_LENTA_MS', 10)
+    explicados = []
+    for _ in range(3):
+        metricas.registrar("SELECT lenta", 0.02, explicar=lambda: explicados.append(1) or "Seq Scan")
+    metricas.registrar("SELECT rapida", 0.001, explicar=lambda: pytest.fail("rápida não é explicada"))
+    assert len(explicados) == 1
+    assert [p['plano'] for p in metricas.resumo()['planos']] == ["Seq Scan"]
+
+
+def test_explain_nao_e_explicado_de_novo():
+    assert metricas.Cronometro("  explain (FORMAT JSON) SELECT 1", explicar=lambda: "x").explicar is None
+    assert metricas.Cronometro("SELECT 1", explicar=len).explicar is len
+
+
+def test_explain_lento_no_sqlite_nao_vira_erro(tmp_path, monkeypatch, planos_na_hora):
+    monkeypatch.setattr(metricas, 'CONSULTA_LENTA_MS', 0)
+    monkeypatch.setattr(metricas, 'PLANO_INTERVALO', 0)
+    banco = armazenamento.ArmazenamentoSQLite(str(tmp_path / 'nomes.db'))
+    banco.inicializar()
+    banco._ler("SELECT id FROM nomes")
+    banco._ler("EXPLAIN QUERY PLAN SELECT id FROM nomes")
+    planos = metricas.resumo()['planos']
+    assert [p['sql'] for p in planos] == ["SELECT id FROM nomes"]
+    assert 'falha' not in planos[0]['plano']
+
+
+# ==========================================
+# /admin/consultas
+# ==========================================
+
+TOKEN = 'segredo-de-teste'
+
+
+@pytest.fixture
+def admin(app_teste, monkeypatch):
+    monkeypatch.setattr(app_teste, 'ADMIN_TOKEN', TOKEN)
+    return {'X-Admin-Token': TOKEN}
+
+
+def test_admin_sem_token_configurado_nao_existe(cliente, app_teste, monkeypatch):
+    monkeypatch.setattr(app_teste, 'ADMIN_TOKEN', '')
+    assert cliente.get('/admin/consultas', headers={'X-Admin-Token': ''}).status_code == 404
+
+
+def test_admin_so_aceita_o_token_no_cabecalho(cliente, admin):
+    assert cliente.get('/admin/consultas').status_code == 404
+    assert cliente.get('/admin/consultas', query_string={'token': TOKEN}).status_code == 404
+    assert cliente.get('/admin/consultas', headers={'X-Admin-Token': 'outro'}).status_code == 404
+    resposta = cliente.get('/admin/consultas', headers=admin)
+    assert resposta.status_code == 200
+    assert TOKEN not in resposta.get_data(as_text=True)
+
+
+def test_admin_em_json(cliente, admin):
+    cliente.get('/')
+    dados = cliente.get('/admin/consultas?formato=json', headers=admin).get_json()
+    assert set(dados) >= {'desde', 'consulta_lenta_ms', 'faixas_ms', 'consultas', 'planos'}
+    assert dados['faixas_ms'][-1] == '∞'
+
+
+def test_zerar_so_por_post(cliente, admin):
+    metricas.registrar("SELECT 1", 0.001)
+    assert cliente.get('/admin/consultas/zerar', headers=admin).status_code == 405
+    assert cliente.get('/admin/consultas?zerar=1', headers=admin).status_code == 200
+    assert metricas.resumo()['consultas']
+    assert cliente.post('/admin/consultas/zerar').status_code == 404  # Sem token
+    resposta = cliente.post('/admin/consultas/zerar', headers=admin)
+    assert resposta.status_code == 303 and resposta.headers['Location'].endswith('/admin/consultas')
+    assert metricas.resumo()['consultas'] == []
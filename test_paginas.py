@@ -0,0 +1,224 @@
+# ==========================================
+# test_paginas.py - PÁGINAS DA API EM CACHE E A ROTA /api/nomes
+# ==========================================
+#   python -m pytest -q test_paginas.py
+# ==========================================
+
+import pytest
+
+import armazenamento
+import paginacao
+import paginas as servico_paginas
+
+NOMES = [
+    # (nome, significado, origem, motivo_escolha, pesquisas)
+    ("Ana", "Graciosa", "Hebraico", "Tradição", 5),
+    ("Anabela", "Graciosa e bela", "Latim", "Som", 0),
+    ("Bruno", "Moreno", "Germânico", "Som", 9),
+    ("Carla", "Forte", "Germânico", "Família", 2),
+    ("Daniel", "Deus é meu juiz", "Hebraico", "Bíblia", 9),
+    ("Mariana", "Amada", "Latim", "Avó", 1),
+]
+
+
+@pytest.fixture
+def banco():
+    b = armazenamento.ArmazenamentoMemoria()
+    b.inserir_varios(NOMES)
+    return b
+
+
+def contar_leituras(banco, monkeypatch):
+    leituras = []
+    listar = banco.listar
+
+    def listar_contando(*args, **kwargs):
+        leituras.append(kwargs.get('apos'))
+        return listar(*args, **kwargs)
+    monkeypatch.setattr(banco, 'listar', listar_contando)
+    return leituras
+
+
+# ==========================================
+# paginas.Paginas
+# ==========================================
+
+def test_paginas_seguem_o_cursor_ate_o_fim(banco):
+    paginas = servico_paginas.Paginas(banco, aquecer=False)
+    linhas, proxima = paginas.pagina(1, limite=4)
+    assert [l['nome'] for l in linhas] == ["Ana", "Anabela", "Bruno", "Carla"]
+    assert proxima == ("Carla", linhas[-1]['id'])
+    linhas, proxima = paginas.pagina(1, limite=4, apos=proxima)
+    assert [l['nome'] for l in linhas] == ["Daniel", "Mariana"]
+    assert proxima is None
+
+
+def test_pagina_guardada_ate_a_versao_mudar(banco, monkeypatch):
+    paginas = servico_paginas.Paginas(banco, aquecer=False)
+    leituras = contar_leituras(banco, monkeypatch)
+    paginas.pagina(1, 'an', limite=10)
+    banco.inserir("Antonia", "Inestimável", "Latim", "Som")
+    assert [l['nome'] for l in paginas.pagina(1, 'AN', limite=10)[0]] == ["Ana", "Anabela", "Daniel", "Mariana"]
+    assert len(leituras) == 1
+    assert "Antonia" in [l['nome'] for l in paginas.pagina(2, 'an', limite=10)[0]]
+    # Sem versão (indisponível): sempre do banco, nada guardado
+    paginas.pagina(None, 'an', limite=10)
+    paginas.pagina(None, 'an', limite=10)
+    assert len(leituras) == 4
+
+
+def test_proxima_pagina_aquecida_em_segundo_plano(banco, monkeypatch):
+    paginas = servico_paginas.Paginas(banco)
+    leituras = contar_leituras(banco, monkeypatch)
+    _, proxima = paginas.pagina(1, limite=2)
+    paginas._fila.join()
+    assert leituras == [None, proxima]
+    paginas.pagina(1, limite=2, apos=proxima)
+    paginas._fila.join()
+    # A segunda saiu da memória; só a terceira (aquecida agora) foi ao banco
+    assert len(leituras) == 3
+
+
+def test_sem_conexao_livre_nao_aquece(banco, monkeypatch):
+    paginas = servico_paginas.Paginas(banco)
+    monkeypatch.setattr(banco, 'conexao_livre', lambda: False)
+    leituras = contar_leituras(banco, monkeypatch)
+    paginas.pagina(1, limite=2)
+    paginas._fila.join()
+    assert leituras == [None]
+    assert paginas._trabalhador is None
+
+
+def test_fila_cheia_descarta_o_aquecimento(banco, monkeypatch):
+    paginas = servico_paginas.Paginas(banco, fila=1)
+    monkeypatch.setattr(paginas, '_iniciar_trabalhador', lambda: None)  # Ninguém esvazia a fila
+    paginas.pagina(1, limite=2)
+    paginas.pagina(1, 'a', limite=1)
+    assert paginas._fila.qsize() == 1
+    assert len(paginas._aquecendo) == 1
+
+
+# ==========================================
+# Rota /api/nomes
+# ==========================================
+
+def test_api_segue_o_proximo_ate_o_fim(cliente, app_teste):
+    nomes, cursor, paginas_lidas = [], '', 0
+    while True:
+        resposta = cliente.get('/api/nomes', query_string={'limite': 2, 'cursor': cursor})
+        assert resposta.status_code == 200
+        dados = resposta.get_json()
+        nomes += [n['nome'] for n in dados['nomes']]
+        paginas_lidas += 1
+        if dados['proximo'] is None:
+            assert 'Link' not in resposta.headers
+            break
+        assert f"cursor={dados['proximo']}" in resposta.headers['Link']
+        assert 'rel="next"' in resposta.headers['Link']
+        cursor = dados['proximo']
+    assert nomes == sorted(l['nome'] for l in app_teste.banco.todos())
+    assert paginas_lidas == 3
+
+
+def test_api_escolhe_os_campos(cliente):
+    resposta = cliente.get('/api/nomes?limite=2&campos=nome,origem')
+    assert [set(n) for n in resposta.get_json()['nomes']] == [{'nome', 'origem'}] * 2
+    # O link da próxima página mantém a escolha
+    assert 'campos=nome' in resposta.headers['Link'] and 'limite=2' in resposta.headers['Link']
+
+
+def test_api_recusa_campo_desconhecido(cliente):
+    resposta = cliente.get('/api/nomes?campos=nome,senha')
+    assert resposta.status_code == 400
+    assert 'senha' in resposta.get_json()['erro']
+
+
+@pytest.mark.parametrize('cursor', [
+    'nao-e-um-cursor',
+    paginacao.codificar_cursor('antes', {'nome': 'Bruno', 'id': 2}),  # Só 'apos' na API
+])
+def test_api_recusa_cursor_invalido(cliente, cursor):
+    resposta = cliente.get('/api/nomes', query_string={'cursor': cursor})
+    assert resposta.status_code == 400
+    assert resposta.get_json()['erro'] == "cursor inválido"
+
+
+def test_api_recusa_limite_que_nao_e_numero(cliente):
+    assert cliente.get('/api/nomes?limite=dez').status_code == 400
+
+
+def test_api_responde_304_com_o_mesmo_etag(cliente, app_teste):
+    etag = cliente.get('/api/nomes').headers['ETag']
+    assert cliente.get('/api/nomes', headers={'If-None-Match': etag}).status_code == 304
+    app_teste.banco.inserir("Zara", "Princesa", "Árabe", "Som")
+    app_teste.versao_dados.invalidar()
+    assert cliente.get('/api/nomes', headers={'If-None-Match': etag}).status_code == 200
+
+
+# ==========================================
+# paginacao.indice_alfabetico (barra A-Z)
+# ==========================================
+
+def test_salto_para_a_letra_cai_na_pagina_do_cursor(banco):
+    # "Ágata" vem depois de "Mariana" na listagem (ordem binária), mas a
+    # inicial "Á" fica entre "A" e "B" no ORDER BY prefixo
+    banco.inserir_varios([("Ágata", "x", "Grego", "x", 0), ("maria", "x", "Latim", "x", 0)])
+    indice = paginacao.indice_alfabetico(banco.iniciais(), 2)
+    listagem = [l['nome'] for l in banco.listar(limite=100)]
+    for letra in indice['letras']:
+        _, (nome, id_) = paginacao.decodificar_cursor(letra['cursor'])
+        primeiro = banco.listar(limite=1, apos=(nome, id_))[0]['nome']
+        assert letra['page'] == listagem.index(primeiro) // 2 + 1, letra['rotulo']
+
+
+# ==========================================
+# paginacao.janela / paginacao.paginador (barra de páginas)
+# ==========================================
+
+@pytest.mark.parametrize('pagina, total, esperado', [
+    (1, 0, []),
+    (1, 1, [1]),
+    (1, 2, [1, 2]),
+    (2, 2, [1, 2]),
+    (1, 7, [1, 2, 3, None, 7]),
+    (4, 7, [1, 2, 3, 4, 5, 6, 7]),
+    (50, 100, [1, None, 48, 49, 50, 51, 52, None, 100]),
+    (100, 100, [1, None, 98, 99, 100]),
+    (0, 5, [1, 2, 3, None, 5]),
+    (-3, 5, [1, 2, 3, None, 5]),
+    (999, 5, [1, None, 3, 4, 5]),
+])
+def test_janela(pagina, total, esperado):
+    assert paginacao.janela(pagina, total, vizinhos=2) == esperado
+
+
+def test_janela_nunca_passa_do_tamanho_maximo():
+    for total in range(0, 30):
+        for pagina in range(-1, total + 2):
+            numeros = paginacao.janela(pagina, total, vizinhos=2)
+            assert len(numeros) <= 2 * 2 + 5
+            assert [n for n in numeros if n is not None] == sorted(set(n for n in numeros if n is not None))
+            # Um salto sempre esconde pelo menos uma página
+            for antes, salto, depois in zip(numeros, numeros[1:], numeros[2:]):
+                if salto is None:
+                    assert depois - antes > 1
+
+
+@pytest.mark.parametrize('pagina, total, atual, anterior, proxima', [
+    (1, 0, 1, None, None),
+    (1, 1, 1, None, None),
+    (1, 2, 1, None, 2),
+    (2, 2, 2, 1, None),
+    (0, 3, 1, None, 2),
+    (9, 3, 3, 2, None),
+])
+def test_paginador_prende_a_pagina_ao_intervalo(pagina, total, atual, anterior, proxima):
+    barra = paginacao.paginador(pagina, total, 'c-antes', 'c-apos', vizinhos=2)
+    assert barra['atual'] == atual
+    assert barra['paginas'] == paginacao.janela(atual, total, vizinhos=2)
+    assert (barra['anterior'] or {}).get('page') == anterior
+    assert (barra['proxima'] or {}).get('page') == proxima
+    if anterior:
+        assert barra['anterior']['cursor'] == 'c-antes'
+    if proxima:
+        assert barra['proxima']['cursor'] == 'c-apos'
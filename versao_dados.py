@@ -0,0 +1,89 @@
+# ==========================================
+# versao_dados.py - VERSÃO DOS DADOS PARA CACHE HTTP (ETag / 304)
+# ==========================================
+# O banco mantém um número de versão que sobe a cada escrita em 'nomes'
+# (cadastro, contador de pesquisas, carga, limpeza - migração 6) e o
+# instante da última mudança. As páginas de leitura mandam:
+#   ETag: W/"<versão>-<assinatura do código>"
+#   Last-Modified: <última mudança>
+#   Cache-Control: no-cache   (pode guardar, mas sempre pergunte antes)
+# e quem volta com If-None-Match/If-Modified-Since recebe 304 sem nenhuma
+# consulta de página rodar.
+#
+# A versão fica em cache no worker por VERSAO_DADOS_TTL segundos: dentro
+# desse tempo o 304 sai sem ir ao banco. Escrita feita neste worker
+# invalida na hora; em outro worker, aparece em até VERSAO_DADOS_TTL.
+#
+# Com réplicas, cada requisição lê de uma origem só (db.fixar_leituras) e
+# o cache é POR ORIGEM: a versão usada no ETag e nas chaves de cache veio
+# do mesmo servidor que as linhas da página, então nunca é mais nova que
+# elas (uma réplica atrasada não ganha o ETag da versão nova).
+# ==========================================
+
+import glob
+import hashlib
+import os
+import threading
+import time
+
+import estaticos
+
+VERSAO_DADOS_TTL = float(os.environ.get('VERSAO_DADOS_TTL', 2))
+
+
+def _assinatura_do_codigo():
+    """
+    Hash curto do código, dos templates e de static/: um deploy novo muda o
+    HTML sem mudar os dados, e o ETag antigo não pode mais valer. Igual em
+    todos os workers do mesmo deploy.
+    """
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha1()
+    arquivos = glob.glob(os.path.join(raiz, '*.py')) + glob.glob(os.path.join(raiz, 'templates', '*.html'))
+    # static/ também: o HTML leva o nome com hash do CSS (estaticos.py)
+    pasta_estatica = os.path.join(raiz, 'static')
+    arquivos += [os.path.join(pasta_estatica, a) for a in estaticos.originais(pasta_estatica)]
+    for caminho in sorted(arquivos):
+        with open(caminho, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()[:10]
+
+
+ASSINATURA = _assinatura_do_codigo()
+
+
+def etag(versao):
+    """Valor do ETag (fraco: o HTML é equivalente, não idêntico byte a byte)."""
+    return f"{versao}-{ASSINATURA}"
+
+
+class VersaoDados:
+    """Versão dos dados com cache curto por worker. Um por worker (veja app.py)."""
+
+    def __init__(self, banco, ttl=VERSAO_DADOS_TTL):
+        self._banco = banco
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._atuais = {}  # origem das leituras -> ((versão, atualizado_em), lida_em)
+
+    def atual(self):
+        """
+        (versão, atualizado_em UTC) na origem das leituras da requisição,
+        relida do banco no máximo a cada `ttl` segundos.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            guardada = self._atuais.get(self._banco.origem_das_leituras())
+            if guardada is not None and agora - guardada[1] < self.ttl:
+                return guardada[0]
+        atual = self._banco.versao_dados()
+        # Depois da leitura: se a réplica fixada caiu, a versão veio do primário
+        origem = self._banco.origem_das_leituras()
+        with self._lock:
+            self._atuais[origem] = (atual, agora)
+        return atual
+
+    def invalidar(self):
+        """Força reler a versão na próxima requisição (chamado depois de gravar)."""
+        with self._lock:
+            self._atuais.clear()